@@ -0,0 +1,356 @@
+## @file benchmark.py
+# This module contains the benchmark harness for signing, verification, key unlock and key generation.
+#
+# Run it from the repository root with `python -m benchmarks.benchmark`.
+# Every case runs in a fresh process, so the peak RSS of one case does not leak into the others.
+
+import argparse
+import json
+import math
+import multiprocessing
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import Crypto
+
+from lib.algorithms import generate_key_pair
+from lib.key_management import (
+    clear_derived_key_cache,
+    encrypt_and_save_private_key,
+    read_and_decrypt_private_key,
+)
+from lib.pdf_signing import CHUNK_SIZE, import_key, sign_pdf, verify_pdf
+
+## @var DEFAULT_FILE_SIZES
+# The default sizes of the signed and verified files.
+DEFAULT_FILE_SIZES = "10K,1M,100M"
+## @var FULL_FILE_SIZES
+# The sizes of the signed and verified files used with --full.
+FULL_FILE_SIZES = "10K,1M,100M,1G"
+## @var DEFAULT_KEY_TYPES
+# The default key types, see lib.algorithms.KEY_TYPES.
+DEFAULT_KEY_TYPES = "rsa-2048,rsa-3072,rsa-4096,ecdsa-p256,ed25519"
+## @var SIZE_SUFFIXES
+# The multipliers of the size suffixes accepted on the command line.
+SIZE_SUFFIXES = {"K": 1024, "M": 1024**2, "G": 1024**3}
+## @var BENCHMARK_PIN
+# The PIN the benchmarked private keys are encrypted with.
+BENCHMARK_PIN = "benchmark"
+
+
+def parse_size(size: str) -> int:
+    """!
+    Parse a size such as "10K", "100M" or "1G".
+
+    @return The size in bytes.
+    """
+    size = size.strip().upper()
+    if size[-1] in SIZE_SUFFIXES:
+        return int(size[:-1]) * SIZE_SUFFIXES[size[-1]]
+    return int(size)
+
+
+def format_size(size: int) -> str:
+    """!
+    Format a size in bytes with the largest suffix it is divisible by.
+
+    @return The formatted size.
+    """
+    for suffix, multiplier in reversed(SIZE_SUFFIXES.items()):
+        if size % multiplier == 0:
+            return f"{size // multiplier}{suffix}"
+    return str(size)
+
+
+def percentile(values: list[float], percent: float) -> float:
+    """!
+    Compute a percentile with the nearest-rank method.
+
+    @return The percentile of the values.
+    """
+    values = sorted(values)
+    return values[max(0, math.ceil(percent / 100 * len(values)) - 1)]
+
+
+def create_file(path: str, size: int):
+    """!
+    Create a single page PDF file of the given size, padded with a stream of random data.
+    """
+    objects = [
+        b"<</Type /Catalog /Pages 2 0 R>>",
+        b"<</Type /Pages /Kids [3 0 R] /Count 1>>",
+        b"<</Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R>>",
+    ]
+    with open(path, "wb") as file:
+        file.write(b"%PDF-1.7\n")
+        offsets = []
+        for number, value in enumerate(objects, 1):
+            offsets.append(file.tell())
+            file.write(b"%d 0 obj\n%s\nendobj\n" % (number, value))
+
+        padding = max(0, size - file.tell() - 300)
+        offsets.append(file.tell())
+        file.write(b"4 0 obj\n<</Length %d>>\nstream\n" % padding)
+        remaining = padding
+        while remaining > 0:
+            file.write(os.urandom(min(CHUNK_SIZE, remaining)))
+            remaining -= CHUNK_SIZE
+        file.write(b"\nendstream\nendobj\n")
+
+        xref_offset = file.tell()
+        file.write(b"xref\n0 %d\n0000000000 65535 f\r\n" % (len(offsets) + 1))
+        for offset in offsets:
+            file.write(b"%010d 00000 n\r\n" % offset)
+        file.write(
+            b"trailer\n<</Size %d /Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(offsets) + 1, xref_offset)
+        )
+
+
+def run_case(case: dict) -> dict:
+    """!
+    Run a single benchmark case. This function is called in a fresh worker process.
+
+    @param case: The case description with "operation", "repeat" and the operation specific parameters.
+
+    @return The case description extended with the measured latencies and peak RSS.
+    """
+    operation = case["operation"]
+    if operation == "sign":
+        private_key = import_key(case["private_key"])
+        run = lambda: sign_pdf(case["file_path"], private_key, case["signed_file_path"])
+    elif operation == "verify":
+        public_key = import_key(case["public_key"])
+        run = lambda: verify_pdf(case["signed_file_path"], public_key)
+    elif operation == "unlock":
+
+        def run():
+            clear_derived_key_cache()
+            read_and_decrypt_private_key(BENCHMARK_PIN, case["device_path"])
+
+    elif operation == "keygen":
+        run = lambda: generate_key_pair(case["key_type"])
+    else:
+        raise ValueError(f"Unknown operation: {operation}")
+
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    latencies = []
+    for _ in range(case["repeat"]):
+        start = time.perf_counter()
+        run()
+        latencies.append(time.perf_counter() - start)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    result = {
+        key: value
+        for key, value in case.items()
+        if key in ("name", "operation", "key_type", "file_size", "repeat")
+    }
+    result["latency"] = {
+        "min": min(latencies),
+        "mean": sum(latencies) / len(latencies),
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+    }
+    if "file_size" in case:
+        result["throughput_mb_s"] = (
+            case["file_size"] / 1024**2 / result["latency"]["p50"]
+        )
+    result["peak_rss_kb"] = peak_rss
+    result["peak_rss_growth_kb"] = peak_rss - rss_before
+    return result
+
+
+def build_cases(
+    directory: str, file_sizes: list[int], key_types: list[str], repeat: int
+) -> list[dict]:
+    """!
+    Prepare the files and keys and build the list of benchmark cases.
+
+    @param directory: The temporary directory for the files and keys.
+    @param file_sizes: The sizes of the signed and verified files.
+    @param key_types: The key types.
+    @param repeat: The number of repetitions of each case.
+
+    @return The list of case descriptions.
+    """
+    cases = []
+    for key_type in key_types:
+        cases.append(
+            {
+                "name": f"keygen/{key_type}",
+                "operation": "keygen",
+                "key_type": key_type,
+                "repeat": repeat,
+            }
+        )
+
+        private_key, public_key = generate_key_pair(key_type)
+        device_path = os.path.join(directory, f"device_{key_type}")
+        os.mkdir(device_path)
+        encrypt_and_save_private_key(BENCHMARK_PIN, device_path, private_key)
+        cases.append(
+            {
+                "name": f"unlock/{key_type}",
+                "operation": "unlock",
+                "key_type": key_type,
+                "device_path": device_path,
+                "repeat": repeat,
+            }
+        )
+
+        for file_size in file_sizes:
+            file_path = os.path.join(directory, f"{format_size(file_size)}.pdf")
+            if not os.path.exists(file_path):
+                create_file(file_path, file_size)
+            signed_file_path = os.path.join(
+                directory, f"{format_size(file_size)}_{key_type}_signed.pdf"
+            )
+            common = {
+                "key_type": key_type,
+                "file_size": file_size,
+                "file_path": file_path,
+                "signed_file_path": signed_file_path,
+                "repeat": repeat,
+            }
+            cases.append(
+                {
+                    "name": f"sign/{key_type}/{format_size(file_size)}",
+                    "operation": "sign",
+                    "private_key": private_key,
+                    **common,
+                }
+            )
+            cases.append(
+                {
+                    "name": f"verify/{key_type}/{format_size(file_size)}",
+                    "operation": "verify",
+                    "public_key": public_key,
+                    **common,
+                }
+            )
+    return cases
+
+
+def compare_results(results: list[dict], baseline: dict, threshold: float) -> list[str]:
+    """!
+    Compare the median latencies with the baseline run.
+
+    @param results: The results of this run.
+    @param baseline: The contents of the baseline results file.
+    @param threshold: The relative slowdown above which a case is reported as a regression.
+
+    @return The descriptions of the regressions.
+    """
+    baseline_results = {result["name"]: result for result in baseline["results"]}
+    regressions = []
+    for result in results:
+        baseline_result = baseline_results.get(result["name"])
+        if baseline_result is None:
+            continue
+        old = baseline_result["latency"]["p50"]
+        new = result["latency"]["p50"]
+        if old > 0 and (new - old) / old > threshold:
+            regressions.append(
+                f"{result['name']}: p50 {old * 1000:.2f} ms -> {new * 1000:.2f} ms "
+                f"(+{(new - old) / old:.0%})"
+            )
+    return regressions
+
+
+def main() -> int:
+    """!
+    Entrypoint of the benchmark.
+
+    @return The exit code: 0 on success, 1 when regressions were found compared to the baseline.
+    """
+    parser = argparse.ArgumentParser(
+        description="Benchmark signing, verification, key unlock and key generation."
+    )
+    parser.add_argument(
+        "--sizes",
+        default=DEFAULT_FILE_SIZES,
+        help=f"file sizes (default: {DEFAULT_FILE_SIZES})",
+    )
+    parser.add_argument(
+        "--full", action="store_true", help=f"use file sizes {FULL_FILE_SIZES}"
+    )
+    parser.add_argument(
+        "--key-types",
+        default=DEFAULT_KEY_TYPES,
+        help=f"key types (default: {DEFAULT_KEY_TYPES})",
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="repetitions of each case (default: 5)"
+    )
+    parser.add_argument(
+        "--filter", default="", help="run only the cases whose name contains this text"
+    )
+    parser.add_argument("-o", "--output", help="file to write the JSON results to")
+    parser.add_argument(
+        "--compare", help="JSON results of a previous run to compare with"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="relative p50 slowdown reported as a regression (default: 0.1)",
+    )
+    args = parser.parse_args()
+
+    file_sizes = [
+        parse_size(size)
+        for size in (FULL_FILE_SIZES if args.full else args.sizes).split(",")
+    ]
+    key_types = args.key_types.split(",")
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with tempfile.TemporaryDirectory() as directory:
+        cases = build_cases(directory, file_sizes, key_types, args.repeat)
+        for case in cases:
+            if args.filter not in case["name"]:
+                continue
+            with context.Pool(1) as pool:
+                result = pool.apply(run_case, (case,))
+            results.append(result)
+            throughput = result.get("throughput_mb_s")
+            print(
+                f"{result['name']:<24} p50 {result['latency']['p50'] * 1000:10.2f} ms"
+                f"  p99 {result['latency']['p99'] * 1000:10.2f} ms"
+                + (f"  {throughput:8.1f} MB/s" if throughput else " " * 15)
+                + f"  peak RSS {result['peak_rss_kb'] / 1024:7.1f} MB",
+                flush=True,
+            )
+
+    output = {
+        "metadata": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+            "python": sys.version.split()[0],
+            "pycryptodome": Crypto.__version__,
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(output, file, indent=2)
+
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare_results(results, json.load(file), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,183 @@
+## @file import_time.py
+# This module contains the import-time budget check of the application entry points.
+#
+# Run it from the repository root with `python -m benchmarks.import_time`.
+# Every entry point is imported in a fresh interpreter with `-X importtime`, and the check fails when
+# its import time exceeds the budget or when it imports a module that should only be loaded on first use.
+
+import argparse
+import os
+import subprocess
+import sys
+from dataclasses import dataclass, field
+
+## @var REPOSITORY_ROOT
+# The directory the entry points are imported from.
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+## @var GUI_PACKAGE
+# The GUI toolkit, whose own import time is excluded from the budgets, as it is needed to show the viewport anyway.
+GUI_PACKAGE = "dearpygui"
+
+
+@dataclass
+class EntryPoint:
+    """! A dataclass representing an entry point whose start-up is checked.
+
+    Attributes: \n
+    module: The name of the entry point module. \n
+    budget_ms: The maximum import time in milliseconds, excluding the interpreter start-up and the GUI toolkit. \n
+    forbidden: The modules (and their submodules) that must not be imported at start-up.
+    """
+
+    module: str
+    budget_ms: float
+    forbidden: list[str] = field(default_factory=list)
+
+
+## @var ENTRY_POINTS
+# The checked entry points. The GUI applications must show the window before loading the cryptography
+# and the windows, and the command-line applications must never load the GUI.
+ENTRY_POINTS = [
+    EntryPoint(
+        "pades",
+        budget_ms=15,
+        forbidden=["Crypto", "lib.pdf_signing", "lib.key_management", "windows"],
+    ),
+    EntryPoint(
+        "generate_signing_key",
+        budget_ms=50,
+        forbidden=["Crypto", "lib.key_management", "lib.key_pool", "multiprocessing"],
+    ),
+    EntryPoint(
+        "pades_cli",
+        budget_ms=40,
+        forbidden=[GUI_PACKAGE, "windows", "Crypto", "lib"],
+    ),
+    EntryPoint("sign_pdfs", budget_ms=150, forbidden=[GUI_PACKAGE, "windows"]),
+    EntryPoint("verify_pdfs", budget_ms=150, forbidden=[GUI_PACKAGE, "windows"]),
+]
+
+
+def run_importtime(statement: str) -> str:
+    """!
+    Run the statement in a fresh interpreter with `-X importtime`.
+
+    @return The import time report printed to the standard error.
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        cwd=REPOSITORY_ROOT,
+        capture_output=True,
+        text=True,
+    )
+    if process.returncode != 0:
+        raise ImportError(process.stderr.strip().splitlines()[-1])
+    return process.stderr
+
+
+def parse_importtime(report: str) -> list[tuple[str, int, int, int]]:
+    """!
+    Parse the report of `-X importtime`.
+
+    @return The list of (module name, nesting level, self time in us, cumulative time in us),
+    in the order of the report, where every module comes after the modules it imported.
+    """
+    modules = []
+    for line in report.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_time, cumulative_time, name = line[len("import time:") :].split("|")
+        level = (len(name) - len(name.lstrip())) // 2
+        modules.append((name.strip(), level, int(self_time), int(cumulative_time)))
+    return modules
+
+
+def is_submodule(name: str, packages: list[str]) -> bool:
+    """!
+    @return True if the module is one of the packages or their submodules.
+    """
+    return any(
+        name == package or name.startswith(package + ".") for package in packages
+    )
+
+
+def measure(
+    entry_point: EntryPoint, startup_modules: set[str]
+) -> tuple[float, list[str]]:
+    """!
+    Measure the import time of the entry point.
+
+    Modules imported by the bare interpreter and the GUI toolkit together with everything it imports are excluded.
+
+    @param entry_point: The entry point to measure.
+    @param startup_modules: The modules imported by the bare interpreter.
+
+    @return A tuple containing the import time in milliseconds and the forbidden modules that were imported.
+    """
+    modules = parse_importtime(run_importtime(f"import {entry_point.module}"))
+    total = 0
+    gui_level = None
+    # The report lists the modules imported by a module before it, so it is walked backwards
+    # to know whether a module was imported on behalf of the GUI toolkit.
+    for name, level, self_time, _ in reversed(modules):
+        if gui_level is not None and level <= gui_level:
+            gui_level = None
+        if gui_level is None and is_submodule(name, [GUI_PACKAGE]):
+            gui_level = level
+        if gui_level is None and name not in startup_modules:
+            total += self_time
+    imported = {name for name, *_ in modules}
+    forbidden = sorted(
+        name for name in imported if is_submodule(name, entry_point.forbidden)
+    )
+    return total / 1000, forbidden
+
+
+def main() -> int:
+    """!
+    Entrypoint of the import-time check.
+
+    @return The exit code: 0 when all the entry points are within their budgets, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        description="Check the import time of the application entry points against their budgets."
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="imports of each entry point, the fastest one is compared (default: 5)",
+    )
+    parser.add_argument(
+        "--scale",
+        type=float,
+        default=1.0,
+        help="multiplier of the budgets, for slower machines (default: 1.0)",
+    )
+    args = parser.parse_args()
+
+    startup_modules = {name for name, *_ in parse_importtime(run_importtime("pass"))}
+    failed = False
+    for entry_point in ENTRY_POINTS:
+        try:
+            measurements = [
+                measure(entry_point, startup_modules) for _ in range(args.repeat)
+            ]
+        except ImportError as e:
+            print(f"{entry_point.module:<24} skipped: {e}")
+            continue
+        import_time = min(time for time, _ in measurements)
+        forbidden = measurements[0][1]
+        budget = entry_point.budget_ms * args.scale
+        ok = import_time <= budget and not forbidden
+        failed |= not ok
+        print(
+            f"{entry_point.module:<24} {import_time:8.1f} ms  budget {budget:6.1f} ms  "
+            + ("OK" if ok else "FAILED")
+            + (f"  imports {', '.join(forbidden)}" if forbidden else "")
+        )
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
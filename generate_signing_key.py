@@ -1,13 +1,11 @@
 ## @file generate_signing_key.py
 # This module represents the application to generate a signing key, encrypt it with a PIN, and save it to the USB drive.
 
+import argparse
 import threading
-import time
 import dearpygui.dearpygui as dpg
 
-from lib.crypt import *
-from lib.key_management import generate_and_save_keys
-from lib.usb import get_usb_drives
+from lib.usb import USBDrive, get_mount_watcher
 from windows.input_pin_window import input_pin_window
 from windows.error_window import error_window
 from windows.success_window import success_window
@@ -31,22 +29,27 @@ def main():
     """!
     Entrypoint of the application.
     """
+    parser = argparse.ArgumentParser(
+        description="Generate a signing key, encrypt it with a PIN and save it to the USB drive."
+    )
+    parser.add_argument(
+        "--pregenerate",
+        type=int,
+        default=0,
+        metavar="N",
+        help="keep N key pairs pre-generated in background processes",
+    )
+    args = parser.parse_args()
+
+    key_pool = None
     pin = None
     available_usb_devices = []
     selected_usb_device = None
 
-    stop_event = threading.Event()
-
-    def refresh_usb_drives_thread(stop_event: threading.Event):
+    def usb_drives_changed(usb_drives: list[USBDrive]):
         nonlocal available_usb_devices
-        while not stop_event.is_set():
-            available_usb_devices = get_usb_drives()
-            dpg.configure_item("select_usb", items=available_usb_devices)
-            time.sleep(0.1)
-
-    usb_drives_thread = threading.Thread(
-        target=refresh_usb_drives_thread, args=(stop_event,)
-    )
+        available_usb_devices = usb_drives
+        dpg.configure_item("select_usb", items=available_usb_devices)
 
     def enter_pin_callback(window_tag: str, input_pin: str):
         if len(input_pin) < 4:
@@ -75,6 +78,39 @@ def main():
             color=(0, 255, 0, 255),
         )
 
+    def update_pool_status(ready: int):
+        dpg.configure_item(
+            "pool_status",
+            default_value=f"Pre-generated keys ready: {ready}/{key_pool.size}",
+        )
+
+    def generate_keys_thread(usb_device: USBDrive, pin: str):
+        # The cryptography is imported on first use, so the window appears without waiting for it.
+        from lib.key_management import generate_and_save_keys
+
+        try:
+            key_pair = None
+            if key_pool:
+                key_pair = key_pool.get()
+                update_pool_status(key_pool.ready)
+            _, public_key_path = generate_and_save_keys(
+                usb_device.mount_point, pin, key_pair
+            )
+        except (OSError, ValueError) as e:
+            error_window(f"Generating key failed! {e}", position=popup_position)
+        else:
+            success_window(
+                f"Private key generated successfully at \nthe {usb_device} drive!\n\nPublic key saved at\n{public_key_path}",
+                position=popup_position,
+            )
+        finally:
+            dpg.hide_item("generating")
+            dpg.configure_item(
+                "generate",
+                label="Generate Key",
+                enabled=True,
+            )
+
     def generate_key_callback(sender, app_data):
         nonlocal pin, selected_usb_device
         if not pin:
@@ -89,21 +125,13 @@ def main():
             label="Generating...",
             enabled=False,
         )
+        dpg.show_item("generating")
 
-        _, public_key_path = generate_and_save_keys(
-            selected_usb_device.mount_point, pin
-        )
-
-        success_window(
-            f"Private key generated successfully at \nthe {selected_usb_device} drive!\n\nPublic key saved at\n{public_key_path}",
-            position=popup_position,
-        )
-
-        dpg.configure_item(
-            "generate",
-            label="Generate Key",
-            enabled=True,
-        )
+        threading.Thread(
+            target=generate_keys_thread,
+            args=(selected_usb_device, pin),
+            daemon=True,
+        ).start()
 
     dpg.create_context()
     dpg.create_viewport(
@@ -123,7 +151,7 @@ def main():
         no_scrollbar=True,
         no_bring_to_front_on_focus=True,
         pos=[0, 0],
-        on_close=lambda: stop_event.set(),
+        on_close=lambda: get_mount_watcher().unsubscribe(usb_drives_changed),
     ):
         dpg.add_text("Generate Signing Key")
         dpg.add_button(
@@ -161,15 +189,26 @@ def main():
             height=50,
             callback=generate_key_callback,
         )
+        with dpg.group(horizontal=True):
+            dpg.add_loading_indicator(tag="generating", radius=1.5, show=False)
+            dpg.add_text(tag="pool_status", show=args.pregenerate > 0)
+
+    if args.pregenerate > 0:
+        from lib.key_pool import KeyPairPool
+
+        key_pool = KeyPairPool(args.pregenerate, on_change=update_pool_status)
+        update_pool_status(0)
 
-    usb_drives_thread.start()
+    get_mount_watcher().subscribe(usb_drives_changed)
 
     dpg.set_viewport_resize_callback(resize_callback)
     resize_callback(None, None)
 
     dpg.show_viewport()
     dpg.start_dearpygui()
-    stop_event.set()
+    get_mount_watcher().unsubscribe(usb_drives_changed)
+    if key_pool:
+        key_pool.close()
     dpg.destroy_context()
 
 
@@ -0,0 +1,498 @@
+## @file algorithms.py
+# This module contains the registry of the key types, digest algorithms and signature algorithms.
+# The algorithms used for a signature are recorded in its CMS SignedData, so verification dispatches on them
+# and documents signed with any registered algorithm stay verifiable when the signing defaults change.
+# The elliptic curve modules are imported on first use, as most keys are still RSA keys.
+
+from dataclasses import dataclass
+
+import Crypto.Hash.SHA256 as SHA256
+import Crypto.Hash.SHA384 as SHA384
+import Crypto.Hash.SHA512 as SHA512
+import Crypto.Hash.SHA3_256 as SHA3_256
+import Crypto.Hash.SHA3_512 as SHA3_512
+import Crypto.PublicKey.RSA as RSA
+from Crypto.Signature import pkcs1_15, pss
+
+from lib.cms import (
+    OID_EC_PUBLIC_KEY,
+    OID_ECDSA_WITH_SHA256,
+    OID_ECDSA_WITH_SHA3_256,
+    OID_ECDSA_WITH_SHA3_512,
+    OID_ECDSA_WITH_SHA384,
+    OID_ECDSA_WITH_SHA512,
+    OID_ED25519,
+    OID_RSA_ENCRYPTION,
+    OID_RSASSA_PSS,
+    OID_SHA256,
+    OID_SHA256_WITH_RSA,
+    OID_SHA384,
+    OID_SHA384_WITH_RSA,
+    OID_SHA3_256,
+    OID_SHA3_512,
+    OID_SHA512,
+    OID_SHA512_WITH_RSA,
+    algorithm_identifier,
+    rsassa_pss,
+)
+from lib.der import encode_null
+from lib.metrics import STAGE_KEY_IMPORT, span
+
+## @var DEFAULT_KEY_TYPE
+# The type of the keys generated when none is chosen.
+DEFAULT_KEY_TYPE = "rsa-4096"
+## @var DEFAULT_DIGEST_ALGORITHM
+# The digest algorithm used when none is chosen and the signing key does not prefer another one.
+DEFAULT_DIGEST_ALGORITHM = "sha256"
+
+
+@dataclass(frozen=True)
+class DigestAlgorithm:
+    """! A dataclass representing a digest algorithm.
+
+    Attributes: \n
+    name: The name of the algorithm, such as "sha256". \n
+    oid: The object identifier of the algorithm. \n
+    module: The pycryptodome hash module implementing the algorithm.
+    """
+
+    name: str
+    oid: str
+    module: object
+
+    @property
+    def digest_size(self) -> int:
+        """!
+        @return The size of the digest in bytes.
+        """
+        return self.module.digest_size
+
+    def new(self, data: bytes = None):
+        """!
+        @param data: The data to hash or None.
+
+        @return A new hash object.
+        """
+        return self.module.new(data)
+
+
+class PrecomputedHash:
+    """!
+    A hash object wrapping an already computed digest, so it can be signed
+    without having access to the hashed data.
+    """
+
+    def __init__(self, digest_algorithm: DigestAlgorithm, digest: bytes):
+        """!
+        @param digest_algorithm: The algorithm the digest was computed with.
+        @param digest: The digest to wrap.
+        """
+        if len(digest) != digest_algorithm.digest_size:
+            raise ValueError(
+                f"{digest_algorithm.name.upper()} digest must be {digest_algorithm.digest_size} bytes long, "
+                f"got {len(digest)}"
+            )
+        self.digest_algorithm = digest_algorithm
+        self.digest_size = digest_algorithm.digest_size
+        self.oid = digest_algorithm.oid
+        self._digest = bytes(digest)
+
+    def digest(self) -> bytes:
+        """!
+        @return The wrapped digest.
+        """
+        return self._digest
+
+    def new(self, data: bytes = None):
+        """!
+        Create a new hash object of the same algorithm, used by PSS for mask generation.
+
+        @return The new hash object.
+        """
+        return self.digest_algorithm.new(data)
+
+
+class SignatureAlgorithm:
+    """!
+    The base class of the signature algorithms.
+
+    A signature algorithm signs the DER encoded signed attributes of a CMS signature. Most algorithms sign
+    the digest of the attributes, so signatures without signed attributes, made by other tools over
+    the digest of the content, can be verified with @ref verify_digest.
+    """
+
+    ## The name of the algorithm in the registry.
+    name = None
+    ## The object identifiers of the signatures made with the algorithm.
+    oids = ()
+
+    def supports(self, key) -> bool:
+        """!
+        @return True if the key can be used with the algorithm.
+        """
+        raise NotImplementedError
+
+    def default_digest(self, key) -> str:
+        """!
+        @return The name of the digest algorithm used with the key when none is chosen.
+        """
+        return DEFAULT_DIGEST_ALGORITHM
+
+    def algorithm_identifier(self, digest_algorithm: DigestAlgorithm) -> bytes:
+        """!
+        @return The encoded AlgorithmIdentifier recorded in the signature.
+        """
+        raise NotImplementedError
+
+    def sign(
+        self, private_key, message: bytes, digest_algorithm: DigestAlgorithm
+    ) -> bytes:
+        """!
+        Sign the message, the DER encoded signed attributes.
+
+        @return The signature.
+        """
+        return self._sign_hash(private_key, digest_algorithm.new(message))
+
+    def sign_digest(
+        self, private_key, digest: bytes, digest_algorithm: DigestAlgorithm
+    ) -> bytes:
+        """!
+        Sign a precomputed digest, which gives the same signature as signing the hashed data.
+
+        @return The signature.
+        """
+        return self._sign_hash(private_key, PrecomputedHash(digest_algorithm, digest))
+
+    def verify(
+        self,
+        public_key,
+        message: bytes,
+        signature: bytes,
+        digest_algorithm: DigestAlgorithm,
+    ) -> bool:
+        """!
+        Verify the signature of the message, the DER encoded signed attributes.
+
+        @return True if the signature is valid, False otherwise.
+        """
+        return self.verify_digest(
+            public_key,
+            digest_algorithm.new(message).digest(),
+            signature,
+            digest_algorithm,
+        )
+
+    def verify_digest(
+        self,
+        public_key,
+        digest: bytes,
+        signature: bytes,
+        digest_algorithm: DigestAlgorithm,
+    ) -> bool:
+        """!
+        Verify the signature of a precomputed digest.
+
+        @return True if the signature is valid, False otherwise.
+        """
+        try:
+            self._verify_hash(
+                public_key, PrecomputedHash(digest_algorithm, digest), signature
+            )
+            return True
+        except (ValueError, TypeError):
+            return False
+
+    def _sign_hash(self, private_key, message_hash) -> bytes:
+        raise NotImplementedError
+
+    def _verify_hash(self, public_key, message_hash, signature: bytes):
+        raise NotImplementedError
+
+
+class RsaPss(SignatureAlgorithm):
+    """!
+    RSASSA-PSS with MGF1 and a salt as long as the digest, the default for RSA keys.
+    """
+
+    name = "rsa-pss"
+    oids = (OID_RSASSA_PSS,)
+
+    def supports(self, key) -> bool:
+        return isinstance(key, RSA.RsaKey)
+
+    def algorithm_identifier(self, digest_algorithm: DigestAlgorithm) -> bytes:
+        return rsassa_pss(digest_algorithm.oid, digest_algorithm.digest_size)
+
+    def _sign_hash(self, private_key, message_hash) -> bytes:
+        return pss.new(private_key).sign(message_hash)
+
+    def _verify_hash(self, public_key, message_hash, signature: bytes):
+        pss.new(public_key).verify(message_hash, signature)
+
+
+class RsaPkcs1(SignatureAlgorithm):
+    """!
+    RSA PKCS#1 v1.5, as used by most other signing tools.
+    """
+
+    name = "rsa-pkcs1"
+    oids = (
+        OID_RSA_ENCRYPTION,
+        OID_SHA256_WITH_RSA,
+        OID_SHA384_WITH_RSA,
+        OID_SHA512_WITH_RSA,
+    )
+
+    def supports(self, key) -> bool:
+        return isinstance(key, RSA.RsaKey)
+
+    def algorithm_identifier(self, digest_algorithm: DigestAlgorithm) -> bytes:
+        return algorithm_identifier(OID_RSA_ENCRYPTION, encode_null())
+
+    def _sign_hash(self, private_key, message_hash) -> bytes:
+        return pkcs1_15.new(private_key).sign(message_hash)
+
+    def _verify_hash(self, public_key, message_hash, signature: bytes):
+        pkcs1_15.new(public_key).verify(message_hash, signature)
+
+
+class Ecdsa(SignatureAlgorithm):
+    """!
+    ECDSA on the NIST curves, with the DER encoded (r, s) signature.
+    """
+
+    name = "ecdsa"
+    ## The object identifiers of the ECDSA signatures by the name of the digest algorithm.
+    digest_oids = {
+        "sha256": OID_ECDSA_WITH_SHA256,
+        "sha384": OID_ECDSA_WITH_SHA384,
+        "sha512": OID_ECDSA_WITH_SHA512,
+        "sha3-256": OID_ECDSA_WITH_SHA3_256,
+        "sha3-512": OID_ECDSA_WITH_SHA3_512,
+    }
+    oids = (OID_EC_PUBLIC_KEY, *digest_oids.values())
+    ## The curves supported by the algorithm and the digest algorithms of matching strength.
+    curves = {"NIST P-256": "sha256", "NIST P-384": "sha384", "NIST P-521": "sha512"}
+
+    def supports(self, key) -> bool:
+        return getattr(key, "curve", None) in self.curves
+
+    def default_digest(self, key) -> str:
+        return self.curves[key.curve]
+
+    def algorithm_identifier(self, digest_algorithm: DigestAlgorithm) -> bytes:
+        return algorithm_identifier(self.digest_oids[digest_algorithm.name])
+
+    def _sign_hash(self, private_key, message_hash) -> bytes:
+        from Crypto.Signature import DSS
+
+        return DSS.new(private_key, "fips-186-3", encoding="der").sign(message_hash)
+
+    def _verify_hash(self, public_key, message_hash, signature: bytes):
+        from Crypto.Signature import DSS
+
+        DSS.new(public_key, "fips-186-3", encoding="der").verify(
+            message_hash, signature
+        )
+
+
+class Ed25519(SignatureAlgorithm):
+    """!
+    Ed25519 (RFC 8419), which signs the signed attributes themselves rather than their digest.
+    The digest algorithm only hashes the signed content, SHA512 by default.
+    """
+
+    name = "ed25519"
+    oids = (OID_ED25519,)
+
+    def supports(self, key) -> bool:
+        return getattr(key, "curve", None) == "Ed25519"
+
+    def default_digest(self, key) -> str:
+        return "sha512"
+
+    def algorithm_identifier(self, digest_algorithm: DigestAlgorithm) -> bytes:
+        return algorithm_identifier(OID_ED25519)
+
+    def sign(
+        self, private_key, message: bytes, digest_algorithm: DigestAlgorithm
+    ) -> bytes:
+        from Crypto.Signature import eddsa
+
+        return eddsa.new(private_key, "rfc8032").sign(message)
+
+    def verify(
+        self,
+        public_key,
+        message: bytes,
+        signature: bytes,
+        digest_algorithm: DigestAlgorithm,
+    ) -> bool:
+        from Crypto.Signature import eddsa
+
+        try:
+            eddsa.new(public_key, "rfc8032").verify(message, signature)
+            return True
+        except (ValueError, TypeError):
+            return False
+
+    def sign_digest(
+        self, private_key, digest: bytes, digest_algorithm: DigestAlgorithm
+    ) -> bytes:
+        raise ValueError("Ed25519 cannot sign a precomputed digest")
+
+    def verify_digest(
+        self,
+        public_key,
+        digest: bytes,
+        signature: bytes,
+        digest_algorithm: DigestAlgorithm,
+    ) -> bool:
+        raise ValueError("Ed25519 signatures must have signed attributes")
+
+
+## @var DIGEST_ALGORITHMS
+# The registered digest algorithms by name.
+DIGEST_ALGORITHMS = {
+    algorithm.name: algorithm
+    for algorithm in (
+        DigestAlgorithm("sha256", OID_SHA256, SHA256),
+        DigestAlgorithm("sha384", OID_SHA384, SHA384),
+        DigestAlgorithm("sha512", OID_SHA512, SHA512),
+        DigestAlgorithm("sha3-256", OID_SHA3_256, SHA3_256),
+        DigestAlgorithm("sha3-512", OID_SHA3_512, SHA3_512),
+    )
+}
+## @var SIGNATURE_ALGORITHMS
+# The registered signature algorithms by name. A key signs with the first algorithm that supports it.
+SIGNATURE_ALGORITHMS = {
+    algorithm.name: algorithm
+    for algorithm in (RsaPss(), RsaPkcs1(), Ecdsa(), Ed25519())
+}
+## @var KEY_TYPES
+# The functions generating a private key of each key type by the name of the type.
+KEY_TYPES = {
+    "rsa-2048": lambda: RSA.generate(2048),
+    "rsa-3072": lambda: RSA.generate(3072),
+    "rsa-4096": lambda: RSA.generate(4096),
+    "ecdsa-p256": lambda: _generate_ecc_key("p256"),
+    "ecdsa-p384": lambda: _generate_ecc_key("p384"),
+    "ed25519": lambda: _generate_ecc_key("ed25519"),
+}
+
+## @var _CURVE_KEY_TYPES
+# The key types by the name of the elliptic curve, as reported by pycryptodome.
+_CURVE_KEY_TYPES = {
+    "NIST P-256": "ecdsa-p256",
+    "NIST P-384": "ecdsa-p384",
+    "NIST P-521": "ecdsa-p521",
+    "Ed25519": "ed25519",
+}
+
+
+def _generate_ecc_key(curve: str):
+    """!
+    @return A new private key on the elliptic curve.
+    """
+    from Crypto.PublicKey import ECC
+
+    return ECC.generate(curve=curve)
+
+
+def get_digest_algorithm(name: str) -> DigestAlgorithm:
+    """!
+    Find a registered digest algorithm.
+
+    @param name: The name or the object identifier of the algorithm.
+
+    @return The DigestAlgorithm.
+    """
+    for algorithm in DIGEST_ALGORITHMS.values():
+        if name in (algorithm.name, algorithm.oid):
+            return algorithm
+    raise ValueError(f"Unsupported digest algorithm {name}")
+
+
+def get_signature_algorithm(oid: str) -> SignatureAlgorithm:
+    """!
+    Find the registered signature algorithm of a signature.
+
+    @param oid: The object identifier of the signature algorithm recorded in the signature.
+
+    @return The SignatureAlgorithm.
+    """
+    for algorithm in SIGNATURE_ALGORITHMS.values():
+        if oid in algorithm.oids:
+            return algorithm
+    raise ValueError(f"Unsupported signature algorithm {oid}")
+
+
+def get_key_signature_algorithm(key) -> SignatureAlgorithm:
+    """!
+    Find the signature algorithm to sign with the key.
+
+    @param key: The imported private or public key.
+
+    @return The first registered SignatureAlgorithm supporting the key.
+    """
+    for algorithm in SIGNATURE_ALGORITHMS.values():
+        if algorithm.supports(key):
+            return algorithm
+    raise ValueError(f"Unsupported key type {get_key_type(key)}")
+
+
+def get_key_type(key) -> str:
+    """!
+    @param key: The imported private or public key.
+
+    @return The name of the key type, such as "rsa-4096" or "ed25519".
+    """
+    if isinstance(key, RSA.RsaKey):
+        return f"rsa-{key.size_in_bits()}"
+    return _CURVE_KEY_TYPES.get(key.curve, key.curve)
+
+
+def import_key(key):
+    """!
+    Import a RSA or elliptic curve key, unless it has already been imported.
+
+    @param key: The key in PEM format or an already imported RsaKey or EccKey object.
+
+    @return The RsaKey or EccKey object.
+    """
+    if isinstance(key, RSA.RsaKey) or hasattr(key, "curve"):
+        return key
+    with span(STAGE_KEY_IMPORT):
+        try:
+            return RSA.import_key(key)
+        except ValueError:
+            from Crypto.PublicKey import ECC
+
+            return ECC.import_key(key)
+
+
+def export_key(key) -> bytes:
+    """!
+    Export an imported key in PEM format.
+
+    @param key: The RsaKey or EccKey object.
+
+    @return The key in PEM format.
+    """
+    pem = key.export_key(format="PEM")
+    return pem.encode("ascii") if isinstance(pem, str) else pem
+
+
+def generate_key_pair(key_type: str = DEFAULT_KEY_TYPE) -> tuple[bytes, bytes]:
+    """!
+    Generate a key pair of one of the @ref KEY_TYPES.
+
+    @param key_type: The name of the key type.
+
+    @return A tuple containing the private and public key in PEM format.
+    """
+    if key_type not in KEY_TYPES:
+        raise ValueError(f"Unsupported key type {key_type}")
+    key = KEY_TYPES[key_type]()
+    return export_key(key), export_key(key.public_key())
@@ -0,0 +1,239 @@
+## @file cms.py
+# This module contains functions for building and parsing detached CMS SignedData structures (RFC 5652),
+# as embedded in PAdES signatures.
+
+from dataclasses import dataclass
+
+from lib.der import (
+    OCTET_STRING,
+    SET,
+    decode,
+    decode_children,
+    decode_oid,
+    encode_context,
+    encode_integer,
+    encode_octet_string,
+    encode_oid,
+    encode_sequence,
+    encode_set,
+)
+
+## @var OID_DATA
+# The object identifier of the id-data content type.
+OID_DATA = "1.2.840.113549.1.7.1"
+## @var OID_SIGNED_DATA
+# The object identifier of the id-signedData content type.
+OID_SIGNED_DATA = "1.2.840.113549.1.7.2"
+## @var OID_CONTENT_TYPE
+# The object identifier of the content-type signed attribute.
+OID_CONTENT_TYPE = "1.2.840.113549.1.9.3"
+## @var OID_MESSAGE_DIGEST
+# The object identifier of the message-digest signed attribute.
+OID_MESSAGE_DIGEST = "1.2.840.113549.1.9.4"
+## @var OID_SHA256
+# The object identifier of the SHA256 digest algorithm.
+OID_SHA256 = "2.16.840.1.101.3.4.2.1"
+## @var OID_SHA384
+# The object identifier of the SHA384 digest algorithm.
+OID_SHA384 = "2.16.840.1.101.3.4.2.2"
+## @var OID_SHA512
+# The object identifier of the SHA512 digest algorithm.
+OID_SHA512 = "2.16.840.1.101.3.4.2.3"
+## @var OID_SHA3_256
+# The object identifier of the SHA3-256 digest algorithm.
+OID_SHA3_256 = "2.16.840.1.101.3.4.2.8"
+## @var OID_SHA3_512
+# The object identifier of the SHA3-512 digest algorithm.
+OID_SHA3_512 = "2.16.840.1.101.3.4.2.10"
+## @var OID_MGF1
+# The object identifier of the MGF1 mask generation function.
+OID_MGF1 = "1.2.840.113549.1.1.8"
+## @var OID_RSASSA_PSS
+# The object identifier of the RSASSA-PSS signature algorithm.
+OID_RSASSA_PSS = "1.2.840.113549.1.1.10"
+## @var OID_RSA_ENCRYPTION
+# The object identifier of RSA PKCS#1 v1.5 signatures, as used by most other signing tools.
+OID_RSA_ENCRYPTION = "1.2.840.113549.1.1.1"
+## @var OID_SHA256_WITH_RSA
+# The object identifier of RSA PKCS#1 v1.5 signatures with SHA256.
+OID_SHA256_WITH_RSA = "1.2.840.113549.1.1.11"
+## @var OID_SHA384_WITH_RSA
+# The object identifier of RSA PKCS#1 v1.5 signatures with SHA384.
+OID_SHA384_WITH_RSA = "1.2.840.113549.1.1.12"
+## @var OID_SHA512_WITH_RSA
+# The object identifier of RSA PKCS#1 v1.5 signatures with SHA512.
+OID_SHA512_WITH_RSA = "1.2.840.113549.1.1.13"
+## @var OID_EC_PUBLIC_KEY
+# The object identifier of elliptic curve public keys, used by some tools for ECDSA signatures of any digest.
+OID_EC_PUBLIC_KEY = "1.2.840.10045.2.1"
+## @var OID_ECDSA_WITH_SHA256
+# The object identifier of ECDSA signatures with SHA256.
+OID_ECDSA_WITH_SHA256 = "1.2.840.10045.4.3.2"
+## @var OID_ECDSA_WITH_SHA384
+# The object identifier of ECDSA signatures with SHA384.
+OID_ECDSA_WITH_SHA384 = "1.2.840.10045.4.3.3"
+## @var OID_ECDSA_WITH_SHA512
+# The object identifier of ECDSA signatures with SHA512.
+OID_ECDSA_WITH_SHA512 = "1.2.840.10045.4.3.4"
+## @var OID_ECDSA_WITH_SHA3_256
+# The object identifier of ECDSA signatures with SHA3-256.
+OID_ECDSA_WITH_SHA3_256 = "2.16.840.1.101.3.4.3.10"
+## @var OID_ECDSA_WITH_SHA3_512
+# The object identifier of ECDSA signatures with SHA3-512.
+OID_ECDSA_WITH_SHA3_512 = "2.16.840.1.101.3.4.3.12"
+## @var OID_ED25519
+# The object identifier of Ed25519 signatures (RFC 8419), computed over the signed attributes themselves.
+OID_ED25519 = "1.3.101.112"
+
+
+@dataclass
+class SignerInfo:
+    """! A dataclass representing the parsed signer of a CMS SignedData structure.
+
+    Attributes: \n
+    key_id: The subject key identifier of the signer or None when the signer is identified by a certificate. \n
+    digest_algorithm: The object identifier of the digest algorithm. \n
+    signature_algorithm: The object identifier of the signature algorithm. \n
+    signed_attributes: The DER encoding of the signed attributes (as a SET) that the signature covers,
+    or None when the signature covers the message digest directly. \n
+    message_digest: The digest of the signed content stored in the signed attributes. \n
+    signature: The signature value.
+    """
+
+    key_id: bytes
+    digest_algorithm: str
+    signature_algorithm: str
+    signed_attributes: bytes
+    message_digest: bytes
+    signature: bytes
+
+
+def algorithm_identifier(oid: str, parameters: bytes = None) -> bytes:
+    """!
+    Encode an AlgorithmIdentifier.
+
+    @param oid: The object identifier of the algorithm.
+    @param parameters: The encoded parameters or None when they are absent.
+
+    @return The encoded AlgorithmIdentifier.
+    """
+    if parameters is None:
+        return encode_sequence(encode_oid(oid))
+    return encode_sequence(encode_oid(oid), parameters)
+
+
+def rsassa_pss(digest_algorithm: str = OID_SHA256, salt_length: int = 32) -> bytes:
+    """!
+    Encode the AlgorithmIdentifier of RSASSA-PSS with MGF1 using the same digest algorithm as the signature.
+
+    @param digest_algorithm: The object identifier of the digest algorithm.
+    @param salt_length: The length of the salt in bytes, the digest size.
+
+    @return The encoded AlgorithmIdentifier.
+    """
+    digest = algorithm_identifier(digest_algorithm)
+    return algorithm_identifier(
+        OID_RSASSA_PSS,
+        encode_sequence(
+            encode_context(0, digest),
+            encode_context(1, algorithm_identifier(OID_MGF1, digest)),
+            encode_context(2, encode_integer(salt_length)),
+        ),
+    )
+
+
+def build_signed_attributes(digest: bytes) -> bytes:
+    """!
+    Build the signed attributes covering the digest of the signed content.
+
+    @param digest: The digest of the signed content.
+
+    @return The DER encoding of the attributes as a SET, which is what the signature is computed over.
+    """
+    return encode_set(
+        encode_sequence(encode_oid(OID_CONTENT_TYPE), encode_set(encode_oid(OID_DATA))),
+        encode_sequence(
+            encode_oid(OID_MESSAGE_DIGEST), encode_set(encode_octet_string(digest))
+        ),
+    )
+
+
+def build_signed_data(
+    signed_attributes: bytes,
+    signature: bytes,
+    key_id: bytes,
+    signature_algorithm: bytes,
+    digest_algorithm: str = OID_SHA256,
+) -> bytes:
+    """!
+    Build a detached CMS SignedData structure with a single signer identified by its subject key identifier.
+
+    @param signed_attributes: The signed attributes built by @ref build_signed_attributes.
+    @param signature: The signature of the signed attributes.
+    @param key_id: The subject key identifier of the signer.
+    @param signature_algorithm: The encoded AlgorithmIdentifier of the signature algorithm.
+    @param digest_algorithm: The object identifier of the digest algorithm of the signed content and attributes.
+
+    @return The DER encoding of the ContentInfo wrapping the SignedData.
+    """
+    digest_algorithm = algorithm_identifier(digest_algorithm)
+    signer_info = encode_sequence(
+        encode_integer(3),
+        encode_context(0, key_id, constructed=False),
+        digest_algorithm,
+        encode_context(0, decode(signed_attributes)[0].value),
+        signature_algorithm,
+        encode_octet_string(signature),
+    )
+    signed_data = encode_sequence(
+        encode_integer(3),
+        encode_set(digest_algorithm),
+        encode_sequence(encode_oid(OID_DATA)),
+        encode_set(signer_info),
+    )
+    return encode_sequence(encode_oid(OID_SIGNED_DATA), encode_context(0, signed_data))
+
+
+def parse_signed_data(data: bytes) -> SignerInfo:
+    """!
+    Parse the first signer of a CMS SignedData structure.
+
+    @param data: The DER encoding of the ContentInfo, optionally followed by padding.
+
+    @return The SignerInfo of the first signer.
+    """
+    content_info, _ = decode(data)
+    content_type, content = decode_children(content_info.value)[:2]
+    if decode_oid(content_type.value) != OID_SIGNED_DATA:
+        raise ValueError("Not a CMS SignedData structure")
+    signed_data = decode_children(decode(content.value)[0].value)
+    signer_infos = signed_data[-1]
+    if signer_infos.tag != SET or not signer_infos.value:
+        raise ValueError("CMS SignedData has no signers")
+    fields = decode_children(decode(signer_infos.value)[0].value)
+
+    sid = fields[1]
+    key_id = sid.value if sid.tag == 0x80 else None
+    digest_algorithm = decode_oid(decode_children(fields[2].value)[0].value)
+    index = 3
+    signed_attributes = None
+    message_digest = None
+    if fields[index].tag == 0xA0:
+        signed_attributes = bytes([SET]) + fields[index].raw[1:]
+        for attribute in decode_children(fields[index].value):
+            attribute_type, values = decode_children(attribute.value)
+            if decode_oid(attribute_type.value) == OID_MESSAGE_DIGEST:
+                value = decode(values.value)[0]
+                if value.tag == OCTET_STRING:
+                    message_digest = value.value
+        index += 1
+    signature_algorithm = decode_oid(decode_children(fields[index].value)[0].value)
+    signature = fields[index + 1].value
+    return SignerInfo(
+        key_id,
+        digest_algorithm,
+        signature_algorithm,
+        signed_attributes,
+        message_digest,
+        signature,
+    )
@@ -4,6 +4,7 @@
 import Crypto.PublicKey.RSA as RSA
 import Crypto.Hash.SHA256 as SHA256
 import Crypto.Cipher.AES as AES
+from Crypto.Protocol.KDF import PBKDF2, scrypt
 
 
 def hash_string(string: str) -> str:
@@ -16,6 +17,34 @@ def hash_string(string: str) -> str:
     return SHA256.new(string.encode("utf-8")).digest()
 
 
+def derive_key_with_scrypt(
+    pin: str, salt: bytes, cost: int, block_size: int, parallelization: int
+) -> bytes:
+    """!
+    Derive a 256-bit key from a PIN using scrypt.
+
+    @param pin: The PIN to derive the key from.
+    @param salt: The salt.
+    @param cost: The CPU/memory cost parameter (N), a power of two.
+    @param block_size: The block size parameter (r).
+    @param parallelization: The parallelization parameter (p).
+
+    @return The derived key."""
+    return scrypt(pin.encode("utf-8"), salt, 32, cost, block_size, parallelization)
+
+
+def derive_key_with_pbkdf2(pin: str, salt: bytes, iterations: int) -> bytes:
+    """!
+    Derive a 256-bit key from a PIN using PBKDF2 with HMAC-SHA256.
+
+    @param pin: The PIN to derive the key from.
+    @param salt: The salt.
+    @param iterations: The number of iterations.
+
+    @return The derived key."""
+    return PBKDF2(pin.encode("utf-8"), salt, 32, iterations, hmac_hash_module=SHA256)
+
+
 def generate_rsa_key_pair(key_size: int = 4096) -> tuple[bytes, bytes]:
     """!
     Generate a RSA key pair.
@@ -29,21 +58,40 @@ def generate_rsa_key_pair(key_size: int = 4096) -> tuple[bytes, bytes]:
     return private_key, public_key
 
 
-def encrypt_data_with_aes(data: bytes, key: bytes) -> bytes:
+def get_key_fingerprint(key) -> bytes:
+    """!
+    Compute the fingerprint of a RSA or elliptic curve key, the SHA256 hash of its DER encoded public key.
+
+    @param key: The private or public key.
+
+    @return The fingerprint."""
+    return SHA256.new(key.public_key().export_key(format="DER")).digest()
+
+
+def encrypt_data_with_aes(
+    data: bytes, key: bytes, associated_data: bytes = None
+) -> bytes:
     """!
     Encrypt data using AES.
 
     @param data: The data to encrypt.
     @param key: The key to use for encryption.
+    @param associated_data: The data that is not encrypted, but is protected by the tag.
 
     @return The encrypted data."""
     cipher = AES.new(key, AES.MODE_EAX)
+    if associated_data:
+        cipher.update(associated_data)
     ciphertext, tag = cipher.encrypt_and_digest(data)
     return cipher.nonce, tag, ciphertext
 
 
 def decrypt_data_with_aes(
-    nonce: bytes, tag: bytes, ciphertext: bytes, key: bytes
+    nonce: bytes,
+    tag: bytes,
+    ciphertext: bytes,
+    key: bytes,
+    associated_data: bytes = None,
 ) -> bytes:
     """!
     Decrypt data using AES.
@@ -52,9 +100,12 @@ def decrypt_data_with_aes(
     @param tag: The tag used for encryption.
     @param ciphertext: The encrypted data.
     @param key: The key to use for decryption.
+    @param associated_data: The data that is not encrypted, but is protected by the tag.
 
     @return The decrypted data."""
     cipher = AES.new(key, AES.MODE_EAX, nonce=nonce)
+    if associated_data:
+        cipher.update(associated_data)
     return cipher.decrypt_and_verify(ciphertext, tag)
 
 
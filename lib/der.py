@@ -0,0 +1,190 @@
+## @file der.py
+# This module contains minimal functions for encoding and decoding ASN.1 DER structures.
+
+from typing import NamedTuple
+
+## @var SEQUENCE
+# The tag of the ASN.1 SEQUENCE.
+SEQUENCE = 0x30
+## @var SET
+# The tag of the ASN.1 SET.
+SET = 0x31
+## @var INTEGER
+# The tag of the ASN.1 INTEGER.
+INTEGER = 0x02
+## @var OCTET_STRING
+# The tag of the ASN.1 OCTET STRING.
+OCTET_STRING = 0x04
+## @var NULL
+# The tag of the ASN.1 NULL.
+NULL = 0x05
+## @var OBJECT_IDENTIFIER
+# The tag of the ASN.1 OBJECT IDENTIFIER.
+OBJECT_IDENTIFIER = 0x06
+## @var UTC_TIME
+# The tag of the ASN.1 UTCTime.
+UTC_TIME = 0x17
+
+
+class Element(NamedTuple):
+    """! A decoded DER element.
+
+    Attributes: \n
+    tag: The tag of the element. \n
+    value: The contents of the element. \n
+    raw: The whole encoding of the element, including the tag and length.
+    """
+
+    tag: int
+    value: bytes
+    raw: bytes
+
+
+def encode(tag: int, value: bytes) -> bytes:
+    """!
+    Encode a DER element.
+
+    @param tag: The tag of the element.
+    @param value: The contents of the element.
+
+    @return The encoded element.
+    """
+    length = len(value)
+    if length < 0x80:
+        return bytes([tag, length]) + value
+    length_bytes = length.to_bytes((length.bit_length() + 7) // 8, "big")
+    return bytes([tag, 0x80 | len(length_bytes)]) + length_bytes + value
+
+
+def encode_integer(value: int) -> bytes:
+    """!
+    Encode a non-negative INTEGER.
+
+    @return The encoded element.
+    """
+    return encode(INTEGER, value.to_bytes(value.bit_length() // 8 + 1, "big"))
+
+
+def encode_oid(oid: str) -> bytes:
+    """!
+    Encode an OBJECT IDENTIFIER given in the dotted notation.
+
+    @return The encoded element.
+    """
+    arcs = [int(arc) for arc in oid.split(".")]
+    value = bytearray([arcs[0] * 40 + arcs[1]])
+    for arc in arcs[2:]:
+        arc_bytes = [arc & 0x7F]
+        arc >>= 7
+        while arc:
+            arc_bytes.append(0x80 | (arc & 0x7F))
+            arc >>= 7
+        value.extend(reversed(arc_bytes))
+    return encode(OBJECT_IDENTIFIER, bytes(value))
+
+
+def encode_null() -> bytes:
+    """!
+    @return The encoded NULL element.
+    """
+    return encode(NULL, b"")
+
+
+def encode_octet_string(value: bytes) -> bytes:
+    """!
+    @return The encoded OCTET STRING element.
+    """
+    return encode(OCTET_STRING, value)
+
+
+def encode_sequence(*elements: bytes) -> bytes:
+    """!
+    @return The SEQUENCE of the encoded elements.
+    """
+    return encode(SEQUENCE, b"".join(elements))
+
+
+def encode_set(*elements: bytes) -> bytes:
+    """!
+    @return The SET OF the encoded elements, sorted as required by DER.
+    """
+    return encode(SET, b"".join(sorted(elements)))
+
+
+def encode_context(number: int, value: bytes, constructed: bool = True) -> bytes:
+    """!
+    Encode a context-specific element, such as [0] EXPLICIT or [0] IMPLICIT.
+
+    @param number: The context-specific tag number.
+    @param value: The contents of the element.
+    @param constructed: Whether the element is constructed.
+
+    @return The encoded element.
+    """
+    return encode((0xA0 if constructed else 0x80) | number, value)
+
+
+def decode(data: bytes, offset: int = 0) -> tuple[Element, int]:
+    """!
+    Decode a single DER element.
+
+    @param data: The encoded data.
+    @param offset: The offset of the element in the data.
+
+    @return A tuple containing the decoded element and the offset just after it.
+    """
+    if offset + 2 > len(data):
+        raise ValueError("Truncated DER element")
+    tag = data[offset]
+    length = data[offset + 1]
+    start = offset + 2
+    if length & 0x80:
+        length_size = length & 0x7F
+        if length_size == 0 or length_size > 4:
+            raise ValueError("Unsupported DER length")
+        length = int.from_bytes(data[start : start + length_size], "big")
+        start += length_size
+    end = start + length
+    if end > len(data):
+        raise ValueError("Truncated DER element")
+    return Element(tag, bytes(data[start:end]), bytes(data[offset:end])), end
+
+
+def decode_children(data: bytes) -> list[Element]:
+    """!
+    Decode all the elements encoded one after another, such as the contents of a SEQUENCE.
+
+    @return The list of decoded elements.
+    """
+    elements = []
+    offset = 0
+    while offset < len(data):
+        element, offset = decode(data, offset)
+        elements.append(element)
+    return elements
+
+
+def decode_oid(value: bytes) -> str:
+    """!
+    Decode the contents of an OBJECT IDENTIFIER.
+
+    @return The object identifier in the dotted notation.
+    """
+    arcs = []
+    arc = 0
+    for byte in value:
+        arc = (arc << 7) | (byte & 0x7F)
+        if not byte & 0x80:
+            arcs.append(arc)
+            arc = 0
+    first = min(arcs[0] // 40, 2)
+    return ".".join(str(arc) for arc in [first, arcs[0] - first * 40] + arcs[1:])
+
+
+def decode_integer(value: bytes) -> int:
+    """!
+    Decode the contents of an INTEGER.
+
+    @return The integer.
+    """
+    return int.from_bytes(value, "big", signed=True)
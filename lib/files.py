@@ -0,0 +1,28 @@
+## @file files.py
+# This module contains the helpers to write files atomically, through a temporary file renamed once complete.
+
+import os
+
+
+def open_temporary_file(path: str) -> tuple[object, str]:
+    """!
+    Create a new temporary file in the directory of the path, to be renamed to the path once it is complete.
+
+    The name of the file is unique to the process and random, and the file is created exclusively,
+    so writers of the same path at the same time, such as two worker processes or the GUI and the command-line
+    interface, never share a temporary file. Unlike tempfile.mkstemp, the file is created with the default
+    permissions, so the renamed file looks the same as a file written directly.
+
+    @param path: The path of the file to write.
+
+    @return A tuple containing the temporary file opened for writing in binary mode and its path.
+    """
+    directory, name = os.path.split(path)
+    while True:
+        temporary_path = os.path.join(
+            directory, f".{name}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+        )
+        try:
+            return open(temporary_path, "xb"), temporary_path
+        except FileExistsError:
+            continue
@@ -0,0 +1,233 @@
+## @file jobs.py
+# This module contains the queue running signing and verification jobs in background worker threads,
+# so the GUI stays responsive while large files are processed.
+
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from lib.pdf_signing import OperationCancelled
+
+## @var JOB_WORKERS
+# The default number of jobs run at the same time.
+# Hashing and RSA release the GIL, so the worker threads run in parallel.
+JOB_WORKERS = 2
+## @var PROGRESS_INTERVAL
+# The minimum number of seconds between two progress notifications of the same job.
+PROGRESS_INTERVAL = 0.1
+
+## @var JOB_QUEUED
+# The state of a job waiting for a free worker.
+JOB_QUEUED = "queued"
+## @var JOB_RUNNING
+# The state of a job being run.
+JOB_RUNNING = "running"
+## @var JOB_DONE
+# The state of a job that finished successfully.
+JOB_DONE = "done"
+## @var JOB_FAILED
+# The state of a job that raised an error.
+JOB_FAILED = "failed"
+## @var JOB_CANCELLED
+# The state of a job cancelled before it finished.
+JOB_CANCELLED = "cancelled"
+
+## @var _job_ids
+# The counter of job identifiers, unique in the whole application.
+_job_ids = itertools.count(1)
+
+
+@dataclass(eq=False)
+class Job:
+    """! A dataclass representing a single signing or verification job.
+
+    Attributes: \n
+    description: The short description of the job shown to the user, such as "Sign". \n
+    file_path: The path to the processed file. \n
+    total: The number of bytes to process, the size of the file. \n
+    done: The number of bytes processed so far. \n
+    state: The state of the job, one of the JOB_* constants. \n
+    result: The value returned by the job function once the job is done. \n
+    error: The error raised by the job function when the job failed. \n
+    id: The identifier of the job, unique in the whole application.
+    """
+
+    description: str
+    file_path: str
+    total: int = 0
+    done: int = 0
+    state: str = JOB_QUEUED
+    result: object = None
+    error: Exception = None
+    id: int = field(default_factory=lambda: next(_job_ids))
+    _cancel_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    @property
+    def progress(self) -> float:
+        """!
+        @return The processed fraction of the file, between 0 and 1.
+        """
+        if self.state == JOB_DONE:
+            return 1.0
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    @property
+    def finished(self) -> bool:
+        """!
+        @return True if the job is done, failed or cancelled.
+        """
+        return self.state in (JOB_DONE, JOB_FAILED, JOB_CANCELLED)
+
+    def cancel(self):
+        """!
+        Ask the job to stop. A queued job does not start, a running job stops after the current chunk.
+        """
+        self._cancel_event.set()
+
+
+class JobQueue:
+    """!
+    A queue of jobs run by a pool of worker threads.
+
+    A job is a function taking a progress callback, such as a call of lib.pdf_signing.sign_pdf or verify_pdf,
+    which reports the number of bytes hashed after every chunk. The subscribers are notified from the worker
+    threads whenever a job is queued, changes its state or makes progress, at most every
+    @link PROGRESS_INTERVAL @endlink seconds for the progress.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS):
+        """!
+        @param workers: The number of jobs run at the same time.
+        """
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="job"
+        )
+        self._subscribers = []
+        self._jobs = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback: callable):
+        """!
+        Subscribe to the changes of the jobs.
+
+        @param callback: The callback function to call with the changed Job.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: callable):
+        """!
+        Unsubscribe from the changes of the jobs.
+
+        @param callback: The callback function passed to @ref subscribe.
+        """
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def submit(self, description: str, file_path: str, function: callable) -> Job:
+        """!
+        Queue a job.
+
+        @param description: The short description of the job shown to the user.
+        @param file_path: The path to the file the job processes, its size is the total of the progress.
+        @param function: The function to run, called with the progress callback.
+        The progress callback raises lib.pdf_signing.OperationCancelled when the job is cancelled.
+
+        @return The queued Job.
+        """
+        try:
+            total = os.path.getsize(file_path)
+        except OSError:
+            total = 0
+        job = Job(description, file_path, total)
+        with self._lock:
+            self._jobs.add(job)
+        self._notify(job)
+        self._executor.submit(self._run, job, function)
+        return job
+
+    def close(self):
+        """!
+        Cancel all the jobs and wait for the running ones to stop.
+        """
+        with self._lock:
+            jobs = list(self._jobs)
+        for job in jobs:
+            job.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _notify(self, job: Job):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(job)
+
+    def _run(self, job: Job, function: callable):
+        """!
+        Run the job in a worker thread.
+        """
+        if job._cancel_event.is_set():
+            job.state = JOB_CANCELLED
+            with self._lock:
+                self._jobs.discard(job)
+            self._notify(job)
+            return
+        job.state = JOB_RUNNING
+        self._notify(job)
+
+        last_notification = time.monotonic()
+
+        def progress(size: int):
+            nonlocal last_notification
+            if job._cancel_event.is_set():
+                raise OperationCancelled()
+            job.done += size
+            now = time.monotonic()
+            if now - last_notification >= PROGRESS_INTERVAL:
+                last_notification = now
+                self._notify(job)
+
+        try:
+            job.result = function(progress)
+            job.state = JOB_DONE
+        except OperationCancelled:
+            job.state = JOB_CANCELLED
+        except Exception as e:
+            # Any error, such as one raised while parsing a malformed file, fails the job
+            # instead of leaving it running forever.
+            job.error = e
+            job.state = JOB_FAILED
+        with self._lock:
+            self._jobs.discard(job)
+        self._notify(job)
+
+
+## @var _job_queue
+# The job queue shared by all the windows, created by @ref get_job_queue.
+_job_queue = None
+
+
+def get_job_queue() -> JobQueue:
+    """!
+    Get the job queue shared by the whole application.
+
+    @return The shared JobQueue.
+    """
+    global _job_queue
+    if _job_queue is None:
+        _job_queue = JobQueue()
+    return _job_queue
+
+
+def close_job_queue():
+    """!
+    Cancel the jobs of the shared job queue and wait for them to stop, if the queue was ever used.
+    """
+    global _job_queue
+    if _job_queue is not None:
+        _job_queue.close()
+        _job_queue = None
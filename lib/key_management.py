@@ -5,11 +5,46 @@
 This module contains functions related to key management.
 """
 
+import hmac
 import os
+import struct
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
 
-from lib.crypt import *
+import Crypto.Hash.SHA256 as SHA256
+
+from lib.algorithms import (
+    DEFAULT_KEY_TYPE,
+    generate_key_pair,
+    get_key_type,
+    import_key,
+)
+from lib.crypt import (
+    decrypt_data_with_aes,
+    derive_key_with_pbkdf2,
+    derive_key_with_scrypt,
+    encrypt_data_with_aes,
+    get_key_fingerprint,
+    hash_string,
+    merge_cipher_data,
+    split_cipher_data,
+)
+from lib.files import open_temporary_file
+from lib.metrics import (
+    STAGE_KEY_DECRYPT,
+    STAGE_KEY_DERIVE,
+    STAGE_KEY_READ,
+    span,
+)
+from lib.usb import MountWatcher, USBDrive, get_mount_watcher, get_usb_drives
 
 ## @anchor globals
+## @var PIN_ENVIRONMENT_VARIABLE
+# The environment variable the headless applications read the PIN from instead of prompting for it.
+PIN_ENVIRONMENT_VARIABLE = "PADES_PIN"
 ## @var PRIVATE_KEY_DIR
 # The directory where the private key is stored on the device.
 PRIVATE_KEY_DIR = ""
@@ -25,52 +60,507 @@ PUBLIC_KEY_DIR = os.getcwd()
 ## @var PUBLIC_KEY_FILENAME
 # The filename of the public key.
 PUBLIC_KEY_FILENAME = "public_key.pub"
+## @var KEY_FILE_MAGIC
+# The bytes the versioned encrypted private key file starts with.
+# Files without it are legacy files encrypted with the SHA256 hash of the PIN.
+KEY_FILE_MAGIC = b"PADESKEY"
+## @var KEY_FILE_VERSION
+# The current version of the encrypted private key file format.
+# Version 2 adds the key algorithm, the cipher, the creation time, the key fingerprint, the PIN verifier
+# and the checksum of the file to the version 1 header.
+KEY_FILE_VERSION = 2
+## @var KEY_FILE_VERSIONS
+# The versions of the encrypted private key file format that can be read.
+KEY_FILE_VERSIONS = (1, 2)
+## @var CIPHER_AES_EAX
+# The identifier of AES-256 in EAX mode, the cipher the private key is encrypted with.
+CIPHER_AES_EAX = 1
+## @var KEY_ALGORITHM_IDS
+# The identifiers of the key types (see lib.algorithms.KEY_TYPES) stored in the key file header, 0 for other keys.
+KEY_ALGORITHM_IDS = {
+    "rsa-2048": 1,
+    "rsa-3072": 2,
+    "rsa-4096": 3,
+    "ecdsa-p256": 4,
+    "ecdsa-p384": 5,
+    "ed25519": 6,
+}
+## @var PIN_VERIFIER_LABEL
+# The label the PIN verifier is computed from with the key derived from the PIN, see @ref compute_pin_verifier.
+PIN_VERIFIER_LABEL = b"PADES PIN verifier"
+## @var PIN_VERIFIER_LENGTH
+# The length of the PIN verifier in bytes.
+PIN_VERIFIER_LENGTH = 16
+## @var KDF_SCRYPT
+# The identifier of the scrypt key derivation function.
+KDF_SCRYPT = 1
+## @var KDF_PBKDF2
+# The identifier of the PBKDF2-HMAC-SHA256 key derivation function.
+KDF_PBKDF2 = 2
+## @var SCRYPT_COST
+# The default scrypt CPU/memory cost parameter (N).
+SCRYPT_COST = 2**15
+## @var SCRYPT_BLOCK_SIZE
+# The default scrypt block size parameter (r).
+SCRYPT_BLOCK_SIZE = 8
+## @var SCRYPT_PARALLELIZATION
+# The default scrypt parallelization parameter (p).
+SCRYPT_PARALLELIZATION = 1
+## @var PBKDF2_ITERATIONS
+# The default number of PBKDF2 iterations.
+PBKDF2_ITERATIONS = 600_000
+## @var SALT_LENGTH
+# The length of the key derivation salt in bytes.
+SALT_LENGTH = 16
+## @var MAX_SCRYPT_COST
+# The largest scrypt cost parameter accepted from a key file, so a corrupt or crafted file cannot exhaust the memory.
+MAX_SCRYPT_COST = 2**20
+## @var MAX_PBKDF2_ITERATIONS
+# The largest number of PBKDF2 iterations accepted from a key file.
+MAX_PBKDF2_ITERATIONS = 10_000_000
+## @var PUBLIC_KEY_CACHE_SIZE
+# The maximum number of parsed public keys kept by @ref load_public_key.
+PUBLIC_KEY_CACHE_SIZE = 64
+
+## @var _public_key_cache
+# The parsed public keys, keyed by the SHA256 hash of the key file contents, in least recently used order.
+_public_key_cache = OrderedDict()
+## @var DERIVED_KEY_CACHE_SIZE
+# The maximum number of keys derived from a PIN kept by @ref derive_key.
+DERIVED_KEY_CACHE_SIZE = 4
+## @var DERIVED_KEY_CACHE_TTL
+# The number of seconds a key derived from a PIN is kept by @ref derive_key after it was last used.
+DERIVED_KEY_CACHE_TTL = 60
+
+## @var _derived_key_cache
+# The keys derived from the PIN with their expiry time, in least recently used order, keyed by an HMAC
+# of the key derivation parameters and the PIN, see @ref _get_derived_key_cache_key.
+_derived_key_cache = OrderedDict()
+## @var _derived_key_cache_secret
+# The random secret of the HMAC keying @ref _derived_key_cache, generated once per process,
+# so the cache keys cannot be used to guess the PIN faster than the key derivation function allows.
+_derived_key_cache_secret = os.urandom(32)
+## @var _derived_key_cache_lock
+# The lock guarding @ref _derived_key_cache, keys are unlocked from worker threads too.
+_derived_key_cache_lock = threading.Lock()
+
+
+class KeyFileError(ValueError):
+    """!
+    Raised when a file is not a valid encrypted private key file, because it is corrupt or not a key file at all.
+    """
+
+
+class WrongPinError(ValueError):
+    """!
+    Raised when the PIN does not unlock the private key.
+    """
+
+
+@dataclass
+class KeyFileHeader:
+    """! A dataclass representing the header of the encrypted private key file.
+
+    The header is stored in plain text before the nonce, tag and ciphertext and is authenticated by the tag.
+    Everything but the checksum is readable without the PIN, so the key can be identified without decrypting it.
+
+    Attributes: \n
+    kdf: The identifier of the key derivation function (@link globals KDF_SCRYPT @endlink or @link globals KDF_PBKDF2 @endlink). \n
+    salt: The key derivation salt. \n
+    cost: The scrypt cost parameter (N) or the number of PBKDF2 iterations. \n
+    block_size: The scrypt block size parameter (r), unused by PBKDF2. \n
+    parallelization: The scrypt parallelization parameter (p), unused by PBKDF2. \n
+    version: The version of the file format. \n
+    key_algorithm: The identifier of the key type from @link globals KEY_ALGORITHM_IDS @endlink, since version 2. \n
+    cipher: The identifier of the cipher, @link globals CIPHER_AES_EAX @endlink, since version 2. \n
+    created: The time the file was created as a Unix timestamp, since version 2. \n
+    fingerprint: The fingerprint of the public key (see lib.crypt.get_key_fingerprint), since version 2. \n
+    pin_verifier: The value checking the PIN before decrypting, see @ref compute_pin_verifier, since version 2. \n
+    checksum: The CRC32 of the rest of the file, detecting a corrupt file before the key derivation, since version 2.
+    """
+
+    kdf: int
+    salt: bytes
+    cost: int
+    block_size: int = 0
+    parallelization: int = 0
+    version: int = KEY_FILE_VERSION
+    key_algorithm: int = 0
+    cipher: int = CIPHER_AES_EAX
+    created: int = 0
+    fingerprint: bytes = bytes(32)
+    pin_verifier: bytes = bytes(PIN_VERIFIER_LENGTH)
+    checksum: int = 0
+
+    ## @var FORMAT_V1
+    # The struct format of the version 1 header: magic, version, kdf, cost, block size, parallelization and salt.
+    FORMAT_V1 = f">{len(KEY_FILE_MAGIC)}sBBIII{SALT_LENGTH}s"
+    ## @var FORMAT
+    # The struct format of the version 2 header: magic, version, kdf, key algorithm, cipher, cost, block size,
+    # parallelization, salt, creation time, fingerprint, PIN verifier and checksum.
+    FORMAT = f">{len(KEY_FILE_MAGIC)}sBBBBIII{SALT_LENGTH}sQ32s{PIN_VERIFIER_LENGTH}sI"
+    ## @var SIZE_V1
+    # The size of the version 1 header in bytes.
+    SIZE_V1 = struct.calcsize(FORMAT_V1)
+    ## @var SIZE
+    # The size of the version 2 header in bytes, enough to read the header of any version.
+    SIZE = struct.calcsize(FORMAT)
+
+    @classmethod
+    def new(cls, kdf: int = KDF_SCRYPT, key=None) -> "KeyFileHeader":
+        """!
+        Create a header with a random salt and the default parameters of the key derivation function.
 
+        @param kdf: The identifier of the key derivation function.
+        @param key: The imported private key the file will contain, to record its type and fingerprint.
 
-def generate_and_save_keys(device_path: str, pin: str) -> tuple[str, str]:
+        @return The new header.
+        """
+        salt = os.urandom(SALT_LENGTH)
+        if kdf == KDF_SCRYPT:
+            header = cls(
+                kdf, salt, SCRYPT_COST, SCRYPT_BLOCK_SIZE, SCRYPT_PARALLELIZATION
+            )
+        elif kdf == KDF_PBKDF2:
+            header = cls(kdf, salt, PBKDF2_ITERATIONS)
+        else:
+            raise ValueError(f"Unknown key derivation function: {kdf}")
+        header.created = int(time.time())
+        if key is not None:
+            header.key_algorithm = KEY_ALGORITHM_IDS.get(get_key_type(key), 0)
+            header.fingerprint = get_key_fingerprint(key)
+        return header
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "KeyFileHeader":
+        """!
+        Read the header from the beginning of the encrypted private key file.
+
+        The key derivation parameters are checked, so a corrupt or foreign file is rejected
+        before the expensive key derivation runs.
+
+        @param data: The contents of the file, or at least its first @ref SIZE bytes.
+
+        @return The header.
+        """
+        if not data.startswith(KEY_FILE_MAGIC) or len(data) <= len(KEY_FILE_MAGIC):
+            raise KeyFileError("Not a versioned private key file")
+        version = data[len(KEY_FILE_MAGIC)]
+        if version not in KEY_FILE_VERSIONS:
+            raise KeyFileError(f"Unsupported private key file version: {version}")
+        if len(data) < (cls.SIZE if version >= 2 else cls.SIZE_V1):
+            raise KeyFileError("The private key file is truncated")
+        if version == 1:
+            _, _, kdf, cost, block_size, parallelization, salt = struct.unpack_from(
+                cls.FORMAT_V1, data
+            )
+            header = cls(kdf, salt, cost, block_size, parallelization, version)
+        else:
+            (
+                _,
+                _,
+                kdf,
+                key_algorithm,
+                cipher,
+                cost,
+                block_size,
+                parallelization,
+                salt,
+                created,
+                fingerprint,
+                pin_verifier,
+                checksum,
+            ) = struct.unpack_from(cls.FORMAT, data)
+            header = cls(
+                kdf,
+                salt,
+                cost,
+                block_size,
+                parallelization,
+                version,
+                key_algorithm,
+                cipher,
+                created,
+                fingerprint,
+                pin_verifier,
+                checksum,
+            )
+            if cipher != CIPHER_AES_EAX:
+                raise KeyFileError(f"Unknown cipher: {cipher}")
+        header._check_kdf_parameters()
+        return header
+
+    def _check_kdf_parameters(self):
+        """!
+        Check that the key derivation parameters are valid and within the limits.
+        """
+        if self.kdf == KDF_SCRYPT:
+            valid = (
+                1 < self.cost <= MAX_SCRYPT_COST
+                and not self.cost & (self.cost - 1)
+                and self.block_size > 0
+                and 0 < self.parallelization <= 16
+                and self.cost * self.block_size <= MAX_SCRYPT_COST * SCRYPT_BLOCK_SIZE
+            )
+        elif self.kdf == KDF_PBKDF2:
+            valid = 0 < self.cost <= MAX_PBKDF2_ITERATIONS
+        else:
+            raise KeyFileError(f"Unknown key derivation function: {self.kdf}")
+        if not valid:
+            raise KeyFileError("Invalid key derivation parameters")
+
+    @property
+    def size(self) -> int:
+        """!
+        @return The size of the header in bytes, which depends on the version.
+        """
+        return self.SIZE if self.version >= 2 else self.SIZE_V1
+
+    @property
+    def key_type(self) -> str:
+        """!
+        @return The name of the key type, such as "rsa-4096", or None when it is not recorded.
+        """
+        for name, key_algorithm in KEY_ALGORITHM_IDS.items():
+            if key_algorithm == self.key_algorithm:
+                return name
+        return None
+
+    @property
+    def kdf_parameters(self) -> tuple:
+        """!
+        @return The key derivation function with all its parameters, which determine the derived key.
+        """
+        return (self.kdf, self.salt, self.cost, self.block_size, self.parallelization)
+
+    def pack(self) -> bytes:
+        """!
+        @return The header as bytes.
+        """
+        if self.version == 1:
+            return struct.pack(
+                self.FORMAT_V1,
+                KEY_FILE_MAGIC,
+                self.version,
+                self.kdf,
+                self.cost,
+                self.block_size,
+                self.parallelization,
+                self.salt,
+            )
+        return struct.pack(
+            self.FORMAT,
+            KEY_FILE_MAGIC,
+            self.version,
+            self.kdf,
+            self.key_algorithm,
+            self.cipher,
+            self.cost,
+            self.block_size,
+            self.parallelization,
+            self.salt,
+            self.created,
+            self.fingerprint,
+            self.pin_verifier,
+            self.checksum,
+        )
+
+    def authenticated_data(self) -> bytes:
+        """!
+        @return The part of the header authenticated by the tag of the encrypted private key, all but the checksum.
+        """
+        data = self.pack()
+        return data if self.version == 1 else data[: -struct.calcsize(">I")]
+
+    def compute_checksum(self, body: bytes) -> int:
+        """!
+        @param body: The nonce, tag and ciphertext following the header.
+
+        @return The CRC32 of the authenticated part of the header and the body.
+        """
+        return zlib.crc32(body, zlib.crc32(self.authenticated_data()))
+
+
+def compute_pin_verifier(aes_key: bytes) -> bytes:
     """!
-    Generate a RSA key pair and save it to the @link globals PUBLIC_KEY_DIR @endlink and the private key to the device.
+    Compute the PIN verifier stored in the key file header from the key derived from the PIN.
+
+    The verifier is a truncated HMAC of a fixed label, so it tells a wrong PIN apart from a corrupt file
+    without revealing the derived key. It gives away nothing the tag of the encrypted key does not.
+
+    @param aes_key: The key derived from the PIN.
+
+    @return The PIN verifier.
+    """
+    return hmac.new(aes_key, PIN_VERIFIER_LABEL, "sha256").digest()[
+        :PIN_VERIFIER_LENGTH
+    ]
+
+
+def derive_key(pin: str, header: KeyFileHeader) -> bytes:
+    """!
+    Derive the AES key from the pin with the key derivation function and parameters from the header.
+
+    Derived keys are kept for the unlock session, so the private key is unlocked again without deriving
+    the key again. They are forgotten by @ref clear_derived_key_cache when the key is locked or the USB drive
+    is unmounted, see @ref TokenInventory, and @link DERIVED_KEY_CACHE_TTL @endlink seconds after their last use.
+    At most @link DERIVED_KEY_CACHE_SIZE @endlink of them are kept. @ref read_and_decrypt_private_key forgets
+    the key derived from a wrong PIN.
+
+    @param pin: The pin to derive the key from.
+    @param header: The header of the encrypted private key file.
+
+    @return The derived key.
+    """
+    cache_key = _get_derived_key_cache_key(pin, header)
+    now = time.monotonic()
+    with _derived_key_cache_lock:
+        for expired_key, (_, expires) in list(_derived_key_cache.items()):
+            if expires <= now:
+                del _derived_key_cache[expired_key]
+        cached = _derived_key_cache.get(cache_key)
+        if cached is not None:
+            _derived_key_cache[cache_key] = (cached[0], now + DERIVED_KEY_CACHE_TTL)
+            _derived_key_cache.move_to_end(cache_key)
+            return cached[0]
+    with span(STAGE_KEY_DERIVE):
+        if header.kdf == KDF_SCRYPT:
+            aes_key = derive_key_with_scrypt(
+                pin,
+                header.salt,
+                header.cost,
+                header.block_size,
+                header.parallelization,
+            )
+        else:
+            aes_key = derive_key_with_pbkdf2(pin, header.salt, header.cost)
+    with _derived_key_cache_lock:
+        _derived_key_cache[cache_key] = (aes_key, now + DERIVED_KEY_CACHE_TTL)
+        _derived_key_cache.move_to_end(cache_key)
+        while len(_derived_key_cache) > DERIVED_KEY_CACHE_SIZE:
+            _derived_key_cache.popitem(last=False)
+    return aes_key
+
+
+def _get_derived_key_cache_key(pin: str, header: KeyFileHeader) -> bytes:
+    """!
+    @return The key of the derived key in @ref _derived_key_cache, an HMAC with the secret of the process
+    over the salted key derivation parameters and the PIN.
+    """
+    return hmac.new(
+        _derived_key_cache_secret,
+        repr(header.kdf_parameters).encode("ascii") + pin.encode("utf-8"),
+        "sha256",
+    ).digest()
+
+
+def forget_derived_key(pin: str, header: KeyFileHeader):
+    """!
+    Forget the key derived from the pin with the parameters of the header.
+    """
+    with _derived_key_cache_lock:
+        _derived_key_cache.pop(_get_derived_key_cache_key(pin, header), None)
+
+
+def clear_derived_key_cache():
+    """!
+    Forget all the keys derived from the pin in this session, when the private key is locked or its drive removed.
+    """
+    with _derived_key_cache_lock:
+        _derived_key_cache.clear()
+
+
+def get_private_key_path(device_path: str) -> str:
+    """!
+    Get the path to the encrypted private key on the device.
+
+    @param device_path: The path to the device.
+
+    @return The path to the encrypted private key.
+    """
+    return f"{device_path}/{PRIVATE_KEY_DIR}{PRIVATE_KEY_FILENAME}{ENCRYPTED_EXTENSION}"
+
+
+def generate_and_save_keys(
+    device_path: str,
+    pin: str,
+    key_pair: tuple[bytes, bytes] = None,
+    key_type: str = DEFAULT_KEY_TYPE,
+) -> tuple[str, str]:
+    """!
+    Generate a key pair and save it to the @link globals PUBLIC_KEY_DIR @endlink and the private key to the device.
 
     @param device_path: The path to the device where the private key should be saved.
     @param pin: The pin to encrypt the private key with.
+    @param key_pair: The already generated private and public key to save (for example taken from a KeyPairPool).
+    If None, a new key pair is generated.
+    @param key_type: The type of the generated key pair, see lib.algorithms.KEY_TYPES.
 
     @return A tuple containing the path to the private key and the path to the public key.
     """
-    private_key, public_key = generate_rsa_key_pair()
+    private_key, public_key = key_pair or generate_key_pair(key_type)
     return (
         encrypt_and_save_private_key(pin, device_path, private_key),
         save_public_key(public_key),
     )
 
 
-def encrypt_and_save_private_key(pin: str, device_path: str, private_key: bytes) -> str:
+def encrypt_and_save_private_key(
+    pin: str, device_path: str, private_key: bytes, kdf: int = KDF_SCRYPT
+) -> str:
     """!
     Encrypt the private key with the pin and save it to the device.
 
+    The AES key is derived from the pin with a random salt, and the key derivation parameters are stored
+    in the @ref KeyFileHeader at the beginning of the file, together with the type and fingerprint of the key,
+    the PIN verifier and the checksum of the file.
+    The file is written to a temporary file first and then renamed, so an existing key is never left half-written.
+
     @param pin: The pin to encrypt the private key with.
     @param device_path: The path to the device where the private key should be saved.
     @param private_key: The private key to encrypt and save.
+    @param kdf: The identifier of the key derivation function.
 
     @return The path to the private key.
     """
-    aes_key = hash_string(pin)
-    private_key_nonce, private_key_tag, encrypted_private_key = encrypt_data_with_aes(
-        private_key, aes_key
+    header = KeyFileHeader.new(kdf, import_key(private_key))
+    aes_key = derive_key(pin, header)
+    header.pin_verifier = compute_pin_verifier(aes_key)
+    body = merge_cipher_data(
+        *encrypt_data_with_aes(private_key, aes_key, header.authenticated_data())
     )
+    header.checksum = header.compute_checksum(body)
 
-    private_key_path = (
-        f"{device_path}/{PRIVATE_KEY_DIR}{PRIVATE_KEY_FILENAME}{ENCRYPTED_EXTENSION}"
-    )
-    with open(
-        private_key_path,
-        "wb",
-    ) as file:
-        file.write(
-            merge_cipher_data(private_key_nonce, private_key_tag, encrypted_private_key)
-        )
+    private_key_path = get_private_key_path(device_path)
+    file, temporary_path = open_temporary_file(private_key_path)
+    try:
+        with file:
+            file.write(header.pack())
+            file.write(body)
+        os.replace(temporary_path, private_key_path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+    if _token_inventory is not None:
+        _token_inventory.invalidate(device_path)
     return private_key_path
 
 
+def read_key_file_header(device_path: str) -> KeyFileHeader:
+    """!
+    Read the header of the private key file on the device, without the PIN and without decrypting anything.
+
+    @param device_path: The path to the device where the private key is stored.
+
+    @return The KeyFileHeader or None when the file is a legacy file without a header.
+    """
+    with open(get_private_key_path(device_path), "rb") as file:
+        data = file.read(KeyFileHeader.SIZE)
+    if not data.startswith(KEY_FILE_MAGIC):
+        return None
+    return KeyFileHeader.unpack(data)
+
+
 def save_public_key(public_key: bytes) -> str:
     """!
     Save the public key to the @link globals PUBLIC_KEY_DIR @endlink under @link globals PUBLIC_KEY_FILENAME @endlink name.
@@ -92,25 +582,83 @@ def read_and_decrypt_private_key(pin: str, device_path: str) -> bytes:
     """!
     Read the private key from the device and decrypt it with the pin.
     The filename of the private key is @link globals PRIVATE_KEY_FILENAME @endlink with @link globals ENCRYPTED_EXTENSION @endlink.
+    Both versioned files and legacy files without the @ref KeyFileHeader are supported.
+
+    A version 2 file is checked against its checksum before the key derivation, and the PIN is checked
+    against the PIN verifier before the decryption, so a corrupt file and a wrong PIN are told apart.
 
     @param pin: The pin to decrypt the private key with.
     @param device_path: The path to the device where the private key is stored.
 
-    @return The decrypted private key or None when there is an error opening the private key file.
+    @return The decrypted private key.
+    @throws KeyFileError When the file is corrupt or not a private key file.
+    @throws WrongPinError When the PIN is wrong.
     """
-    aes_key = hash_string(pin)
-    with open(
-        f"{device_path}/{PRIVATE_KEY_DIR}{PRIVATE_KEY_FILENAME}{ENCRYPTED_EXTENSION}",
-        "rb",
-    ) as file:
-        data = file.read()
+    with span(STAGE_KEY_READ, device=device_path) as measured:
+        with open(get_private_key_path(device_path), "rb") as file:
+            data = file.read()
+        measured.add_bytes(len(data))
+
+    if not data.startswith(KEY_FILE_MAGIC):
         private_key_nonce, private_key_tag, encrypted_private_key = split_cipher_data(
             data
         )
-        return decrypt_data_with_aes(
-            private_key_nonce, private_key_tag, encrypted_private_key, aes_key
-        )
-    return None
+        try:
+            with span(STAGE_KEY_DECRYPT):
+                return decrypt_data_with_aes(
+                    private_key_nonce,
+                    private_key_tag,
+                    encrypted_private_key,
+                    hash_string(pin),
+                )
+        except ValueError:
+            raise WrongPinError("Wrong PIN or corrupt private key file")
+
+    header = KeyFileHeader.unpack(data)
+    body = data[header.size :]
+    if header.version >= 2 and header.compute_checksum(body) != header.checksum:
+        raise KeyFileError("The private key file is corrupt")
+    aes_key = derive_key(pin, header)
+    if header.version >= 2 and not hmac.compare_digest(
+        compute_pin_verifier(aes_key), header.pin_verifier
+    ):
+        forget_derived_key(pin, header)
+        raise WrongPinError("Wrong PIN")
+    private_key_nonce, private_key_tag, encrypted_private_key = split_cipher_data(body)
+    try:
+        with span(STAGE_KEY_DECRYPT):
+            return decrypt_data_with_aes(
+                private_key_nonce,
+                private_key_tag,
+                encrypted_private_key,
+                aes_key,
+                header.authenticated_data(),
+            )
+    except ValueError:
+        # Only the key derived from the right PIN is kept for the unlock session.
+        forget_derived_key(pin, header)
+        if header.version >= 2:
+            raise KeyFileError("The private key file is corrupt")
+        raise WrongPinError("Wrong PIN or corrupt private key file")
+
+
+def migrate_private_key(pin: str, device_path: str, kdf: int = KDF_SCRYPT) -> bool:
+    """!
+    Re-encrypt a legacy private key file (encrypted with the SHA256 hash of the pin)
+    or a file in an older version of the format in the current version with a salted key derivation function.
+
+    @param pin: The pin the private key is encrypted with.
+    @param device_path: The path to the device where the private key is stored.
+    @param kdf: The identifier of the key derivation function to use.
+
+    @return True if the file was migrated, False if it already was in the current version.
+    """
+    header = read_key_file_header(device_path)
+    if header is not None and header.version == KEY_FILE_VERSION:
+        return False
+    private_key = read_and_decrypt_private_key(pin, device_path)
+    encrypt_and_save_private_key(pin, device_path, private_key, kdf)
+    return True
 
 
 def read_public_key(path: str = None) -> bytes:
@@ -129,6 +677,31 @@ def read_public_key(path: str = None) -> bytes:
     return None
 
 
+def load_public_key(path: str = None):
+    """!
+    Read the public key from the path and parse it.
+    The default path is @link globals PUBLIC_KEY_DIR @endlink with @link globals PUBLIC_KEY_FILENAME @endlink.
+
+    Parsed keys are cached by the hash of the file contents, so a key file is parsed only once,
+    while a changed key file is parsed again. At most @link globals PUBLIC_KEY_CACHE_SIZE @endlink keys are kept.
+
+    @param path: The path to the public key.
+
+    @return The parsed public key.
+    """
+    public_key = read_public_key(path)
+    key_hash = SHA256.new(public_key).digest()
+    key = _public_key_cache.get(key_hash)
+    if key is None:
+        key = import_key(public_key)
+        _public_key_cache[key_hash] = key
+        if len(_public_key_cache) > PUBLIC_KEY_CACHE_SIZE:
+            _public_key_cache.popitem(last=False)
+    else:
+        _public_key_cache.move_to_end(key_hash)
+    return key
+
+
 def check_if_directory_contains_keys(device_path: str) -> bool:
     """!
     Check if the device contains the private key
@@ -138,6 +711,217 @@ def check_if_directory_contains_keys(device_path: str) -> bool:
 
     @return True if both files exist, False otherwise.
     """
-    return os.path.exists(
-        f"{device_path}/{PRIVATE_KEY_DIR}{PRIVATE_KEY_FILENAME}{ENCRYPTED_EXTENSION}"
-    ) and os.path.exists(f"{PUBLIC_KEY_DIR}/{PUBLIC_KEY_FILENAME}")
+    return os.path.exists(get_private_key_path(device_path)) and os.path.exists(
+        f"{PUBLIC_KEY_DIR}/{PUBLIC_KEY_FILENAME}"
+    )
+
+
+def find_key_device() -> str:
+    """!
+    Find the mount point of the first USB drive containing the private key.
+    Only the private key is looked for, signing never reads the public key.
+
+    @return The mount point of the USB drive or None when there is no such drive.
+    """
+    for device in get_usb_drives():
+        if os.path.exists(get_private_key_path(device.mount_point)):
+            return device.mount_point
+    return None
+
+
+@dataclass
+class KeyToken:
+    """! A dataclass representing a USB drive holding an encrypted private key, as described by its key file header.
+
+    Attributes: \n
+    drive: The USB drive. \n
+    format: The format of the key file: "legacy", "v1", "v2" or "invalid" when the header cannot be read. \n
+    fingerprint: The fingerprint of the public key, recorded since version 2. \n
+    key_type: The name of the key type, such as "rsa-4096", recorded since version 2. \n
+    created: The time the key file was created as a Unix timestamp, recorded since version 2.
+    """
+
+    drive: USBDrive
+    format: str
+    fingerprint: bytes = None
+    key_type: str = None
+    created: int = None
+
+    def __str__(self):
+        """!
+        Return a string representation of the token, the drive followed by the key type and the key fingerprint.
+
+        @return A string representation of the token.
+        """
+        if self.fingerprint is None:
+            return f"{self.drive} [{self.format} key]"
+        return f"{self.drive} [{self.key_type or 'key'} {self.fingerprint.hex()[:16]}]"
+
+
+def read_key_token(drive: USBDrive) -> KeyToken:
+    """!
+    Read the description of the private key on the USB drive from its key file header, without the PIN.
+
+    @param drive: The USB drive.
+
+    @return The KeyToken or None when the drive does not contain a private key.
+    """
+    try:
+        header = read_key_file_header(drive.mount_point)
+    except FileNotFoundError:
+        return None
+    except (OSError, KeyFileError):
+        return KeyToken(drive, "invalid")
+    if header is None:
+        return KeyToken(drive, "legacy")
+    if header.version < 2:
+        return KeyToken(drive, f"v{header.version}")
+    return KeyToken(
+        drive,
+        f"v{header.version}",
+        header.fingerprint,
+        header.key_type,
+        header.created,
+    )
+
+
+class TokenInventory:
+    """!
+    The inventory of the mounted USB drives holding a private key, with the description of every key.
+
+    The key file header of a drive is read once per mount and cached by the device, the mount point and
+    the mount generation assigned by lib.usb.MountWatcher. The entries of unmounted drives are dropped,
+    so a drive mounted again is read again, and listing the tokens never touches the drives otherwise.
+    When a drive holding a private key is unmounted, the keys derived from the PIN are forgotten too.
+    Drives without a mount generation, not seen by the watcher, are read every time.
+    """
+
+    def __init__(self, mount_watcher: MountWatcher = None):
+        """!
+        @param mount_watcher: The watcher of the mounted USB drives. If None, the shared one is used.
+        """
+        self._mount_watcher = mount_watcher or get_mount_watcher()
+        self._tokens = {}
+        self._current = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    @property
+    def tokens(self) -> list[KeyToken]:
+        """!
+        @return The KeyToken of every mounted USB drive holding a private key.
+        """
+        with self._lock:
+            if self._current is not None:
+                return list(self._current)
+        return self._get_tokens(self._mount_watcher.drives)
+
+    def get_token(self, drive: USBDrive) -> KeyToken:
+        """!
+        Get the description of the private key on the USB drive, reading it only the first time in a mount.
+
+        @param drive: The USB drive.
+
+        @return The KeyToken or None when the drive does not contain a private key.
+        """
+        if not drive.generation:
+            return read_key_token(drive)
+        mount = (drive.device, drive.mount_point, drive.generation)
+        with self._lock:
+            if mount in self._tokens:
+                return self._tokens[mount]
+        token = read_key_token(drive)
+        with self._lock:
+            self._tokens[mount] = token
+        return token
+
+    def invalidate(self, mount_point: str):
+        """!
+        Forget the cached description of the private key on the USB drive, after the key file was written.
+
+        @param mount_point: The mount point of the USB drive.
+        """
+        with self._lock:
+            for mount in [mount for mount in self._tokens if mount[1] == mount_point]:
+                del self._tokens[mount]
+            current = self._current
+        if current is not None and any(
+            token.drive.mount_point == mount_point for token in current
+        ):
+            self._drives_changed(self._mount_watcher.drives)
+
+    def subscribe(self, callback: callable):
+        """!
+        Subscribe to the changes of the mounted USB drives holding a private key.
+
+        The callback is called from the watcher thread with the list of KeyToken objects,
+        right away with the currently mounted drives and then after every change.
+
+        @param callback: The callback function to call with the list of tokens.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+            first = len(self._subscribers) == 1
+            current = list(self._current) if self._current is not None else None
+        if first:
+            self._mount_watcher.subscribe(self._drives_changed)
+        elif current is not None:
+            callback(current)
+
+    def unsubscribe(self, callback: callable):
+        """!
+        Unsubscribe from the changes of the mounted USB drives holding a private key.
+
+        @param callback: The callback function passed to @ref subscribe.
+        """
+        with self._lock:
+            if callback not in self._subscribers:
+                return
+            self._subscribers.remove(callback)
+            if self._subscribers:
+                return
+            self._current = None
+        self._mount_watcher.unsubscribe(self._drives_changed)
+
+    def _get_tokens(self, drives: list[USBDrive]) -> list[KeyToken]:
+        """!
+        @return The KeyToken of every drive holding a private key.
+        """
+        tokens = (self.get_token(drive) for drive in drives)
+        return [token for token in tokens if token is not None]
+
+    def _drives_changed(self, drives: list[USBDrive]):
+        """!
+        Drop the entries of the unmounted drives, read the new ones and notify the subscribers.
+        The keys derived from the PIN are forgotten when a drive holding a private key is unmounted.
+        """
+        mounts = {
+            (drive.device, drive.mount_point, drive.generation) for drive in drives
+        }
+        with self._lock:
+            removed = [self._tokens.pop(mount) for mount in set(self._tokens) - mounts]
+        if any(token is not None for token in removed):
+            clear_derived_key_cache()
+        tokens = self._get_tokens(drives)
+        with self._lock:
+            self._current = tokens
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(list(tokens))
+
+
+## @var _token_inventory
+# The token inventory shared by the whole application, created by @ref get_token_inventory.
+_token_inventory = None
+
+
+def get_token_inventory() -> TokenInventory:
+    """!
+    Get the token inventory shared by the whole application.
+
+    @return The shared TokenInventory.
+    """
+    global _token_inventory
+    if _token_inventory is None:
+        _token_inventory = TokenInventory()
+    return _token_inventory
@@ -0,0 +1,89 @@
+## @file key_pool.py
+# This module contains the pool pre-generating key pairs in worker processes.
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from lib.algorithms import DEFAULT_KEY_TYPE, KEY_TYPES, generate_key_pair
+
+
+class KeyPairPool:
+    """!
+    A pool of key pairs of one key type generated in the background by worker processes.
+
+    The pool keeps the requested number of key pairs generated or being generated.
+    Taking a key pair out of the pool immediately starts generating a new one in its place.
+    """
+
+    def __init__(
+        self,
+        size: int,
+        key_type: str = DEFAULT_KEY_TYPE,
+        workers: int = None,
+        on_change: callable = None,
+    ):
+        """!
+        @param size: The number of key pairs to keep in the pool.
+        @param key_type: The type of the generated key pairs, see lib.algorithms.KEY_TYPES.
+        @param workers: The number of worker processes. If None, up to the number of CPU cores is used.
+        @param on_change: The callback function called with the number of ready key pairs when a key pair is generated.
+
+        @throws ValueError If the key type is not supported.
+        """
+        if key_type not in KEY_TYPES:
+            raise ValueError(f"Unsupported key type {key_type}")
+        self.size = size
+        self.key_type = key_type
+        self.on_change = on_change
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers or min(size, os.cpu_count() or 1),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._futures = deque()
+        for _ in range(size):
+            self._submit()
+
+    @property
+    def ready(self) -> int:
+        """!
+        @return The number of key pairs that are already generated.
+        """
+        return sum(1 for future in self._futures if future.done())
+
+    def _submit(self):
+        """!
+        Start generating a new key pair.
+        """
+        future = self._executor.submit(generate_key_pair, self.key_type)
+        future.add_done_callback(self._generated)
+        self._futures.append(future)
+
+    def _generated(self, future: Future):
+        """!
+        Notify the on_change callback that a key pair has been generated.
+        """
+        if self.on_change is not None and not future.cancelled():
+            self.on_change(self.ready)
+
+    def get(self) -> tuple[bytes, bytes]:
+        """!
+        Take a key pair out of the pool, waiting for one to be generated if none is ready yet.
+
+        @return A tuple containing the private and public key in PEM format.
+        """
+        future = (
+            next((future for future in self._futures if future.done()), None)
+            or self._futures[0]
+        )
+        self._futures.remove(future)
+        self._submit()
+        return future.result()
+
+    def close(self):
+        """!
+        Stop the worker processes and discard the key pairs that are not generated yet.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._futures.clear()
@@ -0,0 +1,396 @@
+## @file metrics.py
+# This module contains the opt-in instrumentation of the signing pipeline.
+#
+# Every stage of signing and verification (reading and unlocking the key, importing it, parsing, hashing,
+# signing, verifying and writing) is timed by a span, which also counts the bytes the stage processed.
+# Instrumentation is off by default, and a span is then a shared object doing nothing,
+# so the pipeline only pays for a check of a global flag per stage.
+# Once enabled with @ref enable_metrics, the spans are aggregated per stage for @ref get_stats
+# and the Prometheus text format, and handed to the exporters, such as @ref log_exporter.
+
+import os
+import threading
+import time
+from dataclasses import dataclass
+
+## @var STAGE_KEY_READ
+# Reading the encrypted private key file from the USB drive.
+STAGE_KEY_READ = "key_read"
+## @var STAGE_KEY_DERIVE
+# Deriving the AES key from the PIN.
+STAGE_KEY_DERIVE = "key_derive"
+## @var STAGE_KEY_DECRYPT
+# Decrypting the private key.
+STAGE_KEY_DECRYPT = "key_decrypt"
+## @var STAGE_KEY_IMPORT
+# Parsing a private or public key in PEM format.
+STAGE_KEY_IMPORT = "key_import"
+## @var STAGE_PARSE
+# Parsing the structure of the PDF file, the cross-reference table and the signature fields.
+STAGE_PARSE = "parse"
+## @var STAGE_HASH
+# Reading and hashing the contents of the PDF file. Large files are memory-mapped,
+# so reading happens inside the hash function and is measured together with it.
+STAGE_HASH = "hash"
+## @var STAGE_SIGN
+# Creating the CMS signature.
+STAGE_SIGN = "sign"
+## @var STAGE_VERIFY
+# Verifying the CMS signatures.
+STAGE_VERIFY = "verify"
+## @var STAGE_WRITE
+# Writing the signed PDF file.
+STAGE_WRITE = "write"
+
+## @var METRICS_PREFIX
+# The prefix of the names of the exported Prometheus metrics.
+METRICS_PREFIX = "pades"
+## @var LOGGER_NAME
+# The name of the logger used by @ref log_exporter.
+LOGGER_NAME = "pades.metrics"
+
+
+@dataclass
+class StageStats:
+    """! A dataclass representing the aggregated measurements of a stage of the pipeline.
+
+    Attributes: \n
+    calls: The number of times the stage ran. \n
+    errors: The number of times the stage raised an error. \n
+    seconds: The total time spent in the stage. \n
+    max_seconds: The longest single run of the stage. \n
+    bytes: The total number of bytes the stage processed.
+    """
+
+    calls: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    max_seconds: float = 0.0
+    bytes: int = 0
+
+    def to_dict(self) -> dict:
+        """!
+        @return The statistics as a JSON serializable dictionary.
+        """
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "seconds": self.seconds,
+            "max_seconds": self.max_seconds,
+            "bytes": self.bytes,
+        }
+
+
+class Span:
+    """!
+    A single timed run of a stage, used as a context manager created by @ref span.
+
+    The span is recorded when the block exits, also when it raises an error.
+    """
+
+    __slots__ = ("name", "attributes", "bytes", "start", "seconds", "error")
+
+    def __init__(self, name: str, attributes: dict):
+        """!
+        @param name: The name of the stage, one of the STAGE_* constants.
+        @param attributes: The attributes describing the run, such as the file path, passed to the exporters.
+        """
+        self.name = name
+        self.attributes = attributes
+        self.bytes = 0
+        self.start = 0.0
+        self.seconds = 0.0
+        self.error = False
+
+    def add_bytes(self, size: int):
+        """!
+        Count bytes processed by the stage.
+
+        @param size: The number of bytes.
+        """
+        self.bytes += size
+
+    def __enter__(self) -> "Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.seconds = time.perf_counter() - self.start
+        self.error = exc_type is not None
+        _finish(self)
+
+
+class _DisabledSpan:
+    """!
+    The span returned by @ref span while instrumentation is off. It measures and records nothing.
+    """
+
+    __slots__ = ()
+
+    def add_bytes(self, size: int):
+        pass
+
+    def __enter__(self) -> "_DisabledSpan":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pass
+
+
+## @var _DISABLED_SPAN
+# The single span shared by all the stages while instrumentation is off.
+_DISABLED_SPAN = _DisabledSpan()
+
+## @var _enabled
+# Whether the spans are measured, changed by @ref enable_metrics and @ref disable_metrics.
+_enabled = False
+## @var _stats
+# The StageStats of every stage that ran since instrumentation was enabled or the statistics were reset.
+_stats = {}
+## @var _exporters
+# The callback functions called with every finished Span.
+_exporters = []
+## @var _lock
+# The lock guarding the statistics and the exporters, spans finish in worker threads too.
+_lock = threading.Lock()
+
+
+def is_enabled() -> bool:
+    """!
+    @return True if instrumentation is on.
+    """
+    return _enabled
+
+
+def enable_metrics(*exporters: callable):
+    """!
+    Turn instrumentation on.
+
+    @param exporters: The callback functions to call with every finished Span, such as @ref log_exporter.
+    """
+    global _enabled
+    with _lock:
+        for exporter in exporters:
+            if exporter not in _exporters:
+                _exporters.append(exporter)
+    _enabled = True
+
+
+def get_exporters() -> list[callable]:
+    """!
+    @return The exporters passed to @ref enable_metrics.
+    """
+    with _lock:
+        return list(_exporters)
+
+
+def disable_metrics():
+    """!
+    Turn instrumentation off and remove the exporters. The statistics collected so far are kept.
+    """
+    global _enabled
+    _enabled = False
+    with _lock:
+        _exporters.clear()
+
+
+def span(name: str, **attributes):
+    """!
+    Time a stage of the pipeline.
+
+    Used as `with span(STAGE_HASH, file=path) as s: ...`, calling `s.add_bytes(size)` for the processed data.
+
+    @param name: The name of the stage, one of the STAGE_* constants.
+    @param attributes: The attributes describing the run, passed to the exporters.
+
+    @return The Span, or a span doing nothing when instrumentation is off.
+    """
+    if not _enabled:
+        return _DISABLED_SPAN
+    return Span(name, attributes)
+
+
+def record(name: str, seconds: float, size: int = 0, **attributes):
+    """!
+    Record a run of a stage measured by the caller, for stages interleaved with others,
+    such as writing the chunks of a file while it is hashed.
+
+    @param name: The name of the stage, one of the STAGE_* constants.
+    @param seconds: The time spent in the stage.
+    @param size: The number of bytes the stage processed.
+    @param attributes: The attributes describing the run, passed to the exporters.
+    """
+    if not _enabled:
+        return
+    measured = Span(name, attributes)
+    measured.seconds = seconds
+    measured.bytes = size
+    _finish(measured)
+
+
+def _finish(measured: Span):
+    """!
+    Add the finished span to the statistics of its stage and hand it to the exporters.
+    """
+    with _lock:
+        stats = _stats.get(measured.name)
+        if stats is None:
+            stats = _stats[measured.name] = StageStats()
+        stats.calls += 1
+        stats.errors += measured.error
+        stats.seconds += measured.seconds
+        stats.max_seconds = max(stats.max_seconds, measured.seconds)
+        stats.bytes += measured.bytes
+        exporters = list(_exporters)
+    for exporter in exporters:
+        exporter(measured)
+
+
+def get_stats() -> dict[str, StageStats]:
+    """!
+    Get the statistics collected in this process.
+
+    @return A dictionary mapping the name of every stage that ran to a copy of its StageStats.
+    """
+    with _lock:
+        return {name: StageStats(**stats.to_dict()) for name, stats in _stats.items()}
+
+
+def reset_stats():
+    """!
+    Forget the statistics collected so far.
+    """
+    with _lock:
+        _stats.clear()
+
+
+def merge_stats(stats: dict[str, StageStats]):
+    """!
+    Add statistics collected elsewhere, such as in a worker process, to the statistics of this process.
+
+    @param stats: A dictionary mapping the names of stages to their StageStats, as returned by @ref get_stats.
+    """
+    with _lock:
+        for name, other in stats.items():
+            merged = _stats.get(name)
+            if merged is None:
+                merged = _stats[name] = StageStats()
+            merged.calls += other.calls
+            merged.errors += other.errors
+            merged.seconds += other.seconds
+            merged.max_seconds = max(merged.max_seconds, other.max_seconds)
+            merged.bytes += other.bytes
+
+
+def log_exporter(measured: Span):
+    """!
+    Log a finished span to the @ref LOGGER_NAME logger at the DEBUG level, or WARNING when the stage failed.
+
+    @param measured: The finished Span.
+    """
+    import logging
+
+    logger = logging.getLogger(LOGGER_NAME)
+    level = logging.WARNING if measured.error else logging.DEBUG
+    if not logger.isEnabledFor(level):
+        return
+    details = "".join(
+        f" {key}={value}" for key, value in sorted(measured.attributes.items())
+    )
+    logger.log(
+        level,
+        "%s%s %.3f ms %d bytes%s",
+        measured.name,
+        " failed" if measured.error else "",
+        measured.seconds * 1000,
+        measured.bytes,
+        details,
+    )
+
+
+def enable_trace_logging():
+    """!
+    Turn instrumentation on and log every finished span to the standard error with @ref log_exporter.
+    """
+    import logging
+
+    logging.basicConfig(format="%(name)s: %(message)s")
+    logging.getLogger(LOGGER_NAME).setLevel(logging.DEBUG)
+    enable_metrics(log_exporter)
+
+
+def format_prometheus() -> str:
+    """!
+    Format the statistics in the Prometheus text exposition format.
+
+    @return The text with a counter of calls, errors, seconds and bytes and a gauge of the longest run,
+    each labelled by stage.
+    """
+    metrics = [
+        ("calls_total", "counter", "Number of runs of the stage.", "calls"),
+        ("errors_total", "counter", "Number of failed runs of the stage.", "errors"),
+        ("seconds_total", "counter", "Time spent in the stage.", "seconds"),
+        ("max_seconds", "gauge", "Longest single run of the stage.", "max_seconds"),
+        ("bytes_total", "counter", "Bytes processed by the stage.", "bytes"),
+    ]
+    stats = get_stats()
+    lines = []
+    for suffix, metric_type, description, attribute in metrics:
+        name = f"{METRICS_PREFIX}_stage_{suffix}"
+        lines.append(f"# HELP {name} {description}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for stage in sorted(stats):
+            lines.append(
+                f'{name}{{stage="{stage}"}} {getattr(stats[stage], attribute)}'
+            )
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """!
+    Write the statistics in the Prometheus text format to a file, such as one read by the textfile collector
+    of the node exporter. The file is replaced atomically, so it is never read half-written.
+
+    @param path: The path to the file.
+    """
+    from lib.files import open_temporary_file
+
+    file, temporary_path = open_temporary_file(path)
+    try:
+        with file:
+            file.write(format_prometheus().encode("utf-8"))
+        os.replace(temporary_path, path)
+    except BaseException:
+        os.remove(temporary_path)
+        raise
+
+
+def serve_prometheus(port: int, host: str = "127.0.0.1"):
+    """!
+    Serve the statistics in the Prometheus text format over HTTP from a background thread.
+
+    @param port: The port to listen on, 0 picks a free one.
+    @param host: The address to listen on.
+
+    @return The ThreadingHTTPServer, whose server_address is the bound address and whose shutdown method stops it.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/", "/metrics"):
+                self.send_error(404)
+                return
+            body = format_prometheus().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    return server
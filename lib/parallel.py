@@ -0,0 +1,309 @@
+## @file parallel.py
+# This module contains the process pool engines for signing and verifying many PDF files on all CPU cores.
+
+import os
+import pickle
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from typing import Iterable, Iterator
+
+from lib.algorithms import export_key
+from lib.key_management import load_public_key
+from lib.metrics import (
+    enable_metrics,
+    get_exporters,
+    get_stats,
+    is_enabled,
+    merge_stats,
+    reset_stats,
+)
+from lib.pdf_signing import (
+    BatchSignResult,
+    SignResult,
+    VerifyResult,
+    get_signed_file_path,
+    import_key,
+    sign_pdf,
+    verify_pdf,
+)
+from lib.trust_store import get_trust_store
+from lib.verification_cache import VerificationCache
+
+## @var PENDING_TASKS_PER_WORKER
+# The number of tasks queued per worker process.
+# It bounds the number of open files and the memory used, no matter how many files are processed.
+PENDING_TASKS_PER_WORKER = 2
+
+## @var _worker_verification_cache
+# The verification cache opened once in each worker process by @ref _init_verify_worker.
+_worker_verification_cache = None
+## @var _worker_trust_store
+# The trust store opened once in each worker process by @ref _init_verify_worker.
+_worker_trust_store = None
+## @var _worker_private_key
+# The private key imported once in each worker process by @ref _init_signing_worker.
+_worker_private_key = None
+## @var _worker_digest_algorithm
+# The name of the digest algorithm the worker process signs with, set by @ref _init_signing_worker.
+_worker_digest_algorithm = None
+
+
+def _init_signing_worker(
+    private_key: bytes, digest_algorithm: str = None, metrics_exporters: list = None
+):
+    """!
+    Import the private key once when the worker process starts.
+
+    @param private_key: The private key in PEM format.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+    @param metrics_exporters: The lib.metrics exporters of the parent process or None when instrumentation is off.
+    The statistics are sent back to the parent process, see @ref _run_measured.
+    """
+    global _worker_private_key, _worker_digest_algorithm
+    if metrics_exporters is not None:
+        # A forked worker starts with a copy of the statistics of the parent process.
+        reset_stats()
+        enable_metrics(*metrics_exporters)
+    _worker_private_key = import_key(private_key)
+    _worker_digest_algorithm = digest_algorithm
+
+
+def _picklable_error(error: Exception) -> Exception:
+    """!
+    Make sure the error of a file can be sent back to the parent process with its result.
+
+    @return The error itself, or a RuntimeError describing it when it cannot be pickled.
+    """
+    try:
+        pickle.loads(pickle.dumps(error))
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+    return error
+
+
+def _sign_in_worker(file_path: str, signed_file_path: str) -> SignResult:
+    """!
+    Sign a single PDF file in the worker process with the key imported by @ref _init_signing_worker.
+    Any error fails only this file, it is returned in the result instead of ending the whole run.
+
+    @return The SignResult of the file.
+    """
+    result = SignResult(file_path, signed_file_path)
+    try:
+        sign_pdf(
+            file_path,
+            _worker_private_key,
+            signed_file_path,
+            digest_algorithm=_worker_digest_algorithm,
+        )
+    except Exception as e:
+        result.error = _picklable_error(e)
+    return result
+
+
+def _init_verify_worker(
+    cache_path: str, trust_store_path: str = None, metrics_exporters: list = None
+):
+    """!
+    Open the verification cache and the trust store once when the worker process starts.
+
+    @param cache_path: The path to the verification cache database or None to verify without the cache.
+    @param trust_store_path: The directory of the lib.trust_store.TrustStore used for the files without
+    a public key path, or None.
+    @param metrics_exporters: The lib.metrics exporters of the parent process or None when instrumentation is off.
+    The statistics are sent back to the parent process, see @ref _run_measured.
+    """
+    global _worker_verification_cache, _worker_trust_store
+    if metrics_exporters is not None:
+        # A forked worker starts with a copy of the statistics of the parent process.
+        reset_stats()
+        enable_metrics(*metrics_exporters)
+    if cache_path is not None:
+        _worker_verification_cache = VerificationCache(cache_path)
+    if trust_store_path is not None:
+        _worker_trust_store = get_trust_store(trust_store_path)
+
+
+def _verify_in_worker(file_path: str, public_key_path: str) -> VerifyResult:
+    """!
+    Verify a single signed PDF file in the worker process.
+    The public key is parsed only once per worker, thanks to @ref lib.key_management.load_public_key cache.
+    Without a public key path, the keys of the signers are looked up in the trust store opened by
+    @ref _init_verify_worker, when there is one.
+    Any error fails only this file, it is returned in the result instead of ending the whole run.
+
+    @return The VerifyResult of the file.
+    """
+    result = VerifyResult(file_path, public_key_path)
+    try:
+        if not public_key_path and _worker_trust_store is not None:
+            public_key = _worker_trust_store
+        else:
+            public_key = load_public_key(public_key_path)
+        if _worker_verification_cache is None:
+            report = verify_pdf(file_path, public_key)
+        else:
+            misses = _worker_verification_cache.stats.misses
+            report = _worker_verification_cache.verify_pdf(file_path, public_key)
+            result.cached = _worker_verification_cache.stats.misses == misses
+        result.valid = report.valid
+        result.signatures = report.signatures
+    except Exception as e:
+        result.error = _picklable_error(e)
+    return result
+
+
+def _get_worker_exporters() -> list:
+    """!
+    @return The lib.metrics exporters for the worker processes, None when instrumentation is off.
+    """
+    return get_exporters() if is_enabled() else None
+
+
+def _run_measured(function: callable, *args) -> tuple:
+    """!
+    Run the function in the worker process and take the lib.metrics statistics it collected,
+    so the parent process can add them to its own with @ref _collect_measured.
+
+    @return A tuple containing the result of the function and the statistics, or None when instrumentation is off.
+    """
+    result = function(*args)
+    if not is_enabled():
+        return result, None
+    stats = get_stats()
+    reset_stats()
+    return result, stats
+
+
+def _collect_measured(results: Iterator[tuple]) -> Iterator:
+    """!
+    Add the statistics of the results of @ref _run_measured to the statistics of this process.
+
+    @return The iterator over the results of the function.
+    """
+    for result, stats in results:
+        if stats:
+            merge_stats(stats)
+        yield result
+
+
+def bounded_map(
+    executor, function: callable, arguments: Iterable[tuple], max_pending: int
+) -> Iterator:
+    """!
+    Run the function for each of the arguments in the executor and yield the results as soon as they are ready.
+
+    At most max_pending tasks are submitted at a time, the next arguments are taken only when a task finishes.
+
+    @param executor: The executor to run the tasks in.
+    @param function: The function to run.
+    @param arguments: The iterable of argument tuples to call the function with.
+    @param max_pending: The maximum number of tasks submitted at once.
+
+    @return The iterator over the results, in the order of completion.
+    """
+    arguments = iter(arguments)
+    pending = set()
+    while True:
+        for args in arguments:
+            pending.add(executor.submit(function, *args))
+            if len(pending) >= max_pending:
+                break
+        if not pending:
+            return
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            yield future.result()
+
+
+def sign_many_parallel(
+    file_paths: Iterable[str],
+    private_key,
+    output_directory: str = None,
+    workers: int = None,
+    on_result: callable = None,
+    digest_algorithm: str = None,
+) -> BatchSignResult:
+    """!
+    Sign many PDF files with the same private key in a pool of worker processes.
+
+    Every worker imports the private key once at start-up and then takes the files from the queue.
+    When lib.metrics instrumentation is on, the statistics of the workers are added to the ones of this process.
+    The number of queued files is bounded by @ref PENDING_TASKS_PER_WORKER, so file_paths can be a lazy iterable.
+
+    @param file_paths: The paths to the PDF files to sign.
+    @param private_key: The private key (PEM or imported with @ref lib.pdf_signing.import_key) to sign the PDF files with.
+    @param output_directory: The directory to save the signed files to.
+    If None, each signed file is saved next to the original one with "_signed" suffix.
+    @param workers: The number of worker processes. If None, the number of CPU cores is used.
+    @param on_result: The callback function called with the SignResult of each file as soon as it is signed.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+
+    @return The BatchSignResult with the per-file results in the order of completion.
+    """
+    workers = workers or os.cpu_count() or 1
+    private_key = export_key(import_key(private_key))
+    tasks = (
+        (file_path, get_signed_file_path(file_path, output_directory))
+        for file_path in file_paths
+    )
+
+    batch_result = BatchSignResult()
+    start = time.perf_counter()
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_signing_worker,
+        initargs=(private_key, digest_algorithm, _get_worker_exporters()),
+    ) as executor:
+        for result in _collect_measured(
+            bounded_map(
+                executor,
+                partial(_run_measured, _sign_in_worker),
+                tasks,
+                workers * PENDING_TASKS_PER_WORKER,
+            )
+        ):
+            batch_result.results.append(result)
+            if on_result is not None:
+                on_result(result)
+    batch_result.elapsed = time.perf_counter() - start
+    return batch_result
+
+
+def verify_many_parallel(
+    pairs: Iterable[tuple[str, str]],
+    workers: int = None,
+    cache_path: str = None,
+    trust_store_path: str = None,
+) -> Iterator[VerifyResult]:
+    """!
+    Verify many signed PDF files in a pool of worker processes.
+
+    The number of queued files is bounded by @ref PENDING_TASKS_PER_WORKER, so pairs can be a lazy iterable
+    and the results can be streamed while the remaining files are still being verified.
+    When lib.metrics instrumentation is on, the statistics of the workers are added to the ones of this process.
+
+    @param pairs: The iterable of (PDF file path, public key path) pairs to verify.
+    @param workers: The number of worker processes. If None, the number of CPU cores is used.
+    @param cache_path: The path to the @ref lib.verification_cache.VerificationCache database shared by the workers,
+    or None to verify every file.
+    @param trust_store_path: The directory of the lib.trust_store.TrustStore to look up the keys of the signers in
+    for the pairs with an empty public key path, or None to use the default public key for them.
+
+    @return The iterator over VerifyResult of each file, in the order of completion.
+    """
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_verify_worker,
+        initargs=(cache_path, trust_store_path, _get_worker_exporters()),
+    ) as executor:
+        yield from _collect_measured(
+            bounded_map(
+                executor,
+                partial(_run_measured, _verify_in_worker),
+                pairs,
+                workers * PENDING_TASKS_PER_WORKER,
+            )
+        )
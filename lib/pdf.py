@@ -0,0 +1,765 @@
+## @file pdf.py
+# This module contains a minimal PDF reader and writer of incremental updates.
+#
+# Only the parts of the file needed to add and find signatures are read: the cross-reference sections
+# (tables and streams) and the objects looked up through them, so the cost does not depend on the document size.
+
+import re
+import zlib
+from typing import NamedTuple
+
+## @var WHITESPACE
+# The PDF whitespace characters.
+WHITESPACE = b"\x00\t\n\x0c\r "
+## @var DELIMITERS
+# The PDF delimiter characters.
+DELIMITERS = b"()<>[]{}/%"
+## @var READ_SIZE
+# The number of bytes read at once when parsing objects from a file.
+READ_SIZE = 16384
+## @var STARTXREF_SEARCH_SIZE
+# The number of bytes at the end of the file searched for the startxref keyword.
+STARTXREF_SEARCH_SIZE = 4096
+
+_REGULAR = re.compile(rb"[^\x00\t\n\x0c\r ()<>\[\]{}/%]*")
+_NUMBER = re.compile(rb"[+-]?(\d+\.?\d*|\.\d+)")
+_NAME_ESCAPE = re.compile(rb"#([0-9A-Fa-f]{2})")
+_LITERAL_ESCAPES = {
+    ord("n"): b"\n",
+    ord("r"): b"\r",
+    ord("t"): b"\t",
+    ord("b"): b"\b",
+    ord("f"): b"\f",
+    ord("("): b"(",
+    ord(")"): b")",
+    ord("\\"): b"\\",
+}
+
+
+class PdfError(ValueError):
+    """!
+    The error raised when a PDF file is malformed or uses features that are not supported.
+    """
+
+
+class Name(str):
+    """!
+    A PDF name object, such as /Type. The value does not include the leading slash.
+    """
+
+
+class Reference(NamedTuple):
+    """! A reference to an indirect PDF object.
+
+    Attributes: \n
+    number: The object number. \n
+    generation: The generation number.
+    """
+
+    number: int
+    generation: int = 0
+
+
+class Stream(NamedTuple):
+    """! A PDF stream object.
+
+    Attributes: \n
+    dictionary: The stream dictionary. \n
+    data: The raw (encoded) stream data.
+    """
+
+    dictionary: dict
+    data: bytes
+
+
+class Raw(bytes):
+    """!
+    Bytes written to the PDF file as they are, used for placeholders filled in after the file is written.
+    """
+
+
+class _Buffer:
+    """!
+    The bytes of a file, read lazily around the parsed positions.
+    """
+
+    def __init__(self, file=None, start: int = 0, data: bytes = b""):
+        self.file = file
+        self.start = start
+        self.data = bytearray(data)
+        self.eof = file is None
+
+    def fill(self, end: int) -> bool:
+        """!
+        Read the file until the buffer covers the end position.
+
+        @return True if the buffer covers the end position, False if the file ends before.
+        """
+        while self.start + len(self.data) < end and not self.eof:
+            self.file.seek(self.start + len(self.data))
+            chunk = self.file.read(max(READ_SIZE, end - self.start - len(self.data)))
+            if not chunk:
+                self.eof = True
+            self.data += chunk
+        return self.start + len(self.data) >= end
+
+    def byte(self, position: int) -> int:
+        """!
+        @return The byte at the position or None at the end of the file.
+        """
+        if not self.fill(position + 1):
+            return None
+        return self.data[position - self.start]
+
+    def slice(self, start: int, end: int) -> bytes:
+        """!
+        @return The bytes between the positions (fewer at the end of the file).
+        """
+        self.fill(end)
+        return bytes(self.data[start - self.start : end - self.start])
+
+    def find(self, sub: bytes, position: int) -> int:
+        """!
+        @return The position of the first occurrence of sub at or after the position, or -1 if there is none.
+        """
+        while True:
+            found = self.data.find(sub, position - self.start)
+            if found >= 0:
+                return self.start + found
+            if self.eof:
+                return -1
+            self.fill(self.start + 2 * len(self.data) + READ_SIZE)
+
+    def match(self, pattern: re.Pattern, position: int, size: int = 256) -> bytes:
+        """!
+        @return The bytes matching the pattern at the position.
+        """
+        while True:
+            available = self.fill(position + size)
+            matched = pattern.match(self.data, position - self.start)
+            if not available or matched.end() < len(self.data):
+                return matched.group()
+            size *= 2
+
+
+class _Parser:
+    """!
+    The parser of PDF objects.
+    """
+
+    def __init__(self, buffer: _Buffer):
+        self.buffer = buffer
+
+    def skip_whitespace(self, position: int) -> int:
+        """!
+        @return The position of the first byte that is neither whitespace nor a part of a comment.
+        """
+        while True:
+            byte = self.buffer.byte(position)
+            if byte is None:
+                return position
+            if byte == ord("%"):
+                while byte is not None and byte not in b"\r\n":
+                    position += 1
+                    byte = self.buffer.byte(position)
+            elif byte in WHITESPACE:
+                position += 1
+            else:
+                return position
+
+    def token(self, position: int) -> tuple[bytes, int]:
+        """!
+        Read a keyword or a number.
+
+        @return A tuple containing the token and the position after it.
+        """
+        position = self.skip_whitespace(position)
+        token = self.buffer.match(_REGULAR, position)
+        return token, position + len(token)
+
+    def parse(self, position: int):
+        """!
+        Parse a direct object.
+
+        @return A tuple containing the object and the position after it.
+        """
+        position = self.skip_whitespace(position)
+        byte = self.buffer.byte(position)
+        if byte is None:
+            raise PdfError("Unexpected end of file")
+        if byte == ord("/"):
+            name = self.buffer.match(_REGULAR, position + 1)
+            value = _NAME_ESCAPE.sub(lambda m: bytes.fromhex(m.group(1).decode()), name)
+            return Name(value.decode("latin-1")), position + 1 + len(name)
+        if byte == ord("<"):
+            if self.buffer.byte(position + 1) == ord("<"):
+                return self._parse_dictionary(position + 2)
+            end = self.buffer.find(b">", position + 1)
+            if end < 0:
+                raise PdfError("Unterminated hexadecimal string")
+            hex_string = self.buffer.slice(position + 1, end).translate(
+                None, WHITESPACE
+            )
+            if len(hex_string) % 2:
+                hex_string += b"0"
+            try:
+                return bytes.fromhex(hex_string.decode("ascii")), end + 1
+            except ValueError:
+                raise PdfError("Invalid hexadecimal string") from None
+        if byte == ord("("):
+            return self._parse_literal_string(position + 1)
+        if byte == ord("["):
+            array = []
+            position += 1
+            while True:
+                position = self.skip_whitespace(position)
+                if self.buffer.byte(position) == ord("]"):
+                    return array, position + 1
+                value, position = self.parse(position)
+                array.append(value)
+
+        token, end = self.token(position)
+        if token == b"true":
+            return True, end
+        if token == b"false":
+            return False, end
+        if token == b"null":
+            return None, end
+        if not _NUMBER.fullmatch(token):
+            raise PdfError(f"Unexpected token at offset {position}: {token[:20]!r}")
+        if b"." in token:
+            return float(token), end
+        number = int(token)
+        generation, generation_end = self.token(end)
+        if generation.isdigit():
+            keyword, keyword_end = self.token(generation_end)
+            if keyword == b"R":
+                return Reference(number, int(generation)), keyword_end
+        return number, end
+
+    def _parse_dictionary(self, position: int) -> tuple[dict, int]:
+        dictionary = {}
+        while True:
+            position = self.skip_whitespace(position)
+            if self.buffer.slice(position, position + 2) == b">>":
+                return dictionary, position + 2
+            key, position = self.parse(position)
+            if not isinstance(key, Name):
+                raise PdfError(f"Dictionary key is not a name at offset {position}")
+            dictionary[key], position = self.parse(position)
+
+    def _parse_literal_string(self, position: int) -> tuple[bytes, int]:
+        value = bytearray()
+        depth = 0
+        while True:
+            byte = self.buffer.byte(position)
+            position += 1
+            if byte is None:
+                raise PdfError("Unterminated string")
+            if byte == ord("\\"):
+                byte = self.buffer.byte(position)
+                position += 1
+                if byte in _LITERAL_ESCAPES:
+                    value += _LITERAL_ESCAPES[byte]
+                elif byte is not None and ord("0") <= byte <= ord("7"):
+                    digits = bytes([byte])
+                    while len(digits) < 3 and self.buffer.byte(position) in b"01234567":
+                        digits += bytes([self.buffer.byte(position)])
+                        position += 1
+                    value.append(int(digits, 8) & 0xFF)
+                elif byte == ord("\r"):
+                    if self.buffer.byte(position) == ord("\n"):
+                        position += 1
+                elif byte != ord("\n") and byte is not None:
+                    value.append(byte)
+            elif byte == ord("("):
+                depth += 1
+                value.append(byte)
+            elif byte == ord(")"):
+                if depth == 0:
+                    return bytes(value), position
+                depth -= 1
+                value.append(byte)
+            else:
+                value.append(byte)
+
+
+def serialize(value) -> bytes:
+    """!
+    Serialize a PDF object.
+
+    Strings are written as hexadecimal strings, so they never need escaping.
+
+    @param value: The object to serialize.
+
+    @return The serialized object.
+    """
+    if isinstance(value, Raw):
+        return bytes(value)
+    if value is None:
+        return b"null"
+    if value is True:
+        return b"true"
+    if value is False:
+        return b"false"
+    if isinstance(value, Name):
+        return b"/" + re.sub(
+            rb"[^!-~]|[#()<>\[\]{}/%]",
+            lambda m: b"#%02X" % m.group()[0],
+            value.encode("latin-1"),
+        )
+    if isinstance(value, Reference):
+        return b"%d %d R" % value
+    if isinstance(value, int):
+        return b"%d" % value
+    if isinstance(value, float):
+        return (b"%.6f" % value).rstrip(b"0").rstrip(b".")
+    if isinstance(value, (bytes, bytearray)):
+        return b"<" + bytes(value).hex().encode("ascii") + b">"
+    if isinstance(value, list):
+        return b"[" + b" ".join(serialize(item) for item in value) + b"]"
+    if isinstance(value, dict):
+        return (
+            b"<<"
+            + b"".join(
+                serialize(Name(key)) + b" " + serialize(item)
+                for key, item in value.items()
+            )
+            + b">>"
+        )
+    raise PdfError(f"Cannot serialize {type(value).__name__}")
+
+
+def _decode_stream(stream: Stream) -> bytes:
+    """!
+    Decode the data of a stream compressed with FlateDecode, with optional PNG predictors.
+
+    @return The decoded data.
+    """
+    filters = stream.dictionary.get("Filter")
+    parameters = stream.dictionary.get("DecodeParms") or {}
+    if isinstance(filters, list):
+        if len(filters) > 1:
+            raise PdfError("Multiple stream filters are not supported")
+        filters = filters[0] if filters else None
+        parameters = parameters[0] if isinstance(parameters, list) else parameters
+    if filters is None:
+        return stream.data
+    if filters != "FlateDecode":
+        raise PdfError(f"Stream filter {filters} is not supported")
+    try:
+        data = zlib.decompress(stream.data)
+    except zlib.error as e:
+        raise PdfError(f"Invalid compressed stream: {e}") from None
+
+    predictor = (parameters or {}).get("Predictor", 1)
+    if predictor == 1:
+        return data
+    if predictor < 10:
+        raise PdfError(f"Predictor {predictor} is not supported")
+    columns = parameters.get("Columns", 1)
+    bytes_per_pixel = max(
+        1, parameters.get("Colors", 1) * parameters.get("BitsPerComponent", 8) // 8
+    )
+    row_size = columns * bytes_per_pixel
+    previous = bytearray(row_size)
+    decoded = bytearray()
+    for start in range(0, len(data) - row_size, row_size + 1):
+        row_filter = data[start]
+        row = bytearray(data[start + 1 : start + 1 + row_size])
+        for i in range(row_size):
+            left = row[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+            up = previous[i]
+            if row_filter == 1:
+                row[i] = (row[i] + left) & 0xFF
+            elif row_filter == 2:
+                row[i] = (row[i] + up) & 0xFF
+            elif row_filter == 3:
+                row[i] = (row[i] + (left + up) // 2) & 0xFF
+            elif row_filter == 4:
+                up_left = previous[i - bytes_per_pixel] if i >= bytes_per_pixel else 0
+                estimate = left + up - up_left
+                distances = (
+                    abs(estimate - left),
+                    abs(estimate - up),
+                    abs(estimate - up_left),
+                )
+                paeth = (left, up, up_left)[distances.index(min(distances))]
+                row[i] = (row[i] + paeth) & 0xFF
+        decoded += row
+        previous = row
+    return bytes(decoded)
+
+
+class PdfReader:
+    """!
+    A reader of the structure of a PDF file.
+
+    Reading the cross-reference sections and looking up objects reads only those parts of the file.
+    """
+
+    def __init__(self, file):
+        """!
+        @param file: The binary file object of the PDF file, open for reading.
+        """
+        self.file = file
+        file.seek(0, 2)
+        ## The size of the file in bytes.
+        self.size = file.tell()
+        ## The entries of the cross-reference sections, keyed by the object number.
+        # Each entry is a (1, offset, generation) tuple for objects stored in the file
+        # or a (2, object stream number, index) tuple for objects stored in object streams.
+        self.xref = {}
+        ## The trailer dictionary of the newest revision.
+        self.trailer = None
+        ## The offset of the newest cross-reference section.
+        self.startxref = self._find_startxref()
+        ## True if the newest cross-reference section is a cross-reference stream.
+        self.xref_stream = False
+        self._object_streams = {}
+        try:
+            self._read_xref_sections()
+        except (KeyError, TypeError, IndexError) as e:
+            raise PdfError(f"Malformed cross-reference section: {e!r}") from None
+
+    def _find_startxref(self) -> int:
+        start = max(0, self.size - STARTXREF_SEARCH_SIZE)
+        self.file.seek(start)
+        tail = self.file.read()
+        position = tail.rfind(b"startxref")
+        if position < 0:
+            raise PdfError("startxref not found, not a PDF file")
+        match = re.match(rb"startxref\s+(\d+)", tail[position:])
+        if not match:
+            raise PdfError("Invalid startxref")
+        return int(match.group(1))
+
+    def _read_xref_sections(self):
+        offset = self.startxref
+        visited = set()
+        while offset is not None:
+            if offset in visited or not 0 <= offset < self.size:
+                raise PdfError(f"Invalid cross-reference offset {offset}")
+            visited.add(offset)
+            parser = _Parser(_Buffer(self.file, offset))
+            token, _ = parser.token(offset)
+            if token == b"xref":
+                trailer = self._read_xref_table(parser, offset)
+                if "XRefStm" in trailer:
+                    self._read_xref_stream(trailer["XRefStm"])
+            else:
+                trailer = self._read_xref_stream(offset)
+            if not isinstance(trailer, dict):
+                raise PdfError(f"Invalid trailer of the section at offset {offset}")
+            if self.trailer is None:
+                self.trailer = trailer
+                self.xref_stream = token != b"xref"
+            offset = trailer.get("Prev")
+
+    def _read_xref_table(self, parser: _Parser, offset: int) -> dict:
+        _, position = parser.token(offset)
+        while True:
+            token, end = parser.token(position)
+            if token == b"trailer":
+                trailer, _ = parser.parse(end)
+                return trailer
+            count, position = parser.token(end)
+            if not token.isdigit() or not count.isdigit():
+                raise PdfError(f"Invalid cross-reference table at offset {offset}")
+            first, count = int(token), int(count)
+            position = parser.skip_whitespace(position)
+            entries = parser.buffer.slice(position, position + count * 20)
+            for index, entry in enumerate(
+                re.findall(rb"(\d{10}) (\d{5}) ([nf])", entries)
+            ):
+                if entry[2] == b"n":
+                    self.xref.setdefault(
+                        first + index, (1, int(entry[0]), int(entry[1]))
+                    )
+                else:
+                    self.xref.setdefault(first + index, (0, 0, 0))
+            position += count * 20
+
+    def _read_xref_stream(self, offset: int) -> dict:
+        _, stream = self._read_object_at(offset)
+        if not isinstance(stream, Stream) or stream.dictionary.get("Type") != "XRef":
+            raise PdfError(f"Invalid cross-reference stream at offset {offset}")
+        dictionary = stream.dictionary
+        data = _decode_stream(stream)
+        widths = dictionary.get("W")
+        size = dictionary.get("Size")
+        if (
+            not isinstance(widths, list)
+            or len(widths) != 3
+            or not all(isinstance(width, int) and 0 <= width <= 8 for width in widths)
+            or not isinstance(size, int)
+            or size < 0
+        ):
+            raise PdfError(
+                f"Invalid /W or /Size of the cross-reference stream at offset {offset}"
+            )
+        entry_size = sum(widths)
+        index = dictionary.get("Index", [0, size])
+        if (
+            not isinstance(index, list)
+            or len(index) % 2
+            or not all(isinstance(value, int) and value >= 0 for value in index)
+        ):
+            raise PdfError(
+                f"Invalid /Index of the cross-reference stream at offset {offset}"
+            )
+        position = 0
+        for first, count in zip(index[::2], index[1::2]):
+            if position + count * entry_size > len(data) + entry_size:
+                raise PdfError("Truncated cross-reference stream")
+            for number in range(first, first + count):
+                fields = []
+                for width in widths:
+                    fields.append(
+                        int.from_bytes(data[position : position + width], "big")
+                    )
+                    position += width
+                if widths[0] == 0:
+                    fields[0] = 1
+                self.xref.setdefault(number, tuple(fields))
+        return dictionary
+
+    def _read_object_at(self, offset: int) -> tuple[Reference, object]:
+        """!
+        Read the indirect object stored at the offset.
+
+        @return A tuple containing the reference to the object and the object.
+        """
+        parser = _Parser(_Buffer(self.file, offset))
+        number, position = parser.token(offset)
+        generation, position = parser.token(position)
+        keyword, position = parser.token(position)
+        if not number.isdigit() or not generation.isdigit() or keyword != b"obj":
+            raise PdfError(f"No object at offset {offset}")
+        value, position = parser.parse(position)
+        keyword, end = parser.token(position)
+        if keyword == b"stream" and isinstance(value, dict):
+            if parser.buffer.byte(end) == ord("\r"):
+                end += 1
+            if parser.buffer.byte(end) == ord("\n"):
+                end += 1
+            length = self.resolve(value.get("Length"))
+            if not isinstance(length, int) or length < 0:
+                raise PdfError(f"Invalid stream length at offset {offset}")
+            self.file.seek(end)
+            value = Stream(value, self.file.read(length))
+        return Reference(int(number), int(generation)), value
+
+    def get(self, reference: Reference):
+        """!
+        Look up an indirect object.
+
+        @param reference: The reference to the object.
+
+        @return The object or None when it does not exist.
+        """
+        entry = self.xref.get(reference.number)
+        if entry is None or entry[0] == 0:
+            return None
+        try:
+            if entry[0] == 1:
+                _, value = self._read_object_at(entry[1])
+                return value
+            objects = self._object_streams.get(entry[1])
+            if objects is None:
+                objects = self._read_object_stream(entry[1])
+                self._object_streams[entry[1]] = objects
+            return objects.get(reference.number)
+        except (KeyError, TypeError, IndexError) as e:
+            raise PdfError(f"Malformed object {reference.number}: {e!r}") from None
+
+    def _read_object_stream(self, number: int) -> dict:
+        stream = self.get(Reference(number))
+        if not isinstance(stream, Stream):
+            raise PdfError(f"Object {number} is not an object stream")
+        data = _decode_stream(stream)
+        parser = _Parser(_Buffer(data=data))
+        first = stream.dictionary["First"]
+        offsets = []
+        position = 0
+        for _ in range(stream.dictionary["N"]):
+            object_number, position = parser.token(position)
+            object_offset, position = parser.token(position)
+            offsets.append((int(object_number), int(object_offset)))
+        objects = {}
+        for object_number, object_offset in offsets:
+            objects[object_number], _ = parser.parse(first + object_offset)
+        return objects
+
+    def resolve(self, value):
+        """!
+        Look up the object if the value is a reference.
+
+        @return The object or the value itself.
+        """
+        for _ in range(64):
+            if not isinstance(value, Reference):
+                return value
+            value = self.get(value)
+        raise PdfError("Too many nested references")
+
+    def reference_of(self, dictionary: dict, key: str):
+        """!
+        @return The reference stored under the key or None when the value is a direct object.
+        """
+        value = dictionary.get(key)
+        return value if isinstance(value, Reference) else None
+
+    @property
+    def root(self) -> dict:
+        """!
+        @return The document catalog.
+        @throws PdfError When the trailer has no /Root or it is not a dictionary.
+        """
+        root = self.resolve(self.trailer.get("Root"))
+        if not isinstance(root, dict):
+            raise PdfError("Document has no catalog")
+        return root
+
+    def first_page(self) -> tuple[Reference, dict]:
+        """!
+        Find the first page of the document.
+
+        @return A tuple containing the reference to the first page and its dictionary.
+        """
+        node_reference = self.root.get("Pages")
+        for _ in range(64):
+            node = self.resolve(node_reference)
+            if not isinstance(node, dict):
+                break
+            if node.get("Type") == "Page":
+                return node_reference, node
+            kids = self.resolve(node.get("Kids")) or []
+            if not kids:
+                break
+            node_reference = kids[0]
+        raise PdfError("Document has no pages")
+
+
+class IncrementalUpdate:
+    """!
+    An incremental update of a PDF file: new and changed objects appended after the original file
+    with a cross-reference section and a trailer pointing to the previous revision.
+    """
+
+    def __init__(self, reader: PdfReader):
+        """!
+        @param reader: The reader of the file to update.
+        """
+        if "Encrypt" in reader.trailer:
+            raise PdfError("Encrypted PDF files are not supported")
+        if not isinstance(reader.trailer.get("Root"), Reference):
+            raise PdfError("Document has no catalog")
+        size = reader.trailer.get("Size")
+        self.reader = reader
+        self.objects = {}
+        self.next_number = max(
+            size if isinstance(size, int) else 0, max(reader.xref, default=0) + 1
+        )
+
+    def add(self, value) -> Reference:
+        """!
+        Add a new object.
+
+        @return The reference to the new object.
+        """
+        reference = Reference(self.next_number)
+        self.next_number += 1
+        self.objects[reference] = value
+        return reference
+
+    def update(self, reference: Reference, value):
+        """!
+        Replace an existing object.
+        """
+        self.objects[reference] = value
+
+    def build(self) -> tuple[bytes, dict]:
+        """!
+        Build the bytes appended to the original file.
+
+        @return A tuple containing the bytes and the offsets of the written objects (relative to the start of the file),
+        keyed by the references.
+        """
+        base = self.reader.size
+        self.reader.file.seek(max(0, base - 1))
+        data = (
+            bytearray()
+            if self.reader.file.read(1) in (b"\n", b"\r")
+            else bytearray(b"\n")
+        )
+        offsets = {}
+        for reference, value in self.objects.items():
+            offsets[reference] = base + len(data)
+            data += b"%d %d obj\n" % reference + serialize(value) + b"\nendobj\n"
+
+        trailer = {
+            "Size": self.next_number,
+            "Root": self.reader.trailer["Root"],
+            "Prev": self.reader.startxref,
+        }
+        for key in ("Info", "ID"):
+            if key in self.reader.trailer:
+                trailer[key] = self.reader.trailer[key]
+
+        xref_offset = base + len(data)
+        if self.reader.xref_stream:
+            xref_reference = Reference(self.next_number)
+            offsets[xref_reference] = xref_offset
+            trailer["Size"] = self.next_number + 1
+            entries = sorted(offsets.items())
+            # The offset field is as wide as the largest offset, the xref stream itself, needs.
+            offset_width = max(1, (xref_offset.bit_length() + 7) // 8)
+            rows = b"".join(
+                bytes([1])
+                + offset.to_bytes(offset_width, "big")
+                + reference.generation.to_bytes(2, "big")
+                for reference, offset in entries
+            )
+            trailer.update(
+                {
+                    "Type": Name("XRef"),
+                    "W": [1, offset_width, 2],
+                    "Index": self._index(entries),
+                    "Length": len(rows),
+                }
+            )
+            data += (
+                b"%d 0 obj\n" % xref_reference.number
+                + serialize(trailer)
+                + b"\nstream\n"
+                + rows
+                + b"\nendstream\nendobj\n"
+            )
+        else:
+            entries = sorted(offsets.items())
+            # The free head of the list of deleted objects keeps the section zero-indexed
+            data += b"xref\n0 1\n0000000000 65535 f\r\n"
+            index = self._index(entries)
+            position = 0
+            for first, count in zip(index[::2], index[1::2]):
+                data += b"%d %d\n" % (first, count)
+                for reference, offset in entries[position : position + count]:
+                    data += b"%010d %05d n\r\n" % (offset, reference.generation)
+                position += count
+            data += b"trailer\n" + serialize(trailer) + b"\n"
+        data += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+        return bytes(data), offsets
+
+    @staticmethod
+    def _index(entries: list) -> list[int]:
+        """!
+        @return The first object numbers and counts of the consecutive runs of the sorted references.
+        """
+        index = []
+        for reference, _ in entries:
+            if index and index[-2] + index[-1] == reference.number:
+                index[-1] += 1
+            else:
+                index += [reference.number, 1]
+        return index
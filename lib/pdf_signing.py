@@ -1,66 +1,1923 @@
 ## @file pdf_signing.py
 # This module contains functions related to signing and verifying signed PDF files.
 
-from Crypto.PublicKey import RSA
+import inspect
+import mmap
+import os
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+
 import Crypto.Hash.SHA256 as SHA256
-from Crypto.Signature import pss
+
+from lib.algorithms import (
+    DEFAULT_DIGEST_ALGORITHM,
+    SIGNATURE_ALGORITHMS,
+    get_digest_algorithm,
+    get_key_signature_algorithm,
+    get_signature_algorithm,
+    import_key,
+)
+from lib.cms import (
+    SignerInfo,
+    build_signed_attributes,
+    build_signed_data,
+    parse_signed_data,
+)
+from lib.crypt import get_key_fingerprint
+from lib.files import open_temporary_file
+from lib.metrics import (
+    STAGE_HASH,
+    STAGE_PARSE,
+    STAGE_SIGN,
+    STAGE_VERIFY,
+    STAGE_WRITE,
+    is_enabled,
+    record,
+    span,
+)
+from lib.pdf import IncrementalUpdate, Name, PdfError, PdfReader, Raw
+from lib.trust_store import TrustStore
 
 ## @var SIGNATURE_LENGTH
-# The length of the signature in bytes.
+# The length of the raw signature in bytes, appended to the end of the file by older versions.
 SIGNATURE_LENGTH = 512
+## @var SIGNATURE_CONTENTS_SIZE
+# The number of bytes reserved for the CMS signature in the /Contents of the signature dictionary.
+SIGNATURE_CONTENTS_SIZE = 8192
+## @var BYTE_RANGE_PLACEHOLDER
+# The placeholder of the /ByteRange, wide enough for the byte range of files up to 10 GB.
+BYTE_RANGE_PLACEHOLDER = b"[0 0000000000 0000000000 0000000000]"
+## @var CHUNK_SIZE
+# The size of the buffer (in bytes) used when hashing and copying files.
+CHUNK_SIZE = 1024 * 1024
+## @var MMAP_THRESHOLD
+# The minimum number of bytes read from a file for it to be memory-mapped instead of read into a buffer.
+MMAP_THRESHOLD = 4 * CHUNK_SIZE
+
+
+class OperationCancelled(Exception):
+    """!
+    Raised by a progress callback to stop signing or verifying a file.
+    """
+
+
+def _map_file(file, length: int = None) -> tuple[mmap.mmap, int, int]:
+    """!
+    Memory-map the file read-only, if it is a regular file with at least @ref MMAP_THRESHOLD bytes to read.
+
+    @param file: The binary file object.
+    @param length: The number of bytes to read from the current position. If None, the file is read until its end.
+
+    @return A tuple containing the mapping, the start and the end of the part to read,
+    or None if the file cannot be mapped, such as a pipe, an in-memory file or a file on some FUSE mounts.
+    """
+    try:
+        fileno = file.fileno()
+        start = file.tell()
+        size = os.fstat(fileno).st_size
+    except (OSError, ValueError):
+        return None
+    end = size if length is None else start + length
+    if end - start < MMAP_THRESHOLD or end > size:
+        return None
+    try:
+        mapped = mmap.mmap(fileno, 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    if hasattr(mapped, "madvise"):
+        mapped.madvise(mmap.MADV_SEQUENTIAL)
+    return mapped, start, end
+
+
+def _iterate_chunks(file, length: int = None):
+    """!
+    Iterate over the contents of an open binary file from its current position in chunks of @ref CHUNK_SIZE bytes.
+
+    Large regular files are memory-mapped and every chunk is a view of the mapping,
+    so the data goes from the page cache straight to the hash without being copied.
+    Other files are read into a single reused buffer. Either way, a chunk is only valid until the next one
+    is requested, and the file is left positioned after the last chunk.
+
+    @param file: The binary file object to read from.
+    @param length: The number of bytes to read. If None, the file is read until its end.
+
+    @return The generator of memoryview chunks.
+    """
+    mapping = _map_file(file, length)
+    if mapping is not None:
+        mapped, start, end = mapping
+        with mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(start, end, CHUNK_SIZE):
+                    with view[offset : min(offset + CHUNK_SIZE, end)] as chunk:
+                        yield chunk
+            finally:
+                view.release()
+        file.seek(end)
+        return
+
+    buffer = bytearray(CHUNK_SIZE)
+    view = memoryview(buffer)
+    remaining = length
+    while remaining is None or remaining > 0:
+        size = CHUNK_SIZE if remaining is None else min(CHUNK_SIZE, remaining)
+        read = file.readinto(view[:size])
+        if not read:
+            break
+        yield view[:read]
+        if remaining is not None:
+            remaining -= read
+
+
+def hash_file(
+    file,
+    length: int = None,
+    file_hash: SHA256.SHA256Hash = None,
+    progress: callable = None,
+) -> SHA256.SHA256Hash:
+    """!
+    Hash the contents of an open binary file with SHA256 in chunks of @ref CHUNK_SIZE bytes.
+
+    The file is read from its current position, so the memory used does not depend on the file size.
+    Large files are memory-mapped and hashed without copying, see @ref _iterate_chunks.
+
+    @param file: The binary file object to read from.
+    @param length: The number of bytes to hash. If None, the file is hashed until its end.
+    @param file_hash: The hash object to update. If None, a new SHA256 hash object is created.
+    @param progress: The callback function called with the number of bytes hashed after every chunk.
+
+    @return The SHA256 hash object.
+    """
+    if file_hash is None:
+        file_hash = SHA256.new()
+    with span(STAGE_HASH) as measured:
+        for chunk in _iterate_chunks(file, length):
+            file_hash.update(chunk)
+            measured.add_bytes(len(chunk))
+            if progress is not None:
+                progress(len(chunk))
+    return file_hash
+
+
+@dataclass
+class SignResult:
+    """! A dataclass representing the result of signing a single PDF file.
+
+    Attributes: \n
+    file_path: The path to the PDF file that was signed. \n
+    signed_file_path: The path to the signed PDF file. \n
+    error: The error raised while signing the file or None when signing succeeded.
+    """
+
+    file_path: str
+    signed_file_path: str
+    error: Exception = None
+
+    @property
+    def ok(self) -> bool:
+        """!
+        Check whether the file was signed successfully.
+
+        @return True if the file was signed, False otherwise.
+        """
+        return self.error is None
+
+
+@dataclass
+class BatchSignResult:
+    """! A dataclass representing the result of signing many PDF files.
+
+    Attributes: \n
+    results: The results for each of the files, in the order they were signed. \n
+    elapsed: The time in seconds it took to sign all the files.
+    """
+
+    results: list[SignResult] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def signed(self) -> int:
+        """!
+        @return The number of files signed successfully.
+        """
+        return sum(1 for result in self.results if result.ok)
+
+    @property
+    def failed(self) -> int:
+        """!
+        @return The number of files that could not be signed.
+        """
+        return len(self.results) - self.signed
+
+    @property
+    def throughput(self) -> float:
+        """!
+        @return The number of successfully signed documents per second.
+        """
+        return self.signed / self.elapsed if self.elapsed > 0 else 0.0
+
+
+@dataclass
+class VerifyResult:
+    """! A dataclass representing the result of verifying a single signed PDF file.
+
+    Attributes: \n
+    file_path: The path to the signed PDF file. \n
+    public_key_path: The path to the public key the file was verified with. \n
+    valid: True if the signature is valid, False otherwise. \n
+    error: The error raised while verifying the file or None when it could be verified. \n
+    signatures: The reports of the individual signatures of the file. \n
+    cached: True if the result was taken from the verification cache.
+    """
+
+    file_path: str
+    public_key_path: str
+    valid: bool = False
+    error: Exception = None
+    signatures: list = field(default_factory=list)
+    cached: bool = False
+
+
+def get_signed_file_path(file_path: str, output_directory: str = None) -> str:
+    """!
+    Get the default path of the signed version of a PDF file.
+
+    @param file_path: The path to the PDF file.
+    @param output_directory: The directory to place the signed file in.
+    If None, the signed file is placed next to the original one.
+
+    @return The path with "_signed" suffix added to the file name, before its extension.
+    """
+    root, extension = os.path.splitext(file_path)
+    signed_file_path = f"{root}_signed{extension or '.pdf'}"
+    if output_directory is not None:
+        signed_file_path = os.path.join(
+            output_directory, os.path.basename(signed_file_path)
+        )
+    return signed_file_path
+
+
+def sign_digest(digest: bytes, private_key) -> bytes:
+    """!
+    Sign a precomputed SHA256 digest with a RSA private key using RSASSA-PSS.
+
+    This gives the same signature as signing the hashed data, so the data never has to reach the signing machine.
+
+    @param digest: The 32-byte SHA256 digest to sign.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the digest with.
+
+    @return The signature.
+    """
+    return sign_digests([digest], private_key)[0]
+
+
+def sign_digests(digests, private_key) -> list[bytes]:
+    """!
+    Sign many precomputed SHA256 digests with the same RSA private key using RSASSA-PSS, importing the key only once.
+
+    @param digests: The 32-byte SHA256 digests to sign.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the digests with.
+
+    @return The signatures, in the order of the digests.
+    """
+    private_key = import_key(private_key)
+    rsa_pss = SIGNATURE_ALGORITHMS["rsa-pss"]
+    if not rsa_pss.supports(private_key):
+        raise ValueError("Raw digest signatures need a RSA key")
+    sha256 = get_digest_algorithm("sha256")
+    with span(STAGE_SIGN, algorithm=rsa_pss.name):
+        return [rsa_pss.sign_digest(private_key, digest, sha256) for digest in digests]
+
+
+def verify_digest(digest: bytes, signature: bytes, public_key) -> bool:
+    """!
+    Verify the RSASSA-PSS signature of a precomputed SHA256 digest.
+
+    @param digest: The 32-byte SHA256 digest that was signed.
+    @param signature: The signature to verify.
+    @param public_key: The public key (PEM or imported with @ref import_key) used to verify the signature.
+
+    @return True if the signature is valid, False otherwise.
+    """
+    public_key = import_key(public_key)
+    rsa_pss = SIGNATURE_ALGORITHMS["rsa-pss"]
+    if not rsa_pss.supports(public_key):
+        return False
+    with span(STAGE_VERIFY, algorithm=rsa_pss.name):
+        return rsa_pss.verify_digest(
+            public_key, digest, signature, get_digest_algorithm("sha256")
+        )
+
+
+def _copy_and_hash(
+    source, target, progress: callable = None, file_hash=None
+) -> SHA256.SHA256Hash:
+    """!
+    Copy the source file to the target file and hash it in a single pass
+    in chunks of @ref CHUNK_SIZE bytes, see @ref _iterate_chunks.
+    When instrumentation is on, the writes are timed separately from the hashing, see lib.metrics.
+
+    @param progress: The callback function called with the number of bytes copied after every chunk.
+    @param file_hash: The hash object to update. If None, a new SHA256 hash object is created.
+
+    @return The hash object of the copied data.
+    """
+    if file_hash is None:
+        file_hash = SHA256.new()
+    timed = is_enabled()
+    start = time.perf_counter() if timed else 0.0
+    write_seconds = 0.0
+    size = 0
+    for chunk in _iterate_chunks(source):
+        file_hash.update(chunk)
+        write_start = time.perf_counter() if timed else 0.0
+        target.write(chunk)
+        if timed:
+            write_seconds += time.perf_counter() - write_start
+        size += len(chunk)
+        if progress is not None:
+            progress(len(chunk))
+    if timed:
+        record(STAGE_HASH, time.perf_counter() - start - write_seconds, size)
+        record(STAGE_WRITE, write_seconds, size)
+    return file_hash
+
+
+@contextmanager
+def _atomic_output(path: str):
+    """!
+    Open a temporary file next to the path for writing, see lib.files.open_temporary_file,
+    and rename it to the path once it is complete and on disk.
+
+    If anything fails, the temporary file is removed, so the path is either left untouched
+    or replaced with the complete file, and a crash never leaves a half-written file behind.
+
+    @param path: The path of the file to write.
+    """
+    file, temporary_path = open_temporary_file(path)
+    try:
+        with file:
+            yield file
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+
+def _get_signing_digest_algorithm(key, digest_algorithm: str = None):
+    """!
+    @param key: The imported private key.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+
+    @return The lib.algorithms.DigestAlgorithm to sign with.
+    """
+    if digest_algorithm is None:
+        digest_algorithm = get_key_signature_algorithm(key).default_digest(key)
+    return get_digest_algorithm(digest_algorithm)
+
+
+@dataclass
+class SignatureUpdate:
+    """! A dataclass representing the incremental update adding a signature to a PDF file.
+
+    The update contains the signature dictionary with the /ByteRange already filled in
+    and the /Contents placeholder to be replaced with the CMS signature.
+
+    Attributes: \n
+    data: The bytes appended to the original file. \n
+    base: The size of the original file. \n
+    contents_start: The offset of the /Contents hexadecimal string (including the angle brackets) in the data. \n
+    contents_end: The offset just after the /Contents hexadecimal string in the data.
+    """
 
+    data: bytearray
+    base: int
+    contents_start: int
+    contents_end: int
 
-def sign_pdf(file_path: str, private_key: bytes, signed_file_path=None) -> None:
+    @property
+    def byte_range(self) -> list[int]:
+        """!
+        @return The /ByteRange of the signature: the whole signed file except the /Contents hexadecimal string.
+        """
+        return [
+            0,
+            self.base + self.contents_start,
+            self.base + self.contents_end,
+            len(self.data) - self.contents_end,
+        ]
+
+    def hash_into(self, file_hash: SHA256.SHA256Hash):
+        """!
+        Add the signed parts of the update to the hash of the original file.
+        """
+        view = memoryview(self.data)
+        file_hash.update(view[: self.contents_start])
+        file_hash.update(view[self.contents_end :])
+
+    def set_contents(self, signature: bytes):
+        """!
+        Fill the /Contents placeholder with the CMS signature.
+        """
+        contents = signature.hex().upper().encode("ascii")
+        size = self.contents_end - self.contents_start - 2
+        if len(contents) > size:
+            raise ValueError(
+                f"Signature of {len(signature)} bytes does not fit in the reserved space"
+            )
+        self.data[self.contents_start + 1 : self.contents_end - 1] = contents.ljust(
+            size, b"0"
+        )
+
+
+def _build_signature_update(reader: PdfReader) -> SignatureUpdate:
+    """!
+    Build the incremental update adding a new signature field to the first page of the document.
+
+    @param reader: The reader of the PDF file to sign.
+
+    @return The SignatureUpdate with the /Contents placeholder.
+    """
+    update = IncrementalUpdate(reader)
+    catalog = dict(reader.root)
+    page_reference, page = reader.first_page()
+    page = dict(page)
+
+    signature_reference = update.add(
+        {
+            "Type": Name("Sig"),
+            "Filter": Name("Adobe.PPKLite"),
+            "SubFilter": Name("ETSI.CAdES.detached"),
+            "ByteRange": Raw(BYTE_RANGE_PLACEHOLDER),
+            "Contents": Raw(b"<" + b"0" * 2 * SIGNATURE_CONTENTS_SIZE + b">"),
+            "M": time.strftime("D:%Y%m%d%H%M%S+00'00'", time.gmtime()).encode("ascii"),
+        }
+    )
+    field_reference = update.add(
+        {
+            "FT": Name("Sig"),
+            "T": b"Signature%d" % (len(_find_signatures(reader)) + 1),
+            "V": signature_reference,
+            "Type": Name("Annot"),
+            "Subtype": Name("Widget"),
+            "Rect": [0, 0, 0, 0],
+            "F": 132,
+            "P": page_reference,
+        }
+    )
+
+    acroform_reference = reader.reference_of(catalog, "AcroForm")
+    acroform = reader.resolve(catalog.get("AcroForm"))
+    acroform = dict(acroform) if isinstance(acroform, dict) else {}
+    fields_reference = reader.reference_of(acroform, "Fields")
+    fields = reader.resolve(acroform.get("Fields"))
+    fields = (list(fields) if isinstance(fields, list) else []) + [field_reference]
+    if fields_reference:
+        update.update(fields_reference, fields)
+    else:
+        acroform["Fields"] = fields
+    acroform["SigFlags"] = 3
+    if acroform_reference:
+        update.update(acroform_reference, acroform)
+    else:
+        catalog["AcroForm"] = acroform
+        update.update(reader.trailer["Root"], catalog)
+
+    annotations_reference = reader.reference_of(page, "Annots")
+    annotations = reader.resolve(page.get("Annots"))
+    annotations = (list(annotations) if isinstance(annotations, list) else []) + [
+        field_reference
+    ]
+    if annotations_reference:
+        update.update(annotations_reference, annotations)
+    else:
+        page["Annots"] = annotations
+        update.update(page_reference, page)
+
+    data, offsets = update.build()
+    data = bytearray(data)
+    signature_offset = offsets[signature_reference] - reader.size
+    contents_start = data.index(b"/Contents <", signature_offset) + len(b"/Contents ")
+    signature_update = SignatureUpdate(
+        data,
+        reader.size,
+        contents_start,
+        contents_start + 2 * SIGNATURE_CONTENTS_SIZE + 2,
+    )
+
+    byte_range_start = data.index(BYTE_RANGE_PLACEHOLDER, signature_offset)
+    byte_range = b"[%d %d %d %d]" % tuple(signature_update.byte_range)
+    data[byte_range_start : byte_range_start + len(BYTE_RANGE_PLACEHOLDER)] = (
+        byte_range.ljust(len(BYTE_RANGE_PLACEHOLDER))
+    )
+    return signature_update
+
+
+@dataclass
+class PreparedSignature:
+    """! A dataclass representing a PDF file prepared for signing with a signature made elsewhere.
+
+    Attributes: \n
+    file_path: The path to the PDF file to sign. \n
+    update: The incremental update adding the signature. \n
+    digest: The digest of the signed byte ranges, to be signed with @ref create_signature. \n
+    digest_algorithm: The name of the digest algorithm, see lib.algorithms.DIGEST_ALGORITHMS.
+    """
+
+    file_path: str
+    update: SignatureUpdate
+    digest: bytes
+    digest_algorithm: str = DEFAULT_DIGEST_ALGORITHM
+
+    def save(self, signature: bytes, signed_file_path=None) -> None:
+        """!
+        Save the signed PDF file with the signature made by @ref create_signature.
+
+        The file is written to a temporary file and renamed, so it is never left half-written.
+
+        @param signature: The CMS signature of the digest.
+        @param signed_file_path: The path to save the signed PDF file to.
+        If None, the file will be saved in the same directory with the same name but with "_signed" suffix.
+
+        @return None
+        """
+        if signed_file_path is None:
+            signed_file_path = get_signed_file_path(self.file_path)
+        with _atomic_output(signed_file_path) as target:
+            self.write(signature, target)
+
+    def write(self, signature: bytes, stream, progress: callable = None) -> None:
+        """!
+        Write the signed PDF file with the signature made by @ref create_signature to a binary stream,
+        such as a socket or an HTTP response.
+
+        @param signature: The CMS signature of the digest.
+        @param stream: The writable binary stream.
+        @param progress: The callback function called with the number of bytes written after every chunk.
+
+        @return None
+        """
+        self.update.set_contents(signature)
+        with open(self.file_path, "rb") as source, span(STAGE_WRITE) as measured:
+            if os.fstat(source.fileno()).st_size != self.update.base:
+                raise ValueError("The PDF file has changed since it was prepared")
+            for chunk in _iterate_chunks(source):
+                stream.write(chunk)
+                measured.add_bytes(len(chunk))
+                if progress is not None:
+                    progress(len(chunk))
+            stream.write(self.update.data)
+            measured.add_bytes(len(self.update.data))
+
+
+def prepare_signature(
+    file_path: str,
+    digest_algorithm: str = DEFAULT_DIGEST_ALGORITHM,
+    progress: callable = None,
+) -> PreparedSignature:
+    """!
+    Prepare a PDF file for signing and compute the digest to be signed.
+
+    Together with @ref create_signature and @ref PreparedSignature.save it splits @ref sign_pdf into steps,
+    so only the digest and the signature have to travel to and from the machine holding the private key.
+
+    @param file_path: The path to the PDF file to sign.
+    @param digest_algorithm: The name of the digest algorithm, see lib.algorithms.DIGEST_ALGORITHMS.
+    @param progress: The callback function called with the number of bytes hashed after every chunk.
+
+    @return The PreparedSignature with the digest to be signed.
+    """
+    algorithm = get_digest_algorithm(digest_algorithm)
+    with open(file_path, "rb") as f:
+        with span(STAGE_PARSE):
+            update = _build_signature_update(PdfReader(f))
+        f.seek(0)
+        pdf_hash = hash_file(f, update.base, algorithm.new(), progress)
+    update.hash_into(pdf_hash)
+    return PreparedSignature(file_path, update, pdf_hash.digest(), algorithm.name)
+
+
+def create_signature(
+    digest: bytes, private_key, digest_algorithm: str = DEFAULT_DIGEST_ALGORITHM
+) -> bytes:
+    """!
+    Create the CMS signature of the digest of the signed byte ranges of a PDF file.
+
+    The signature covers the signed attributes, which contain the digest,
+    and the signer is identified by the fingerprint of the public key.
+    The signature algorithm follows from the type of the key, see lib.algorithms.SIGNATURE_ALGORITHMS,
+    and both the digest and the signature algorithm are recorded in the CMS SignedData.
+
+    @param digest: The digest of the signed byte ranges.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the digest with.
+    @param digest_algorithm: The name of the digest algorithm the digest was computed with.
+
+    @return The DER encoded CMS SignedData.
+    """
+    key = import_key(private_key)
+    digest_algorithm = get_digest_algorithm(digest_algorithm)
+    if len(digest) != digest_algorithm.digest_size:
+        raise ValueError(
+            f"{digest_algorithm.name.upper()} digest must be {digest_algorithm.digest_size} bytes long, "
+            f"got {len(digest)}"
+        )
+    signature_algorithm = get_key_signature_algorithm(key)
+    with span(STAGE_SIGN, algorithm=signature_algorithm.name):
+        signed_attributes = build_signed_attributes(digest)
+        signature = signature_algorithm.sign(key, signed_attributes, digest_algorithm)
+        return build_signed_data(
+            signed_attributes,
+            signature,
+            get_key_fingerprint(key),
+            signature_algorithm.algorithm_identifier(digest_algorithm),
+            digest_algorithm.oid,
+        )
+
+
+def sign_pdf(
+    file_path: str,
+    private_key,
+    signed_file_path=None,
+    progress: callable = None,
+    digest_algorithm: str = None,
+) -> None:
     """!
     Sign a PDF file with a private key and save it to the signed_file_path.
 
-    The signature is constructed by hashing the PDF file and then signing the hash with the provided private key.
-    This signed hash is then appended to the end of the file.
+    The signature is a PAdES signature (a detached CMS SignedData in a signature dictionary),
+    added to the document as an incremental update. The original file is copied unchanged, so signing
+    an already signed file adds a new revision and keeps the previous signatures valid.
+    The file is hashed and copied in a single pass through a buffer of @ref CHUNK_SIZE bytes,
+    so the memory used does not depend on the file size. The signed file is written to a temporary file
+    and renamed once complete, so a failure or a crash never leaves a half-written signed file.
+    When the signed file is the file itself, it is signed in place with @ref sign_pdf_in_place.
 
     @param file_path: The path to the PDF file to sign.
-    @param private_key: The private key to sign the PDF file with.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the PDF file with.
     @param signed_file_path: The path to save the signed PDF file to.
     If None, the file will be saved in the same directory with the same name but with "_signed" suffix.
+    @param progress: The callback function called with the number of bytes processed after every chunk.
+    It can raise @ref OperationCancelled to stop signing, the signed file is not created then.
+    @param digest_algorithm: The name of the digest algorithm, see lib.algorithms.DIGEST_ALGORITHMS.
+    If None, the algorithm preferred by the key is used, SHA256 for RSA keys.
 
     @return None
     """
     if signed_file_path is None:
-        signed_file_path = file_path.replace(".pdf", "_signed.pdf")
+        signed_file_path = get_signed_file_path(file_path)
+    if os.path.exists(signed_file_path) and os.path.samefile(
+        file_path, signed_file_path
+    ):
+        sign_pdf_in_place(file_path, private_key, progress, digest_algorithm)
+        return
+    key = import_key(private_key)
+    algorithm = _get_signing_digest_algorithm(key, digest_algorithm)
 
-    with open(file_path, "rb") as f:
-        data = f.read()
+    with open(file_path, "rb") as source:
+        with span(STAGE_PARSE):
+            update = _build_signature_update(PdfReader(source))
+        source.seek(0)
+        with _atomic_output(signed_file_path) as target:
+            pdf_hash = _copy_and_hash(source, target, progress, algorithm.new())
+            update.hash_into(pdf_hash)
+            update.set_contents(
+                create_signature(pdf_hash.digest(), key, algorithm.name)
+            )
+            with span(STAGE_WRITE) as measured:
+                target.write(update.data)
+                measured.add_bytes(len(update.data))
 
-    rsa_key = RSA.import_key(private_key)
-    signature = pss.new(rsa_key).sign(SHA256.new(data))
 
-    with open(signed_file_path, "wb") as f:
-        f.write(data)
-        f.write(signature)
+def sign_pdf_in_place(
+    file_path: str,
+    private_key,
+    progress: callable = None,
+    digest_algorithm: str = None,
+) -> None:
+    """!
+    Sign a PDF file in place, appending the signature to the file itself.
+
+    The signature is an incremental update, so the existing bytes are only read and hashed, and only the update,
+    a few kilobytes, is written. Writing a temporary copy and renaming it would double the I/O this mode avoids,
+    so instead the update is appended with a single write and flushed to disk, and the file is truncated back
+    to its original size when anything fails. The signed revision itself is never modified.
+
+    @param file_path: The path to the PDF file to sign.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the PDF file with.
+    @param progress: The callback function called with the number of bytes hashed after every chunk.
+    It can raise @ref OperationCancelled to stop signing, the file is left unchanged then.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
 
+    @return None
+    """
+    key = import_key(private_key)
+    algorithm = _get_signing_digest_algorithm(key, digest_algorithm)
 
-def verify_pdf(file_path: str, public_key: bytes) -> bool:
+    with open(file_path, "r+b") as f:
+        with span(STAGE_PARSE):
+            update = _build_signature_update(PdfReader(f))
+        f.seek(0)
+        pdf_hash = hash_file(f, update.base, algorithm.new(), progress)
+        update.hash_into(pdf_hash)
+        update.set_contents(create_signature(pdf_hash.digest(), key, algorithm.name))
+        if os.fstat(f.fileno()).st_size != update.base:
+            raise ValueError("The PDF file has changed while it was being signed")
+        f.seek(update.base)
+        try:
+            with span(STAGE_WRITE) as measured:
+                f.write(update.data)
+                f.flush()
+                os.fsync(f.fileno())
+                measured.add_bytes(len(update.data))
+        except BaseException:
+            f.truncate(update.base)
+            raise
+
+
+def sign_pdf_to_stream(
+    file_path: str,
+    private_key,
+    stream,
+    progress: callable = None,
+    digest_algorithm: str = None,
+) -> None:
     """!
-    Verify the signature of a signed PDF file.
+    Sign a PDF file and write the signed file to a binary stream, such as a socket or an HTTP response,
+    without creating any file.
 
-    The signature is verified by hashing the PDF contents (excluding embedded signature) and then comparing the hash
-    to the signature extracted from the file (the signature is first decrypted with the public key).
+    The file is hashed and signed before the first byte is written, so a file that cannot be signed
+    (or a cancelled signing) writes nothing to the stream. The file is then read again while it is written.
+
+    @param file_path: The path to the PDF file to sign.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the PDF file with.
+    @param stream: The writable binary stream.
+    @param progress: The callback function called with the number of bytes hashed and then written after every chunk,
+    twice the size of the file in total.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+
+    @return None
+    """
+    key = import_key(private_key)
+    algorithm = _get_signing_digest_algorithm(key, digest_algorithm)
+    prepared = prepare_signature(file_path, algorithm.name, progress)
+    prepared.write(
+        create_signature(prepared.digest, key, algorithm.name), stream, progress
+    )
+
+
+def sign_many(
+    file_paths,
+    private_key,
+    output_directory: str = None,
+    on_result: callable = None,
+    digest_algorithm: str = None,
+) -> BatchSignResult:
+    """!
+    Sign many PDF files with the same private key.
+
+    The private key is imported once and reused for every file.
+    A file that fails to sign does not stop the others from being signed.
+
+    @param file_paths: The paths to the PDF files to sign.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the PDF files with.
+    @param output_directory: The directory to save the signed files to.
+    If None, each signed file is saved next to the original one with "_signed" suffix.
+    @param on_result: The callback function called with the SignResult of each file as soon as it is signed.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+
+    @return The BatchSignResult with the per-file results and the time it took.
+    """
+    key = import_key(private_key)
+    batch_result = BatchSignResult()
+    start = time.perf_counter()
+    for file_path in file_paths:
+        result = SignResult(
+            file_path, get_signed_file_path(file_path, output_directory)
+        )
+        try:
+            sign_pdf(
+                file_path,
+                key,
+                result.signed_file_path,
+                digest_algorithm=digest_algorithm,
+            )
+        except Exception as e:
+            # Any error, such as one raised while parsing a malformed file, fails only this file.
+            result.error = e
+        batch_result.results.append(result)
+        if on_result is not None:
+            on_result(result)
+    batch_result.elapsed = time.perf_counter() - start
+    return batch_result
+
+
+@dataclass
+class SignatureReport:
+    """! A dataclass representing the result of verifying a single signature of a PDF file.
+
+    Attributes: \n
+    field_name: The name of the signature field or None for the raw signature appended by older versions. \n
+    signing_time: The signing time from the signature dictionary (/M) or None when it is missing. \n
+    key_id: The fingerprint of the signer's public key recorded in the signature or None when it is missing. \n
+    revision_end: The size of the revision the signature covers. \n
+    covers_whole_file: True if the signature covers the whole file, False if revisions were added after it. \n
+    intact: True if the signed bytes have not changed since signing. \n
+    valid: True if the signed bytes are intact and the signature was made with one of the public keys. \n
+    error: The description of the problem that prevented verifying the signature or None. \n
+    digest_algorithm: The name of the digest algorithm recorded in the signature or None when it is unknown. \n
+    signature_algorithm: The name of the signature algorithm recorded in the signature or None when it is unknown.
+    """
+
+    field_name: str
+    signing_time: str = None
+    key_id: bytes = None
+    revision_end: int = 0
+    covers_whole_file: bool = False
+    intact: bool = False
+    valid: bool = False
+    error: str = None
+    digest_algorithm: str = None
+    signature_algorithm: str = None
+
+    def to_dict(self) -> dict:
+        """!
+        @return The report as a dictionary that can be serialized to JSON, with the key identifier in hex.
+        """
+        return {
+            "field": self.field_name,
+            "signing_time": self.signing_time,
+            "key_id": self.key_id.hex() if self.key_id else None,
+            "revision_end": self.revision_end,
+            "covers_whole_file": self.covers_whole_file,
+            "intact": self.intact,
+            "valid": self.valid,
+            "error": self.error,
+            "digest_algorithm": self.digest_algorithm,
+            "signature_algorithm": self.signature_algorithm,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SignatureReport":
+        """!
+        @param data: The dictionary created by @ref to_dict.
+
+        @return The report restored from the dictionary.
+        """
+        return cls(
+            data["field"],
+            data["signing_time"],
+            bytes.fromhex(data["key_id"]) if data["key_id"] else None,
+            data["revision_end"],
+            data["covers_whole_file"],
+            data["intact"],
+            data["valid"],
+            data["error"],
+            data.get("digest_algorithm"),
+            data.get("signature_algorithm"),
+        )
+
+
+@dataclass
+class VerificationReport:
+    """! A dataclass representing the result of verifying all the signatures of a PDF file.
+
+    Attributes: \n
+    file_path: The path to the verified PDF file. \n
+    signatures: The reports of the signatures, ordered from the oldest revision to the newest.
+    """
+
+    file_path: str
+    signatures: list[SignatureReport] = field(default_factory=list)
+
+    @property
+    def valid(self) -> bool:
+        """!
+        @return True if the file is signed, all the signatures are valid and the newest one covers the whole file.
+        """
+        return (
+            bool(self.signatures)
+            and all(signature.valid for signature in self.signatures)
+            and self.signatures[-1].covers_whole_file
+        )
+
+    def __bool__(self) -> bool:
+        """!
+        @return The same as @ref valid.
+        """
+        return self.valid
+
+
+def _find_signatures(reader: PdfReader) -> list[tuple[str, dict]]:
+    """!
+    Find the signature dictionaries of the signed signature fields of the document.
+
+    @param reader: The reader of the PDF file.
+
+    @return A list of (field name, signature dictionary) tuples, ordered by the revision they sign.
+    """
+    acroform = reader.resolve(reader.root.get("AcroForm"))
+    if not isinstance(acroform, dict):
+        acroform = {}
+    signatures = []
+    fields = reader.resolve(acroform.get("Fields"))
+    fields = (
+        [(field, None, None) for field in fields] if isinstance(fields, list) else []
+    )
+    while fields:
+        field, field_type, parent_name = fields.pop(0)
+        field = reader.resolve(field)
+        if not isinstance(field, dict):
+            continue
+        field_type = field.get("FT", field_type)
+        name = field.get("T")
+        if isinstance(name, bytes):
+            name = name.decode("latin-1")
+            name = f"{parent_name}.{name}" if parent_name else name
+        else:
+            name = parent_name
+        kids = reader.resolve(field.get("Kids"))
+        if isinstance(kids, list):
+            fields += [(kid, field_type, name) for kid in kids]
+        signature = reader.resolve(field.get("V"))
+        if field_type == "Sig" and isinstance(signature, dict):
+            signatures.append((name, signature))
+    return sorted(signatures, key=lambda signature: _byte_range_end(signature[1]))
+
+
+def _byte_range_end(signature: dict) -> int:
+    """!
+    @return The end of the revision the signature signs, the sum of its /ByteRange, or 0 when it is malformed.
+    """
+    byte_range = signature.get("ByteRange")
+    if not isinstance(byte_range, list) or not all(
+        isinstance(value, int) for value in byte_range
+    ):
+        return 0
+    return sum(byte_range)
+
+
+def _read_byte_range(file, signature: dict, file_size: int) -> tuple[list[int], bytes]:
+    """!
+    Read the /ByteRange of the signature and the CMS signature from the gap between the ranges.
+
+    The signature is taken from the file bytes the byte range excludes, rather than from the parsed /Contents,
+    so it is guaranteed that everything else is covered by the signature.
+
+    @return A tuple containing the byte range and the CMS signature.
+    """
+    byte_range = signature.get("ByteRange")
+    if (
+        not isinstance(byte_range, list)
+        or len(byte_range) != 4
+        or not all(isinstance(value, int) and value >= 0 for value in byte_range)
+        or byte_range[0] != 0
+        or byte_range[1] >= byte_range[2]
+        or byte_range[2] + byte_range[3] > file_size
+    ):
+        raise ValueError("Invalid signature byte range")
+    file.seek(byte_range[1])
+    contents = file.read(byte_range[2] - byte_range[1])
+    if not contents.startswith(b"<") or not contents.endswith(b">"):
+        raise ValueError("Signature byte range does not exclude exactly the /Contents")
+    return byte_range, bytes.fromhex(contents[1:-1].decode("ascii"))
+
+
+class _ByteRangeHasher:
+    """!
+    Hashes the parts of a file covered by each of the signature byte ranges in a single pass over the file.
+
+    All the byte ranges start at the beginning of the file, so a single running hash of the file
+    (one per digest algorithm) is forked at the start of every /Contents gap. Each fork then only has to hash
+    the rest of its own revision, which is small, instead of re-reading the whole prefix of the file for every signature.
+    The file is fed to @ref update in consecutive chunks from its beginning up to @ref end.
+    """
+
+    def __init__(self, byte_ranges: list[list[int]], digest_algorithms: list = None):
+        """!
+        @param byte_ranges: The validated byte ranges.
+        @param digest_algorithms: The lib.algorithms.DigestAlgorithm of each byte range. If None, SHA256 is used for all.
+        """
+        if digest_algorithms is None:
+            digest_algorithms = [get_digest_algorithm("sha256")] * len(byte_ranges)
+        self.byte_ranges = byte_ranges
+        self.digest_algorithms = digest_algorithms
+        self.end = max(byte_range[2] + byte_range[3] for byte_range in byte_ranges)
+        self.position = 0
+        self._hashes = [None] * len(byte_ranges)
+        self._forks = sorted(
+            (byte_range[1], index) for index, byte_range in enumerate(byte_ranges)
+        )
+        # The running hash of each digest algorithm, with the position it has hashed the file up to
+        # and the number of forks it still has to make.
+        self._prefixes = {}
+        for algorithm in digest_algorithms:
+            prefix = self._prefixes.setdefault(algorithm.name, [algorithm.new(), 0, 0])
+            prefix[2] += 1
+
+    def update(self, view):
+        """!
+        Hash the next chunk of the file.
+
+        @param view: The bytes or memoryview of the chunk, starting at @ref position.
+        """
+        position = self.position
+        read = len(view)
+        chunk_end = position + read
+
+        while self._forks and self._forks[0][0] <= chunk_end:
+            fork_position, index = self._forks.pop(0)
+            name = self.digest_algorithms[index].name
+            prefix = self._prefixes[name]
+            prefix[0].update(view[prefix[1] - position : fork_position - position])
+            prefix[1] = fork_position
+            self._hashes[index] = prefix[0].copy()
+            prefix[2] -= 1
+            if not prefix[2]:
+                del self._prefixes[name]
+        for prefix in self._prefixes.values():
+            prefix[0].update(view[prefix[1] - position : read])
+            prefix[1] = chunk_end
+
+        for file_hash, byte_range in zip(self._hashes, self.byte_ranges):
+            low = max(byte_range[2], position)
+            high = min(byte_range[2] + byte_range[3], chunk_end)
+            if file_hash is not None and low < high:
+                file_hash.update(view[low - position : high - position])
+        self.position = chunk_end
+
+    def digests(self) -> list[bytes]:
+        """!
+        @return The digests of the byte ranges, in the same order, once the file was hashed up to @ref end.
+        """
+        return [file_hash.digest() for file_hash in self._hashes]
+
+
+def _hash_byte_ranges(
+    file,
+    byte_ranges: list[list[int]],
+    progress: callable = None,
+    digest_algorithms: list = None,
+    content_hash: SHA256.SHA256Hash = None,
+) -> list[bytes]:
+    """!
+    Hash the parts of the file covered by each of the signature byte ranges in a single pass over the file,
+    see @ref _ByteRangeHasher. Large files are memory-mapped, so the byte ranges are hashed straight
+    from the page cache without being copied, see @ref _iterate_chunks.
+
+    @param file: The binary file object to read from.
+    @param byte_ranges: The validated byte ranges.
+    @param progress: The callback function called with the number of bytes read after every chunk.
+    @param digest_algorithms: The lib.algorithms.DigestAlgorithm of each byte range. If None, SHA256 is used for all.
+    @param content_hash: The hash object to update with the whole file up to the end of the last byte range or None.
+
+    @return The digests of the byte ranges, in the same order.
+    """
+    hasher = _ByteRangeHasher(byte_ranges, digest_algorithms)
+    file.seek(0)
+    with span(STAGE_HASH) as measured:
+        for view in _iterate_chunks(file, hasher.end):
+            hasher.update(view)
+            if content_hash is not None:
+                content_hash.update(view)
+            measured.add_bytes(len(view))
+            if progress is not None:
+                progress(len(view))
+    return hasher.digests()
+
+
+def _verify_cms_signature(
+    signer: SignerInfo, digest: bytes, public_keys: list
+) -> tuple[bool, bool]:
+    """!
+    Verify the CMS signature of the digest of the signed byte ranges.
+
+    The signature is verified with the signature algorithm recorded in it, see lib.algorithms.SIGNATURE_ALGORITHMS.
+    The public key whose fingerprint matches the key identifier of the signer is tried first.
+
+    @param signer: The parsed signer of the CMS SignedData.
+    @param digest: The digest of the signed byte ranges, computed with the digest algorithm of the signer.
+    @param public_keys: The imported public keys to try.
+
+    @return A tuple containing whether the signed bytes are intact and whether the signature is valid.
+    """
+    digest_algorithm = get_digest_algorithm(signer.digest_algorithm)
+    signature_algorithm = get_signature_algorithm(signer.signature_algorithm)
+    if signer.signed_attributes is not None and signer.message_digest != digest:
+        return False, False
+
+    public_keys = sorted(
+        public_keys, key=lambda key: get_key_fingerprint(key) != signer.key_id
+    )
+    with span(STAGE_VERIFY, algorithm=signature_algorithm.name):
+        for public_key in public_keys:
+            if not signature_algorithm.supports(public_key):
+                continue
+            if signer.signed_attributes is not None:
+                valid = signature_algorithm.verify(
+                    public_key,
+                    signer.signed_attributes,
+                    signer.signature,
+                    digest_algorithm,
+                )
+            else:
+                valid = signature_algorithm.verify_digest(
+                    public_key, digest, signer.signature, digest_algorithm
+                )
+            if valid:
+                return True, True
+    return signer.signed_attributes is not None, False
+
+
+def _verify_legacy_signature(
+    file,
+    public_keys: list,
+    progress: callable = None,
+    content_hash: SHA256.SHA256Hash = None,
+) -> SignatureReport:
+    """!
+    Verify the raw signature of @ref SIGNATURE_LENGTH bytes appended to the file by older versions.
+
+    The signature is read from the end of the file and the contents are hashed in chunks,
+    so the file is never loaded into memory as a whole.
+
+    @param content_hash: The SHA256 hash object to update with the whole file or None.
+    The file is not hashed into it when it is too short to contain a signature.
+
+    @return The SignatureReport of the signature.
+    """
+    file_size = os.fstat(file.fileno()).st_size
+    report = SignatureReport(None, revision_end=file_size, covers_whole_file=True)
+    pdf_length = file_size - SIGNATURE_LENGTH
+    if pdf_length < 0:
+        report.error = "File is too short to contain a signature"
+        return report
+    file.seek(pdf_length)
+    signature = file.read(SIGNATURE_LENGTH)
+    file.seek(0)
+    if content_hash is not None:
+        # The signed contents are the start of the whole file, so a single pass hashes both.
+        digest = hash_file(file, pdf_length, content_hash, progress).copy().digest()
+        content_hash.update(signature)
+    else:
+        digest = hash_file(file, pdf_length, progress=progress).digest()
+    report.valid = report.intact = any(
+        verify_digest(digest, signature, public_key) for public_key in public_keys
+    )
+    return report
+
+
+def _read_signatures_or_legacy(file, report: VerificationReport) -> tuple:
+    """!
+    Read the signatures like @ref _read_signatures, falling back to a legacy signature when the document cannot be parsed,
+    as older versions appended their raw signature to any file.
+
+    @return A tuple containing the signatures returned by @ref _read_signatures and None,
+    or None and the PdfError raised while parsing the document.
+    """
+    try:
+        return _read_signatures(file, report), None
+    except PdfError as e:
+        return None, e
+
+
+def _explain_legacy_failure(legacy_report: SignatureReport, parse_error: PdfError):
+    """!
+    Tell why a file without a legacy signature was not verified when it could not be parsed either.
+    """
+    if parse_error is not None and not legacy_report.valid and not legacy_report.error:
+        legacy_report.error = f"Not a signed PDF file: {parse_error}"
+
+
+def _resolve_public_keys(public_key) -> tuple[list, TrustStore]:
+    """!
+    Import the public keys passed to @ref verify_pdf.
+
+    @return A tuple containing the imported public keys and None, or None and the lib.trust_store.TrustStore.
+    """
+    if isinstance(public_key, TrustStore):
+        return None, public_key
+    if isinstance(public_key, (list, tuple)):
+        return [import_key(key) for key in public_key], None
+    return [import_key(public_key)], None
+
+
+def _read_signatures(file, report: VerificationReport) -> list[tuple]:
+    """!
+    Parse the document and read the byte range and the CMS signature of each of its signatures,
+    adding a SignatureReport of each one to the report.
+
+    @param file: The signed PDF file opened in binary mode.
+    @param report: The VerificationReport of the file.
+
+    @return A list of (SignatureReport, byte range, SignerInfo, DigestAlgorithm) tuples of the signatures
+    that could be read, or None when the document has no signature fields and may have a legacy signature.
+    @throws PdfError When the document cannot be parsed.
+    """
+    with span(STAGE_PARSE):
+        signatures = _find_signatures(PdfReader(file))
+    if not signatures:
+        return None
+
+    file_size = os.fstat(file.fileno()).st_size
+    signed_ranges = []
+    for field_name, signature in signatures:
+        signing_time = signature.get("M")
+        signature_report = SignatureReport(
+            field_name,
+            signing_time.decode("latin-1") if isinstance(signing_time, bytes) else None,
+        )
+        report.signatures.append(signature_report)
+        try:
+            byte_range, signed_data = _read_byte_range(file, signature, file_size)
+        except ValueError as e:
+            signature_report.error = str(e)
+            continue
+        signature_report.revision_end = byte_range[2] + byte_range[3]
+        signature_report.covers_whole_file = signature_report.revision_end == file_size
+        try:
+            signer = parse_signed_data(signed_data)
+            signature_report.key_id = signer.key_id
+            digest_algorithm = get_digest_algorithm(signer.digest_algorithm)
+            signature_report.digest_algorithm = digest_algorithm.name
+            signature_report.signature_algorithm = get_signature_algorithm(
+                signer.signature_algorithm
+            ).name
+        except (ValueError, IndexError) as e:
+            signature_report.error = f"Invalid CMS signature: {e}"
+            continue
+        signed_ranges.append((signature_report, byte_range, signer, digest_algorithm))
+    return signed_ranges
+
+
+def _check_signatures(
+    signed_ranges: list[tuple],
+    digests: list[bytes],
+    public_keys: list,
+    trust_store: TrustStore = None,
+):
+    """!
+    Verify the CMS signatures read by @ref _read_signatures against the digests of their byte ranges,
+    filling in their SignatureReport.
+
+    @param signed_ranges: The signatures returned by @ref _read_signatures.
+    @param digests: The digests of their byte ranges, in the same order.
+    @param public_keys: The imported public keys or None to look the keys up in the trust store.
+    @param trust_store: The lib.trust_store.TrustStore or None.
+    """
+    for (signature_report, _, signer, _), digest in zip(signed_ranges, digests):
+        signer_keys = public_keys
+        if trust_store is not None:
+            signer_key = trust_store.get_key(signer.key_id)
+            signer_keys = [signer_key] if signer_key is not None else []
+        try:
+            signature_report.intact, signature_report.valid = _verify_cms_signature(
+                signer, digest, signer_keys
+            )
+        except (ValueError, IndexError) as e:
+            signature_report.error = f"Invalid CMS signature: {e}"
+            continue
+        if not signer_keys and signature_report.intact:
+            signature_report.error = "The signer key is not in the trust store"
+
+
+def verify_pdf(
+    file_path: str,
+    public_key,
+    progress: callable = None,
+    content_hash: SHA256.SHA256Hash = None,
+) -> VerificationReport:
+    """!
+    Verify the signatures of a signed PDF file.
+
+    Every PAdES signature of the document is verified by hashing the byte ranges it covers straight from the file
+    and checking the CMS signature with the public keys. The byte ranges of all the signatures are hashed
+    in a single pass over the file. The report is valid only when all the signatures are valid
+    and the newest one covers the whole file, so nothing was appended after the document was signed.
+    Files signed by older versions, with the raw signature appended after the end of the PDF, are verified too.
 
     @param file_path: The path to the signed PDF file to verify.
-    @param public_key: The public key used to verify the signature.
+    @param public_key: The public key (PEM or imported with @ref import_key) used to verify the signatures,
+    a list of public keys of all the signers, or a lib.trust_store.TrustStore. The key of every signer
+    is then looked up in the store by the key identifier of the signature, and a signature by a key
+    that is not in the store is not valid.
+    @param progress: The callback function called with the number of bytes hashed after every chunk.
+    It can raise @ref OperationCancelled to stop verifying.
+    @param content_hash: A new SHA256 hash object to update with the whole contents of the file or None.
+    The contents are hashed in the same pass as the signatures, for callers keying the results by the contents,
+    such as lib.verification_cache.
 
-    @return True if the signature is valid, False otherwise.
+    @return The VerificationReport with a SignatureReport of each signature,
+    which evaluates to True if the signatures are valid, False otherwise.
     """
+    public_keys, trust_store = _resolve_public_keys(public_key)
+    report = VerificationReport(file_path)
+
     with open(file_path, "rb") as f:
-        data = f.read()
+        signed_ranges, parse_error = _read_signatures_or_legacy(f, report)
+        hashed_length = 0
+        if signed_ranges is None:
+            if trust_store is not None:
+                # Legacy signatures do not identify the signer, so all the trusted keys are tried.
+                public_keys = trust_store.public_keys()
+            legacy_report = _verify_legacy_signature(
+                f, public_keys, progress, content_hash
+            )
+            report.signatures.append(legacy_report)
+            hashed = legacy_report.error is None
+            _explain_legacy_failure(legacy_report, parse_error)
+            if hashed:
+                return report
+            digests = []
+        elif signed_ranges:
+            byte_ranges = [entry[1] for entry in signed_ranges]
+            digests = _hash_byte_ranges(
+                f,
+                byte_ranges,
+                progress,
+                [entry[3] for entry in signed_ranges],
+                content_hash,
+            )
+            hashed_length = max(
+                byte_range[2] + byte_range[3] for byte_range in byte_ranges
+            )
+        else:
+            digests = []
+        if content_hash is not None:
+            # Only the bytes after the last signed revision are left, usually none.
+            f.seek(hashed_length)
+            hash_file(f, file_hash=content_hash)
+
+    if signed_ranges:
+        _check_signatures(signed_ranges, digests, public_keys, trust_store)
+    return report
+
+
+def inspect_pdf(file_path: str) -> VerificationReport:
+    """!
+    List the signatures of a PDF file without verifying them.
+
+    Only the document structure and the signature dictionaries are read, nothing is hashed,
+    so the cost does not depend on the size of the file.
+
+    @param file_path: The path to the PDF file.
+
+    @return The VerificationReport with a SignatureReport of each signature, whose intact and valid are always False.
+    A document without signature fields is reported with a single SignatureReport without a field name,
+    for the raw signature appended by older versions it may carry.
+    @throws PdfError When the document cannot be parsed.
+    """
+    report = VerificationReport(file_path)
+    with open(file_path, "rb") as f:
+        if _read_signatures(f, report) is None:
+            file_size = os.fstat(f.fileno()).st_size
+            legacy_report = SignatureReport(
+                None, revision_end=file_size, covers_whole_file=True
+            )
+            if file_size < SIGNATURE_LENGTH:
+                legacy_report.error = "File is too short to contain a signature"
+            report.signatures.append(legacy_report)
+    return report
+
+
+## @var ASYNC_MAX_IN_FLIGHT
+# The default number of CPU-bound calls (parsing, hashing a chunk, signing, verifying) an AsyncExecutor
+# runs at the same time.
+ASYNC_MAX_IN_FLIGHT = os.cpu_count() or 1
+
+
+class AsyncExecutor:
+    """!
+    Runs the work of the async API off the event loop.
 
-    pdf_data = data[:-SIGNATURE_LENGTH]
-    signature = data[-SIGNATURE_LENGTH:]
+    The CPU-bound work, parsing, hashing a chunk, signing and verifying, runs in the configured executor,
+    with at most max_in_flight calls at a time for all the files processed concurrently, so a burst of requests
+    cannot starve the executor. Waiting for a free slot does not block the event loop. The file I/O runs
+    in the default executor of the event loop and is not limited, so reading the next files goes on while
+    the CPU is busy. The executor has to run the calls in threads of this process, such as
+    a concurrent.futures.ThreadPoolExecutor, because the hash objects and the keys are shared with the caller;
+    hashing and RSA release the GIL, so the threads run in parallel.
+    """
+
+    def __init__(self, executor=None, max_in_flight: int = ASYNC_MAX_IN_FLIGHT):
+        """!
+        @param executor: The concurrent.futures.Executor running the CPU-bound work
+        or None to use the default executor of the event loop.
+        @param max_in_flight: The maximum number of CPU-bound calls running at the same time.
+        """
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.executor = executor
+        self.max_in_flight = max_in_flight
+        self._semaphores = weakref.WeakKeyDictionary()
+
+    def _get_semaphore(self):
+        """!
+        @return The asyncio.Semaphore limiting the calls of the running event loop, as a semaphore
+        cannot be shared by event loops.
+        """
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        semaphore = self._semaphores.get(loop)
+        if semaphore is None:
+            semaphore = self._semaphores[loop] = asyncio.Semaphore(self.max_in_flight)
+        return semaphore
+
+    async def run(self, function: callable, *args):
+        """!
+        Run a CPU-bound function in the executor once a slot is free.
+
+        @param function: The function to run.
+        @param args: The arguments of the function.
+
+        @return The value returned by the function.
+        """
+        import asyncio
+
+        async with self._get_semaphore():
+            return await asyncio.get_running_loop().run_in_executor(
+                self.executor, function, *args
+            )
+
+    async def run_io(self, function: callable, *args):
+        """!
+        Run a blocking file operation in the default executor of the event loop.
+
+        @param function: The function to run.
+        @param args: The arguments of the function.
+
+        @return The value returned by the function.
+        """
+        import asyncio
+
+        return await asyncio.get_running_loop().run_in_executor(None, function, *args)
+
+
+## @var _async_executor
+# The AsyncExecutor used by the async functions by default, created by @ref get_async_executor.
+_async_executor = None
+
+
+def get_async_executor() -> AsyncExecutor:
+    """!
+    Get the AsyncExecutor used by the async functions when none is passed to them.
+
+    @return The default AsyncExecutor, running the CPU-bound work in the default executor of the event loop.
+    """
+    global _async_executor
+    if _async_executor is None:
+        _async_executor = AsyncExecutor()
+    return _async_executor
+
+
+def set_async_executor(executor: AsyncExecutor):
+    """!
+    Replace the AsyncExecutor used by the async functions when none is passed to them.
+
+    @param executor: The new default AsyncExecutor or None to go back to the built-in one.
+    """
+    global _async_executor
+    _async_executor = executor
 
-    rsa_key = RSA.import_key(public_key)
-    pdf_hash = SHA256.new(pdf_data)
-    verifier = pss.new(rsa_key)
+
+async def _iterate_async_chunks(stream):
+    """!
+    Iterate over the contents of an async byte stream.
+
+    @param stream: An object with an async read(size) method returning b"" at the end,
+    such as an asyncio.StreamReader, or an async iterable of bytes.
+
+    @return The async generator of bytes chunks.
+    """
+    if hasattr(stream, "read"):
+        while chunk := await stream.read(CHUNK_SIZE):
+            yield chunk
+        return
+    async for chunk in stream:
+        if chunk:
+            yield chunk
+
+
+async def _write_async(stream, data):
+    """!
+    Write to an async byte stream, waiting until it accepts more data.
+
+    @param stream: An object with a write method, either a coroutine or a plain method
+    followed by an async drain method, such as an asyncio.StreamWriter.
+    @param data: The bytes to write.
+    """
+    result = stream.write(data)
+    if inspect.isawaitable(result):
+        await result
+    drain = getattr(stream, "drain", None)
+    if drain is not None:
+        await drain()
+
+
+def _timed_call(function: callable, *args) -> float:
+    """!
+    Call a function, measuring the time it took in the thread that ran it.
+
+    @return The number of seconds the call took.
+    """
+    start = time.perf_counter()
+    function(*args)
+    return time.perf_counter() - start
+
+
+def _read_at(file, offset: int, size: int) -> bytes:
+    """!
+    @return Up to size bytes read from the file at the offset.
+    """
+    file.seek(offset)
+    return file.read(size)
+
+
+def _parse_signature_update(file) -> SignatureUpdate:
+    """!
+    @return The SignatureUpdate adding a new signature to the PDF file, see @ref _build_signature_update.
+    """
+    with span(STAGE_PARSE):
+        return _build_signature_update(PdfReader(file))
+
+
+async def _hash_file_async(
+    executor: AsyncExecutor,
+    file,
+    length: int,
+    file_hash,
+    progress: callable = None,
+    target=None,
+):
+    """!
+    Hash the first bytes of an open binary file, reading it in chunks of @ref CHUNK_SIZE bytes
+    without blocking the event loop and hashing the chunks in the executor.
+    The async counterpart of @ref hash_file and @ref _copy_and_hash.
+
+    @param executor: The AsyncExecutor.
+    @param file: The binary file object to read from, read from its beginning.
+    @param length: The number of bytes to read.
+    @param file_hash: The hash object to update, any object with an update method such as a @ref _ByteRangeHasher,
+    or None to only copy the bytes.
+    @param progress: The callback function called with the number of bytes read after every chunk.
+    @param target: The binary file object to copy the bytes to or None.
+    """
+    await executor.run_io(file.seek, 0)
+    hash_seconds = write_seconds = 0.0
+    position = 0
+    while position < length:
+        chunk = await executor.run_io(file.read, min(CHUNK_SIZE, length - position))
+        if not chunk:
+            break
+        if file_hash is not None:
+            hash_seconds += await executor.run(
+                _timed_call, file_hash.update, memoryview(chunk)
+            )
+        if target is not None:
+            write_seconds += await executor.run_io(_timed_call, target.write, chunk)
+        position += len(chunk)
+        if progress is not None:
+            progress(len(chunk))
+    if file_hash is not None:
+        record(STAGE_HASH, hash_seconds, position)
+    if target is not None:
+        record(STAGE_WRITE, write_seconds, position)
+
+
+async def _spool_async(
+    executor: AsyncExecutor,
+    stream,
+    file,
+    file_hash=None,
+    progress: callable = None,
+) -> int:
+    """!
+    Copy an async byte stream to a file, which can then be parsed and read again, hashing it on the way.
+
+    @param executor: The AsyncExecutor.
+    @param stream: The async byte stream, see @ref _iterate_async_chunks.
+    @param file: The binary file object to write to.
+    @param file_hash: The hash object to update with the contents of the stream or None.
+    @param progress: The callback function called with the number of bytes received after every chunk.
+
+    @return The number of bytes copied.
+    """
+    hash_seconds = 0.0
+    size = 0
+    async for chunk in _iterate_async_chunks(stream):
+        await executor.run_io(file.write, chunk)
+        if file_hash is not None:
+            hash_seconds += await executor.run(_timed_call, file_hash.update, chunk)
+        size += len(chunk)
+        if progress is not None:
+            progress(len(chunk))
+    await executor.run_io(file.flush)
+    if file_hash is not None:
+        record(STAGE_HASH, hash_seconds, size)
+    return size
+
+
+@asynccontextmanager
+async def _open_async(
+    executor: AsyncExecutor, source, file_hash=None, progress: callable = None
+):
+    """!
+    Open the source of an async function for reading. A path is opened as it is, and an async byte stream
+    is first copied to a temporary file with @ref _spool_async, as parsing a PDF file needs random access.
+
+    @param executor: The AsyncExecutor.
+    @param source: The path to the file or the async byte stream.
+    @param file_hash: The hash object to update with the contents of a stream while it is copied or None.
+    @param progress: The callback function called with the number of bytes of a stream copied after every chunk.
+
+    @return The binary file object, closed (and the temporary file removed) when the block exits.
+    """
+    from_path = isinstance(source, (str, os.PathLike))
+    if from_path:
+        file = await executor.run_io(open, source, "rb")
+    else:
+        import tempfile
+
+        file = await executor.run_io(tempfile.TemporaryFile)
     try:
-        verifier.verify(pdf_hash, signature)
-        return True
-    except (ValueError, TypeError):
-        return False
+        if not from_path:
+            await _spool_async(executor, source, file, file_hash, progress)
+        yield file
+    finally:
+        await executor.run_io(file.close)
+
+
+def _finish_atomic_output(file, temporary_path: str, path: str):
+    """!
+    Flush the temporary file written by @ref sign_pdf_async to disk and rename it to the path,
+    like @ref _atomic_output does.
+    """
+    with file:
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_path, path)
+
+
+def _discard_output(file, temporary_path: str):
+    """!
+    Close and remove the temporary file of a signed file that could not be written.
+    """
+    file.close()
+    if os.path.exists(temporary_path):
+        os.remove(temporary_path)
+
+
+def _append_update(file, update: SignatureUpdate):
+    """!
+    Append the signed update to the file signed in place and flush it to disk,
+    truncating the file back to its original size when anything fails, like @ref sign_pdf_in_place does.
+    """
+    if os.fstat(file.fileno()).st_size != update.base:
+        raise ValueError("The PDF file has changed while it was being signed")
+    file.seek(update.base)
+    try:
+        with span(STAGE_WRITE) as measured:
+            file.write(update.data)
+            file.flush()
+            os.fsync(file.fileno())
+            measured.add_bytes(len(update.data))
+    except BaseException:
+        file.truncate(update.base)
+        raise
+
+
+def _is_same_file(file_path: str, other_file_path: str) -> bool:
+    """!
+    @return True if both paths exist and are the same file.
+    """
+    return os.path.exists(other_file_path) and os.path.samefile(
+        file_path, other_file_path
+    )
+
+
+async def _sign_update_async(
+    executor: AsyncExecutor, update: SignatureUpdate, pdf_hash, key, algorithm
+):
+    """!
+    Add the signed parts of the update to the hash of the original file
+    and fill in the CMS signature of the digest made in the executor.
+    """
+    update.hash_into(pdf_hash)
+    update.set_contents(
+        await executor.run(create_signature, pdf_hash.digest(), key, algorithm.name)
+    )
+
+
+async def sign_pdf_async(
+    source,
+    private_key,
+    signed_file_path=None,
+    progress: callable = None,
+    digest_algorithm: str = None,
+    executor: AsyncExecutor = None,
+) -> None:
+    """!
+    Sign a PDF file with a private key and save it to the signed_file_path, without blocking the event loop.
+
+    The async counterpart of @ref sign_pdf: the files are read and written in the default executor
+    of the event loop, while parsing, hashing and signing run in the AsyncExecutor. The signed file is written
+    to a temporary file and renamed once complete, and the file is signed in place when it is the signed file itself.
+
+    @param source: The path to the PDF file to sign or an async byte stream with its contents,
+    such as an asyncio.StreamReader or an async iterable of bytes.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the PDF file with.
+    @param signed_file_path: The path to save the signed PDF file to. If None, the file will be saved
+    in the same directory with the same name but with "_signed" suffix, which requires the source to be a path.
+    @param progress: The callback function called with the number of bytes processed after every chunk.
+    It can raise @ref OperationCancelled to stop signing, the signed file is not created then.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+    @param executor: The AsyncExecutor or None to use the one returned by @ref get_async_executor.
+
+    @return None
+    """
+    executor = executor or get_async_executor()
+    from_path = isinstance(source, (str, os.PathLike))
+    if signed_file_path is None:
+        if not from_path:
+            raise ValueError("The signed file path is required to sign a stream")
+        signed_file_path = get_signed_file_path(source)
+    key = await executor.run(import_key, private_key)
+    algorithm = _get_signing_digest_algorithm(key, digest_algorithm)
+
+    if from_path and await executor.run_io(_is_same_file, source, signed_file_path):
+        with await executor.run_io(open, source, "r+b") as file:
+            update = await executor.run(_parse_signature_update, file)
+            pdf_hash = algorithm.new()
+            await _hash_file_async(executor, file, update.base, pdf_hash, progress)
+            await _sign_update_async(executor, update, pdf_hash, key, algorithm)
+            await executor.run_io(_append_update, file, update)
+        return
+
+    # A stream is hashed while it is copied to the temporary file, so it only has to be copied afterwards.
+    pdf_hash = algorithm.new()
+    async with _open_async(executor, source, pdf_hash, progress) as source_file:
+        update = await executor.run(_parse_signature_update, source_file)
+        target, temporary_path = await executor.run_io(
+            open_temporary_file, signed_file_path
+        )
+        try:
+            await _hash_file_async(
+                executor,
+                source_file,
+                update.base,
+                pdf_hash if from_path else None,
+                progress if from_path else None,
+                target,
+            )
+            await _sign_update_async(executor, update, pdf_hash, key, algorithm)
+            with span(STAGE_WRITE) as measured:
+                await executor.run_io(target.write, update.data)
+                measured.add_bytes(len(update.data))
+            await executor.run_io(
+                _finish_atomic_output, target, temporary_path, signed_file_path
+            )
+        except BaseException:
+            await executor.run_io(_discard_output, target, temporary_path)
+            raise
+
+
+async def sign_pdf_to_stream_async(
+    source,
+    private_key,
+    stream,
+    progress: callable = None,
+    digest_algorithm: str = None,
+    executor: AsyncExecutor = None,
+) -> None:
+    """!
+    Sign a PDF file and write the signed file to an async byte stream, such as an asyncio.StreamWriter
+    or an HTTP response, without creating any file and without blocking the event loop.
+
+    The async counterpart of @ref sign_pdf_to_stream: the file is hashed and signed before the first byte
+    is written, so a file that cannot be signed writes nothing to the stream.
+
+    @param source: The path to the PDF file to sign or an async byte stream with its contents,
+    which is copied to a temporary file first.
+    @param private_key: The private key (PEM or imported with @ref import_key) to sign the PDF file with.
+    @param stream: The async byte stream to write to, see @ref _write_async.
+    @param progress: The callback function called with the number of bytes hashed and then written after every chunk.
+    @param digest_algorithm: The name of the digest algorithm or None to use the one preferred by the key.
+    @param executor: The AsyncExecutor or None to use the one returned by @ref get_async_executor.
+
+    @return None
+    """
+    executor = executor or get_async_executor()
+    from_path = isinstance(source, (str, os.PathLike))
+    key = await executor.run(import_key, private_key)
+    algorithm = _get_signing_digest_algorithm(key, digest_algorithm)
+
+    pdf_hash = algorithm.new()
+    async with _open_async(executor, source, pdf_hash, progress) as source_file:
+        update = await executor.run(_parse_signature_update, source_file)
+        if from_path:
+            await _hash_file_async(
+                executor, source_file, update.base, pdf_hash, progress
+            )
+        await _sign_update_async(executor, update, pdf_hash, key, algorithm)
+
+        with span(STAGE_WRITE) as measured:
+            await executor.run_io(source_file.seek, 0)
+            position = 0
+            while position < update.base:
+                chunk = await executor.run_io(
+                    source_file.read, min(CHUNK_SIZE, update.base - position)
+                )
+                if not chunk:
+                    raise ValueError(
+                        "The PDF file has changed while it was being signed"
+                    )
+                await _write_async(stream, chunk)
+                position += len(chunk)
+                measured.add_bytes(len(chunk))
+                if progress is not None:
+                    progress(len(chunk))
+            await _write_async(stream, bytes(update.data))
+            measured.add_bytes(len(update.data))
+
+
+def _verify_legacy_digest(digest: bytes, signature: bytes, public_keys: list) -> bool:
+    """!
+    @return True if the raw signature appended by older versions is valid for any of the public keys.
+    """
+    return any(verify_digest(digest, signature, key) for key in public_keys)
+
+
+async def verify_pdf_async(
+    source,
+    public_key,
+    progress: callable = None,
+    executor: AsyncExecutor = None,
+) -> VerificationReport:
+    """!
+    Verify the signatures of a signed PDF file without blocking the event loop.
+
+    The async counterpart of @ref verify_pdf: the file is read in the default executor of the event loop,
+    while parsing, hashing and verifying run in the AsyncExecutor.
+
+    @param source: The path to the signed PDF file or an async byte stream with its contents,
+    which is copied to a temporary file first. The file path of the report of a stream is None.
+    @param public_key: The public key (PEM or imported with @ref import_key), a list of public keys
+    or a lib.trust_store.TrustStore, see @ref verify_pdf.
+    @param progress: The callback function called with the number of bytes hashed after every chunk,
+    or received for a stream, so it adds up to the size of the file once.
+    It can raise @ref OperationCancelled to stop verifying.
+    @param executor: The AsyncExecutor or None to use the one returned by @ref get_async_executor.
+
+    @return The VerificationReport with a SignatureReport of each signature.
+    """
+    executor = executor or get_async_executor()
+    from_path = isinstance(source, (str, os.PathLike))
+    public_keys, trust_store = await executor.run(_resolve_public_keys, public_key)
+    report = VerificationReport(source if from_path else None)
+
+    async with _open_async(executor, source, progress=progress) as f:
+        # A stream reports its progress while it is received, the file is then hashed silently.
+        hash_progress = progress if from_path else None
+        signed_ranges, parse_error = await executor.run(
+            _read_signatures_or_legacy, f, report
+        )
+        if signed_ranges is None:
+            if trust_store is not None:
+                public_keys = await executor.run(trust_store.public_keys)
+            file_size = (await executor.run_io(os.fstat, f.fileno())).st_size
+            legacy_report = SignatureReport(
+                None, revision_end=file_size, covers_whole_file=True
+            )
+            report.signatures.append(legacy_report)
+            pdf_length = file_size - SIGNATURE_LENGTH
+            if pdf_length < 0:
+                legacy_report.error = "File is too short to contain a signature"
+                return report
+            signature = await executor.run_io(_read_at, f, pdf_length, SIGNATURE_LENGTH)
+            pdf_hash = SHA256.new()
+            await _hash_file_async(executor, f, pdf_length, pdf_hash, hash_progress)
+            legacy_report.valid = legacy_report.intact = await executor.run(
+                _verify_legacy_digest, pdf_hash.digest(), signature, public_keys
+            )
+            _explain_legacy_failure(legacy_report, parse_error)
+            return report
+
+        digests = []
+        if signed_ranges:
+            hasher = _ByteRangeHasher(
+                [entry[1] for entry in signed_ranges],
+                [entry[3] for entry in signed_ranges],
+            )
+            await _hash_file_async(executor, f, hasher.end, hasher, hash_progress)
+            digests = hasher.digests()
+
+    await executor.run(
+        _check_signatures, signed_ranges, digests, public_keys, trust_store
+    )
+    return report
@@ -0,0 +1,287 @@
+## @file signing_service.py
+# This module contains the background signing service, which keeps the unlocked private key in memory
+# and serves sign and verify requests over a Unix domain socket.
+
+import asyncio
+import json
+import os
+import signal
+import socket
+import stat
+from dataclasses import asdict
+
+from lib.algorithms import DEFAULT_DIGEST_ALGORITHM
+from lib.key_management import (
+    clear_derived_key_cache,
+    load_public_key,
+    read_and_decrypt_private_key,
+)
+from lib.metrics import get_stats, is_enabled as is_metrics_enabled
+from lib.pdf_signing import create_signature, import_key, sign_pdf, verify_pdf
+from lib.verification_cache import VerificationCache
+
+## @var DEFAULT_SOCKET_PATH
+# The default path of the Unix domain socket the service listens on, in the runtime directory of the user.
+# Without XDG_RUNTIME_DIR, it is in a directory of the user in /tmp, created private by the service,
+# so another user cannot create the socket first and receive the PIN, see @ref check_socket_directory.
+DEFAULT_SOCKET_PATH = (
+    os.path.join(os.environ["XDG_RUNTIME_DIR"], f"pades-{os.getuid()}.sock")
+    if os.environ.get("XDG_RUNTIME_DIR")
+    else os.path.join("/tmp", f"pades-{os.getuid()}", "pades.sock")
+)
+## @var DEFAULT_IDLE_TIMEOUT
+# The default number of seconds after the last request when the private key is locked again.
+DEFAULT_IDLE_TIMEOUT = 300
+
+
+def check_socket_directory(socket_path: str, create: bool = False):
+    """!
+    Check that only the current user can create or replace the socket, before binding or connecting to it.
+    The directory of the socket has to be owned by the current user and not be writable by anybody else.
+
+    @param socket_path: The path of the socket.
+    @param create: True to create the directory, private to the current user, when it does not exist.
+
+    @throws PermissionError When the directory is not a directory of the current user, or others can write to it.
+    """
+    directory = os.path.dirname(os.path.abspath(socket_path))
+    if create:
+        try:
+            os.mkdir(directory, 0o700)
+        except FileExistsError:
+            pass
+    directory_stat = os.lstat(directory)
+    if (
+        not stat.S_ISDIR(directory_stat.st_mode)
+        or directory_stat.st_uid != os.getuid()
+        or directory_stat.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    ):
+        raise PermissionError(
+            f"The socket directory {directory} is not a private directory of the current user"
+        )
+
+
+class SigningService:
+    """!
+    A service that unlocks the private key from the USB drive once and keeps it in memory
+    until it is locked explicitly or it has not been used for the idle timeout.
+
+    Requests and responses are JSON objects, one per line. Every request has a "command" field:
+    - "unlock" with "pin" and "device" (the mount point of the USB drive),
+    - "lock",
+    - "status", with the statistics of the pipeline stages in "metrics" when lib.metrics instrumentation is on,
+    - "sign" with "path" and optional "output" or "in_place" to append the signature to the file itself,
+    - "sign_digest" with hex encoded "digest" from lib.pdf_signing.prepare_signature and optional
+      "digest_algorithm" (SHA256 by default), responding with the hex encoded CMS "signature",
+    - "verify" with "path" and optional "public_key" path, answered from the verification cache when there is one.
+
+    Every response has an "ok" field and an "error" field when the request failed.
+    """
+
+    def __init__(
+        self,
+        socket_path: str = DEFAULT_SOCKET_PATH,
+        idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+        verification_cache: VerificationCache = None,
+    ):
+        """!
+        @param socket_path: The path of the Unix domain socket to listen on.
+        @param idle_timeout: The number of seconds after the last request when the private key is locked.
+        @param verification_cache: The cache of verification results or None to verify every request.
+        """
+        self.socket_path = socket_path
+        self.idle_timeout = idle_timeout
+        self.verification_cache = verification_cache
+        self._private_key = None
+        self._lock_timer = None
+        self._commands = {
+            "unlock": self._unlock,
+            "lock": self._lock,
+            "status": self._status,
+            "sign": self._sign,
+            "sign_digest": self._sign_digest,
+            "verify": self._verify,
+        }
+
+    @property
+    def unlocked(self) -> bool:
+        """!
+        @return True if the private key is unlocked, False otherwise.
+        """
+        return self._private_key is not None
+
+    def lock(self):
+        """!
+        Forget the unlocked private key and the keys derived from the pin.
+
+        Python integers are immutable, so the key material cannot be overwritten in place.
+        The service holds the only reference to the imported key, dropping it lets the memory be reclaimed.
+        """
+        self._private_key = None
+        clear_derived_key_cache()
+        if self._lock_timer is not None:
+            self._lock_timer.cancel()
+            self._lock_timer = None
+
+    def _touch(self):
+        """!
+        Restart the idle timeout after the private key has been used.
+        """
+        if self._lock_timer is not None:
+            self._lock_timer.cancel()
+        self._lock_timer = asyncio.get_running_loop().call_later(
+            self.idle_timeout, self.lock
+        )
+
+    def _require_private_key(self):
+        """!
+        @return The unlocked private key.
+        """
+        if not self.unlocked:
+            raise ValueError("Private key is locked")
+        self._touch()
+        return self._private_key
+
+    async def _unlock(self, request: dict) -> dict:
+        loop = asyncio.get_running_loop()
+        private_key = await loop.run_in_executor(
+            None, read_and_decrypt_private_key, request["pin"], request["device"]
+        )
+        self._private_key = await loop.run_in_executor(None, import_key, private_key)
+        self._touch()
+        return {}
+
+    async def _lock(self, request: dict) -> dict:
+        self.lock()
+        return {}
+
+    async def _status(self, request: dict) -> dict:
+        response = {"unlocked": self.unlocked}
+        if self.verification_cache is not None:
+            response["cache"] = asdict(self.verification_cache.stats)
+        if is_metrics_enabled():
+            response["metrics"] = {
+                name: stats.to_dict() for name, stats in get_stats().items()
+            }
+        return response
+
+    async def _sign(self, request: dict) -> dict:
+        private_key = self._require_private_key()
+        output = request["path"] if request.get("in_place") else request.get("output")
+        await asyncio.get_running_loop().run_in_executor(
+            None, sign_pdf, request["path"], private_key, output
+        )
+        return {}
+
+    async def _sign_digest(self, request: dict) -> dict:
+        private_key = self._require_private_key()
+        signature = await asyncio.get_running_loop().run_in_executor(
+            None,
+            create_signature,
+            bytes.fromhex(request["digest"]),
+            private_key,
+            request.get("digest_algorithm", DEFAULT_DIGEST_ALGORITHM),
+        )
+        return {"signature": signature.hex()}
+
+    async def _verify(self, request: dict) -> dict:
+        public_key = load_public_key(request.get("public_key"))
+        verify = (
+            verify_pdf
+            if self.verification_cache is None
+            else self.verification_cache.verify_pdf
+        )
+        report = await asyncio.get_running_loop().run_in_executor(
+            None, verify, request["path"], public_key
+        )
+        return {
+            "valid": report.valid,
+            "signatures": [signature.to_dict() for signature in report.signatures],
+        }
+
+    async def handle_request(self, request: dict) -> dict:
+        """!
+        Handle a single request.
+
+        @param request: The request object.
+
+        @return The response object.
+        """
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "Invalid request: not a JSON object"}
+        command = request.get("command")
+        command = self._commands.get(command) if isinstance(command, str) else None
+        if command is None:
+            return {"ok": False, "error": f"Unknown command: {request.get('command')}"}
+        try:
+            return {"ok": True, **await command(request)}
+        except Exception as e:
+            # Arguments of the wrong type raise TypeError or AttributeError,
+            # which must not drop the connection of the client.
+            return {"ok": False, "error": f"{type(e).__name__}: {e}"}
+
+    async def _handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while line := await reader.readline():
+                try:
+                    response = await self.handle_request(json.loads(line))
+                except json.JSONDecodeError as e:
+                    response = {"ok": False, "error": f"Invalid request: {e}"}
+                writer.write(json.dumps(response).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self):
+        """!
+        Listen on the socket and serve the requests until cancelled or terminated with SIGTERM.
+        The socket is accessible only to the current user, in a directory only the current user can write to.
+
+        @throws PermissionError When the directory of the socket is not private, see @ref check_socket_directory.
+        """
+        check_socket_directory(self.socket_path, create=True)
+        asyncio.get_running_loop().add_signal_handler(
+            signal.SIGTERM, asyncio.current_task().cancel
+        )
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        old_umask = os.umask(0o077)
+        try:
+            server = await asyncio.start_unix_server(
+                self._handle_client, path=self.socket_path
+            )
+        finally:
+            os.umask(old_umask)
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            self.lock()
+            os.unlink(self.socket_path)
+
+
+def send_request(
+    command: str, socket_path: str = DEFAULT_SOCKET_PATH, **kwargs
+) -> dict:
+    """!
+    Send a single request to the running signing service and wait for the response.
+
+    @param command: The command to send.
+    @param socket_path: The path of the socket the service listens on.
+    @param kwargs: The arguments of the command.
+
+    @return The response object.
+    @throws PermissionError When the directory of the socket is not private, see @ref check_socket_directory.
+    """
+    check_socket_directory(socket_path)
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as client:
+        client.connect(socket_path)
+        client.sendall(
+            json.dumps({"command": command, **kwargs}).encode("utf-8") + b"\n"
+        )
+        with client.makefile("rb") as file:
+            return json.loads(file.readline())
@@ -0,0 +1,321 @@
+## @file trust_store.py
+# This module contains the trust store, a directory of the public keys of the trusted signers
+# indexed by their fingerprints.
+
+import json
+import os
+import threading
+from dataclasses import dataclass
+
+import Crypto.Hash.SHA256 as SHA256
+
+from lib.algorithms import export_key, get_key_type, import_key
+from lib.crypt import get_key_fingerprint
+from lib.files import open_temporary_file
+
+## @var DEFAULT_TRUST_STORE_DIR
+# The default directory of the trust store, in the data directory of the user.
+DEFAULT_TRUST_STORE_DIR = os.path.join(
+    os.environ.get("XDG_DATA_HOME", os.path.expanduser("~/.local/share")),
+    "pades",
+    "trusted_keys",
+)
+## @var INDEX_PATH
+# The path of the index file relative to the trust store directory. It is kept in a subdirectory,
+# so writing it does not change the modification time of the trust store directory itself.
+INDEX_PATH = os.path.join(".index", "keys.json")
+## @var INDEX_VERSION
+# The version of the format of the index file, an index of another version is rebuilt.
+INDEX_VERSION = 1
+## @var KEY_EXTENSION
+# The extension of the public key files added to the trust store.
+KEY_EXTENSION = ".pub"
+
+
+@dataclass
+class TrustedKey:
+    """! A dataclass representing a public key in the trust store.
+
+    Attributes: \n
+    fingerprint: The fingerprint of the key, see lib.crypt.get_key_fingerprint. \n
+    path: The path to the public key file. \n
+    key_type: The name of the key type, such as "rsa-4096".
+    """
+
+    fingerprint: bytes
+    path: str
+    key_type: str
+
+
+class TrustStore:
+    """!
+    A directory of public keys in PEM format, indexed by the fingerprints of the keys.
+
+    The fingerprint is the SHA256 hash of the DER encoded public key, the key identifier every signature
+    carries in its CMS SignerInfo, so the key of a signer is found with a single dictionary lookup
+    instead of trying every key. The index is kept in @link INDEX_PATH @endlink in the directory,
+    with the size and modification time of every key file, so only the files added or changed since the index
+    was written are parsed when the store is opened. The directory is scanned again when a fingerprint is not found
+    and the directory has changed. Parsed keys are kept in memory, so every key is parsed at most once.
+
+    Key files can be added to the directory by hand or with @ref add. The store can be shared by many threads.
+    """
+
+    def __init__(self, directory: str = DEFAULT_TRUST_STORE_DIR):
+        """!
+        @param directory: The directory of the trust store, created when it does not exist.
+        """
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._keys = {}
+        self._directory_mtime_ns = None
+        self._digest = None
+        os.makedirs(directory, exist_ok=True)
+        with self._lock:
+            self._load_index()
+            self._scan_if_changed()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def __contains__(self, fingerprint: bytes) -> bool:
+        return self.get_key(fingerprint) is not None
+
+    @property
+    def entries(self) -> list[TrustedKey]:
+        """!
+        @return The TrustedKey of every key in the store, ordered by the fingerprint.
+        """
+        with self._lock:
+            return [
+                TrustedKey(
+                    bytes.fromhex(fingerprint),
+                    os.path.join(self.directory, entry["file"]),
+                    entry["key_type"],
+                )
+                for fingerprint, entry in sorted(self._entries.items())
+            ]
+
+    @property
+    def digest(self) -> bytes:
+        """!
+        @return The SHA256 hash of the fingerprints of all the keys, which changes whenever the set of keys changes.
+        """
+        with self._lock:
+            if self._digest is None:
+                self._digest = SHA256.new(
+                    b"".join(bytes.fromhex(fp) for fp in sorted(self._entries))
+                ).digest()
+            return self._digest
+
+    def get_key(self, fingerprint: bytes):
+        """!
+        Find the public key with the fingerprint.
+
+        @param fingerprint: The fingerprint of the key, the key identifier of a signature.
+
+        @return The imported public key or None when the key is not in the store.
+        """
+        if not fingerprint:
+            return None
+        fingerprint = fingerprint.hex()
+        with self._lock:
+            key = self._keys.get(fingerprint)
+            if key is not None:
+                return key
+            if fingerprint not in self._entries:
+                self._scan_if_changed()
+            entry = self._entries.get(fingerprint)
+            if entry is None:
+                return None
+            key = self._read_key(entry["file"])
+            if key is None or get_key_fingerprint(key).hex() != fingerprint:
+                # The file was replaced since it was indexed.
+                self._scan()
+                return None
+            self._keys[fingerprint] = key
+            return key
+
+    def public_keys(self) -> list:
+        """!
+        Get all the keys in the store, for signatures that do not carry the fingerprint of the signer.
+
+        @return The imported public keys.
+        """
+        return [
+            key
+            for key in (self.get_key(entry.fingerprint) for entry in self.entries)
+            if key is not None
+        ]
+
+    def add(self, public_key) -> bytes:
+        """!
+        Add a public key to the store, saved as a file named after its fingerprint.
+
+        @param public_key: The public key in PEM format or imported with lib.algorithms.import_key.
+
+        @return The fingerprint of the key.
+        """
+        key = import_key(public_key)
+        if key.has_private():
+            key = key.public_key()
+        fingerprint = get_key_fingerprint(key)
+        filename = f"{fingerprint.hex()}{KEY_EXTENSION}"
+        path = os.path.join(self.directory, filename)
+        file, temporary_path = open_temporary_file(path)
+        try:
+            with file:
+                file.write(export_key(key))
+            os.replace(temporary_path, path)
+        except BaseException:
+            os.remove(temporary_path)
+            raise
+        with self._lock:
+            self._scan()
+            self._keys[fingerprint.hex()] = key
+        return fingerprint
+
+    def remove(self, fingerprint: bytes) -> bool:
+        """!
+        Remove the public key with the fingerprint from the store, deleting its file.
+
+        @param fingerprint: The fingerprint of the key.
+
+        @return True if the key was removed, False if it was not in the store.
+        """
+        with self._lock:
+            entry = self._entries.get(fingerprint.hex())
+            if entry is None:
+                return False
+            os.remove(os.path.join(self.directory, entry["file"]))
+            self._keys.pop(fingerprint.hex(), None)
+            self._scan()
+            return True
+
+    def refresh(self):
+        """!
+        Scan the directory again, also noticing key files modified in place, which do not change the directory.
+        """
+        with self._lock:
+            self._scan()
+
+    def _read_key(self, filename: str):
+        """!
+        @return The imported key of the file or None when the file is not a public key.
+        """
+        try:
+            with open(os.path.join(self.directory, filename), "rb") as file:
+                return import_key(file.read())
+        except (OSError, ValueError, IndexError, TypeError):
+            return None
+
+    def _load_index(self):
+        """!
+        Read the index file, an index that cannot be read is rebuilt by the next scan.
+        """
+        try:
+            with open(os.path.join(self.directory, INDEX_PATH), "r") as file:
+                index = json.load(file)
+            if index.get("version") != INDEX_VERSION:
+                return
+            self._entries = index["keys"]
+            self._directory_mtime_ns = index["directory_mtime_ns"]
+        except (OSError, ValueError, KeyError, AttributeError):
+            self._entries = {}
+            self._directory_mtime_ns = None
+
+    def _scan_if_changed(self):
+        """!
+        Scan the directory if it has changed since the index was written.
+        """
+        if os.stat(self.directory).st_mtime_ns != self._directory_mtime_ns:
+            self._scan()
+
+    def _scan(self):
+        """!
+        Index the key files of the directory, parsing only the files that are new or changed, and save the index.
+        """
+        directory_mtime_ns = os.stat(self.directory).st_mtime_ns
+        known = {entry["file"]: (fp, entry) for fp, entry in self._entries.items()}
+        entries = {}
+        for dir_entry in sorted(os.scandir(self.directory), key=lambda e: e.name):
+            if dir_entry.name.startswith(".") or dir_entry.name.endswith(".tmp"):
+                continue
+            if not dir_entry.is_file():
+                continue
+            stat = dir_entry.stat()
+            fingerprint, entry = known.get(dir_entry.name, (None, None))
+            if (
+                entry is None
+                or entry["size"] != stat.st_size
+                or entry["mtime_ns"] != stat.st_mtime_ns
+            ):
+                key = self._read_key(dir_entry.name)
+                if key is None or key.has_private():
+                    continue
+                fingerprint = get_key_fingerprint(key).hex()
+                entry = {
+                    "file": dir_entry.name,
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "key_type": get_key_type(key),
+                }
+                self._keys.pop(fingerprint, None)
+            entries.setdefault(fingerprint, entry)
+
+        for fingerprint in set(self._keys) - set(entries):
+            del self._keys[fingerprint]
+        self._entries = entries
+        self._directory_mtime_ns = directory_mtime_ns
+        self._digest = None
+        self._save_index()
+
+    def _save_index(self):
+        """!
+        Write the index file atomically, so other processes never read a half-written index.
+        """
+        path = os.path.join(self.directory, INDEX_PATH)
+        index = {
+            "version": INDEX_VERSION,
+            "directory_mtime_ns": self._directory_mtime_ns,
+            "keys": self._entries,
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            file, temporary_path = open_temporary_file(path)
+            try:
+                with file:
+                    file.write(json.dumps(index).encode("utf-8"))
+                os.replace(temporary_path, path)
+            except BaseException:
+                os.remove(temporary_path)
+                raise
+        except OSError:
+            # A read-only store still works, its index is only kept in memory.
+            pass
+
+
+## @var _trust_stores
+# The trust stores opened by @ref get_trust_store, keyed by the real path of the directory.
+_trust_stores = {}
+## @var _trust_stores_lock
+# The lock guarding @ref _trust_stores.
+_trust_stores_lock = threading.Lock()
+
+
+def get_trust_store(directory: str = DEFAULT_TRUST_STORE_DIR) -> TrustStore:
+    """!
+    Get the trust store of the directory, opened once per process, so the parsed keys are shared by all the callers.
+
+    @param directory: The directory of the trust store.
+
+    @return The TrustStore.
+    """
+    path = os.path.realpath(directory)
+    with _trust_stores_lock:
+        store = _trust_stores.get(path)
+        if store is None:
+            store = _trust_stores[path] = TrustStore(directory)
+        return store
@@ -1,8 +1,23 @@
 ## @file usb.py
 # This module contains functions related to handling USB drives.
 
+import itertools
 import os
-from dataclasses import dataclass
+import select
+import threading
+from dataclasses import dataclass, field
+
+## @var MOUNTS_PATH
+# The path of the mount table of the current process.
+# Polling it reports a change whenever a filesystem is mounted or unmounted.
+MOUNTS_PATH = "/proc/self/mounts"
+## @var FALLBACK_POLL_INTERVAL
+# The interval in seconds of re-reading the mount table when the changes cannot be waited for with poll().
+FALLBACK_POLL_INTERVAL = 1.0
+
+## @var _mount_generations
+# The counter of mount generations, unique in the whole application.
+_mount_generations = itertools.count(1)
 
 
 @dataclass
@@ -11,11 +26,15 @@ class USBDrive:
 
     Attributes: \n
     device: The device path of the USB drive. \n
-    mount_point: The mount point of the USB drive.
+    mount_point: The mount point of the USB drive. \n
+    generation: The number identifying this mount of the drive, assigned by the @ref MountWatcher
+    when the drive appears, so a drive unmounted and mounted again gets a new one.
+    0 when the drive was not seen by the watcher. It is ignored when comparing drives.
     """
 
     device: str
     mount_point: str
+    generation: int = field(default=0, compare=False)
 
     def __str__(self):
         """!
@@ -26,23 +45,21 @@ class USBDrive:
         return f"{self.mount_point.split('/')[-1]} ({self.device})"
 
 
-def get_usb_drives() -> list[USBDrive]:
+def parse_usb_drives(mounts: list[str]) -> list[USBDrive]:
     """!
-    Get a list of mounted USB drives.
+    Find the USB drives in the lines of the mount table.
 
-    This function reads the /proc/mounts file to get a list of mounted filesystems
-    and search for those that suppose to be USB drives.
+    @param mounts: The lines of the mount table.
 
     @return A list of USBDrive objects representing the mounted USB drives.
     """
     mounted_usb_drives = []
 
-    with open("/proc/mounts", "r") as f:
-        mounts = f.readlines()
-
     # Iterate over each mounted filesystem
     for mount in mounts:
         parts = mount.split()
+        if len(parts) < 2:
+            continue
         usb_drive = USBDrive(
             parts[0],
             parts[1],
@@ -53,3 +70,150 @@ def get_usb_drives() -> list[USBDrive]:
             mounted_usb_drives.append(usb_drive)
 
     return mounted_usb_drives
+
+
+def get_usb_drives() -> list[USBDrive]:
+    """!
+    Get a list of mounted USB drives.
+
+    This function reads the /proc/mounts file to get a list of mounted filesystems
+    and search for those that suppose to be USB drives.
+
+    @return A list of USBDrive objects representing the mounted USB drives.
+    """
+    with open("/proc/mounts", "r") as f:
+        return parse_usb_drives(f.readlines())
+
+
+class MountWatcher:
+    """!
+    A watcher of the mount table, which notifies the subscribers when the list of mounted USB drives changes.
+
+    A single background thread waits with poll() on @link MOUNTS_PATH @endlink, which signals every change
+    of the mount table, so no CPU is used while nothing is mounted or unmounted.
+    When poll() is not available, the mount table is re-read every @link FALLBACK_POLL_INTERVAL @endlink seconds.
+    The thread runs only while there are subscribers.
+    """
+
+    def __init__(self):
+        self._subscribers = []
+        self._drives = None
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake_read, self._wake_write = None, None
+
+    @property
+    def drives(self) -> list[USBDrive]:
+        """!
+        @return The USB drives mounted at the time of the last change.
+        """
+        with self._lock:
+            return list(self._drives) if self._drives is not None else get_usb_drives()
+
+    def subscribe(self, callback: callable):
+        """!
+        Subscribe to the changes of the mounted USB drives.
+
+        The callback is called from the watcher thread with the list of USBDrive objects,
+        right away with the currently mounted drives and then after every change.
+
+        @param callback: The callback function to call with the list of mounted USB drives.
+        """
+        with self._lock:
+            self._subscribers.append(callback)
+            if self._thread is None:
+                self._drives = None
+                self._wake_read, self._wake_write = os.pipe()
+                self._thread = threading.Thread(
+                    target=self._run, args=(self._wake_read,), daemon=True
+                )
+                self._thread.start()
+                return
+            drives = list(self._drives) if self._drives is not None else None
+        if drives is not None:
+            callback(drives)
+
+    def unsubscribe(self, callback: callable):
+        """!
+        Unsubscribe from the changes of the mounted USB drives.
+        The watcher thread is stopped when there are no subscribers left.
+
+        @param callback: The callback function passed to @ref subscribe.
+        """
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+            if self._subscribers or self._thread is None:
+                return
+            # Nothing tracks the mounts any more, so the drives get new generations once watched again.
+            self._generations.clear()
+            os.write(self._wake_write, b"\0")
+            os.close(self._wake_write)
+            self._thread = None
+
+    def _update(self, drives: list[USBDrive]):
+        """!
+        Assign the mount generations to the drives and notify the subscribers if the mounted USB drives have changed.
+        """
+        with self._lock:
+            mounts = {(drive.device, drive.mount_point) for drive in drives}
+            for mount in set(self._generations) - mounts:
+                del self._generations[mount]
+            for drive in drives:
+                mount = (drive.device, drive.mount_point)
+                if mount not in self._generations:
+                    self._generations[mount] = next(_mount_generations)
+                drive.generation = self._generations[mount]
+            if drives == self._drives:
+                return
+            self._drives = drives
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(list(drives))
+
+    def _run(self, wake_read: int):
+        """!
+        Wait for the changes of the mount table until woken up through the wake_read pipe.
+        """
+        try:
+            with open(MOUNTS_PATH, "r") as mounts:
+                poller = select.poll()
+                poller.register(mounts, select.POLLPRI | select.POLLERR)
+                poller.register(wake_read, select.POLLIN)
+                while True:
+                    mounts.seek(0)
+                    self._update(parse_usb_drives(mounts.readlines()))
+                    if any(fd == wake_read for fd, _ in poller.poll()):
+                        break
+        except (OSError, AttributeError):
+            self._run_polling(wake_read)
+        finally:
+            os.close(wake_read)
+
+    def _run_polling(self, wake_read: int):
+        """!
+        Re-read the mount table every @link FALLBACK_POLL_INTERVAL @endlink seconds until woken up through the wake_read pipe.
+        """
+        while True:
+            self._update(get_usb_drives())
+            ready, _, _ = select.select([wake_read], [], [], FALLBACK_POLL_INTERVAL)
+            if ready:
+                break
+
+
+## @var _mount_watcher
+# The mount watcher shared by all the windows, created by @ref get_mount_watcher.
+_mount_watcher = None
+
+
+def get_mount_watcher() -> MountWatcher:
+    """!
+    Get the mount watcher shared by the whole application.
+
+    @return The shared MountWatcher.
+    """
+    global _mount_watcher
+    if _mount_watcher is None:
+        _mount_watcher = MountWatcher()
+    return _mount_watcher
@@ -0,0 +1,285 @@
+## @file verification_cache.py
+# This module contains the persistent cache of verification results of signed PDF files.
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+
+import Crypto.Hash.SHA256 as SHA256
+
+from lib.crypt import get_key_fingerprint
+from lib.pdf_signing import (
+    SignatureReport,
+    VerificationReport,
+    hash_file,
+    import_key,
+    verify_pdf,
+)
+from lib.trust_store import TrustStore
+
+## @var DEFAULT_MAX_ENTRIES
+# The default maximum number of cached results, the least recently used ones are evicted above it.
+DEFAULT_MAX_ENTRIES = 100_000
+## @var RACY_INTERVAL
+# The number of seconds after a file modification during which its stat key is not trusted,
+# as the file could still change without changing its size and modification time.
+RACY_INTERVAL = 2.0
+## @var TOUCH_INTERVAL
+# The number of seconds for which the last use time of a result is not updated again,
+# so that cache hits of frequently verified files do not write to the database.
+TOUCH_INTERVAL = 60.0
+## @var EVICTION_INTERVAL
+# The maximum number of results stored between two checks of the size of the cache, so the rows
+# are not counted on every store. The cache can exceed its limit by up to 1% or this many results per process.
+EVICTION_INTERVAL = 1000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    path TEXT NOT NULL,
+    key_fingerprint BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    inode INTEGER NOT NULL,
+    device INTEGER NOT NULL,
+    content_hash BLOB NOT NULL,
+    report TEXT NOT NULL,
+    last_used REAL NOT NULL,
+    PRIMARY KEY (path, key_fingerprint)
+);
+CREATE INDEX IF NOT EXISTS results_content ON results (content_hash, key_fingerprint);
+CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used);
+CREATE INDEX IF NOT EXISTS results_size ON results (key_fingerprint, size);
+"""
+
+
+@dataclass
+class CacheStats:
+    """! A dataclass representing the counters of a verification cache.
+
+    Attributes: \n
+    hits: The number of results found by the file metadata, without reading the file. \n
+    content_hits: The number of results found by the hash of the file contents after the metadata changed. \n
+    misses: The number of files that had to be verified. \n
+    evictions: The number of results evicted to keep the cache within its size limit.
+    """
+
+    hits: int = 0
+    content_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+
+def _hash_file_contents(file_path: str) -> bytes:
+    """!
+    @return The SHA256 hash of the whole file, computed in chunks.
+    """
+    with open(file_path, "rb") as f:
+        return hash_file(f).digest()
+
+
+def _report_to_json(report: VerificationReport) -> str:
+    return json.dumps([signature.to_dict() for signature in report.signatures])
+
+
+def _report_from_json(file_path: str, data: str) -> VerificationReport:
+    return VerificationReport(
+        file_path,
+        [SignatureReport.from_dict(signature) for signature in json.loads(data)],
+    )
+
+
+class VerificationCache:
+    """!
+    A persistent cache of verification results stored in a SQLite database.
+
+    A result is looked up by the path of the file and the fingerprints of the public keys, and is used only
+    when the size, modification time, inode and device of the file are still the same, so a repeated verification
+    costs a single stat call. When the metadata changed, for example because the file was copied or touched,
+    the hash of the file contents is used as a fallback key, which still saves parsing the document
+    and verifying the signatures. The contents are hashed up front only when a cached result of a file
+    of the same size exists, otherwise they are hashed in the same pass as the signatures are verified,
+    so a file seen for the first time is read once. Results of files that changed are replaced, and the least
+    recently used results are evicted when there are more than max_entries of them,
+    checked every @link EVICTION_INTERVAL @endlink stores.
+
+    The cache can be shared by many threads and processes.
+    """
+
+    def __init__(self, path: str, max_entries: int = DEFAULT_MAX_ENTRIES):
+        """!
+        @param path: The path to the SQLite database, created when it does not exist.
+        @param max_entries: The maximum number of cached results.
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.stats = CacheStats()
+        self._lock = threading.Lock()
+        self._eviction_interval = max(1, min(EVICTION_INTERVAL, max_entries // 100))
+        # The first store checks the size, the cache may have been filled by another process.
+        self._stores_until_eviction = 1
+        self._connection = sqlite3.connect(
+            path, timeout=30, check_same_thread=False, isolation_level=None
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.executescript(_SCHEMA)
+
+    def close(self):
+        """!
+        Close the database.
+        """
+        with self._lock:
+            self._connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._connection.execute("SELECT COUNT(*) FROM results").fetchone()[
+                0
+            ]
+
+    def verify_pdf(self, file_path: str, public_key) -> VerificationReport:
+        """!
+        Verify the signatures of a signed PDF file, using the cached result when the file has not changed.
+
+        @param file_path: The path to the signed PDF file to verify.
+        @param public_key: The public key, the list of public keys or the lib.trust_store.TrustStore,
+        as accepted by @ref lib.pdf_signing.verify_pdf.
+
+        @return The VerificationReport of the file.
+        """
+        if isinstance(public_key, TrustStore):
+            # The results stay valid as long as the same keys are trusted.
+            public_keys = public_key
+            key_fingerprint = b"store:" + public_key.digest
+        else:
+            public_keys = (
+                public_key if isinstance(public_key, (list, tuple)) else [public_key]
+            )
+            public_keys = [import_key(key) for key in public_keys]
+            key_fingerprint = b"".join(
+                sorted(get_key_fingerprint(key) for key in public_keys)
+            )
+        file_path = os.path.abspath(file_path)
+        stat = os.stat(file_path)
+        stat_key = (stat.st_size, stat.st_mtime_ns, stat.st_ino, stat.st_dev)
+
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, inode, device, report, last_used FROM results "
+                "WHERE path = ? AND key_fingerprint = ?",
+                (file_path, key_fingerprint),
+            ).fetchone()
+            if row is not None and tuple(row[:4]) == stat_key:
+                if time.time() - row[5] > TOUCH_INTERVAL:
+                    self._touch(file_path, key_fingerprint)
+                self.stats.hits += 1
+                return _report_from_json(file_path, row[4])
+
+        with self._lock:
+            same_size = self._connection.execute(
+                "SELECT 1 FROM results WHERE key_fingerprint = ? AND size = ? LIMIT 1",
+                (key_fingerprint, stat.st_size),
+            ).fetchone()
+        row = None
+        if same_size is not None:
+            content_hash = _hash_file_contents(file_path)
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT report FROM results WHERE content_hash = ? AND key_fingerprint = ? LIMIT 1",
+                    (content_hash, key_fingerprint),
+                ).fetchone()
+        if row is not None:
+            report = _report_from_json(file_path, row[0])
+            self.stats.content_hits += 1
+        elif same_size is not None:
+            report = verify_pdf(file_path, public_keys)
+            self.stats.misses += 1
+        else:
+            # No cached file has the same size, so the contents cannot match one,
+            # they are hashed while the file is verified.
+            file_hash = SHA256.new()
+            report = verify_pdf(file_path, public_keys, content_hash=file_hash)
+            content_hash = file_hash.digest()
+            self.stats.misses += 1
+
+        # A file modified just now could still change without changing its size and modification time.
+        if time.time() - stat.st_mtime_ns / 1e9 > RACY_INTERVAL:
+            self._store(file_path, key_fingerprint, stat_key, content_hash, report)
+        return report
+
+    def invalidate(self, file_path: str):
+        """!
+        Remove the cached results of a file.
+
+        @param file_path: The path to the file.
+        """
+        with self._lock:
+            self._connection.execute(
+                "DELETE FROM results WHERE path = ?", (os.path.abspath(file_path),)
+            )
+
+    def clear(self):
+        """!
+        Remove all the cached results.
+        """
+        with self._lock:
+            self._connection.execute("DELETE FROM results")
+
+    def _touch(self, file_path: str, key_fingerprint: bytes):
+        self._connection.execute(
+            "UPDATE results SET last_used = ? WHERE path = ? AND key_fingerprint = ?",
+            (time.time(), file_path, key_fingerprint),
+        )
+
+    def _store(
+        self,
+        file_path: str,
+        key_fingerprint: bytes,
+        stat_key: tuple,
+        content_hash: bytes,
+        report: VerificationReport,
+    ):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        file_path,
+                        key_fingerprint,
+                        *stat_key,
+                        content_hash,
+                        _report_to_json(report),
+                        time.time(),
+                    ),
+                )
+                self._stores_until_eviction -= 1
+                excess = 0
+                if self._stores_until_eviction <= 0:
+                    self._stores_until_eviction = self._eviction_interval
+                    excess = (
+                        self._connection.execute(
+                            "SELECT COUNT(*) FROM results"
+                        ).fetchone()[0]
+                        - self.max_entries
+                    )
+                if excess > 0:
+                    self._connection.execute(
+                        "DELETE FROM results WHERE rowid IN "
+                        "(SELECT rowid FROM results ORDER BY last_used LIMIT ?)",
+                        (excess,),
+                    )
+                    self.stats.evictions += excess
+                self._connection.execute("COMMIT")
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
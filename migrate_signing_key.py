@@ -0,0 +1,53 @@
+## @file migrate_signing_key.py
+# This module represents the application to migrate a legacy or older private key file on the USB drive
+# to the current version of the format with a salted key derivation function.
+
+import argparse
+import getpass
+import os
+import sys
+
+from lib.key_management import (
+    KDF_PBKDF2,
+    KDF_SCRYPT,
+    PIN_ENVIRONMENT_VARIABLE,
+    migrate_private_key,
+)
+
+## @var KDFS
+# The key derivation functions available on the command line.
+KDFS = {"scrypt": KDF_SCRYPT, "pbkdf2": KDF_PBKDF2}
+
+
+def main() -> int:
+    """!
+    Entrypoint of the application.
+
+    @return The exit code: 0 on success, 1 on error.
+    """
+    parser = argparse.ArgumentParser(
+        description="Re-encrypt the private key on the USB drive with a salted key derivation function."
+    )
+    parser.add_argument(
+        "device", help="mount point of the USB drive with the private key"
+    )
+    parser.add_argument(
+        "--kdf",
+        choices=KDFS,
+        default="scrypt",
+        help="key derivation function (default: scrypt)",
+    )
+    args = parser.parse_args()
+
+    pin = os.environ.get(PIN_ENVIRONMENT_VARIABLE) or getpass.getpass("PIN: ")
+    try:
+        migrated = migrate_private_key(pin, args.device, KDFS[args.kdf])
+    except (OSError, ValueError) as e:
+        print(f"Migrating key failed! {e}", file=sys.stderr)
+        return 1
+    print("Private key migrated." if migrated else "Private key is already up to date.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
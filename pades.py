@@ -1,8 +1,27 @@
+import threading
+
 import dearpygui.dearpygui as dpg
 
-from lib.usb import get_usb_drives
-from windows.sign_pdf_window import sign_pdf_window
-from windows.verify_signature_window import verify_signature_window
+from windows.gui_thread import run_gui_calls
+
+
+def open_sign_pdf_window():
+    # The windows and the cryptography they use are imported on first use, so the viewport appears sooner.
+    from windows.sign_pdf_window import sign_pdf_window
+
+    sign_pdf_window(position=(10, 10), popup_position=(50, 50))
+
+
+def open_verify_signature_window():
+    from windows.verify_signature_window import verify_signature_window
+
+    verify_signature_window(position=(410, 10), popup_position=(460, 50))
+
+
+def preload_windows():
+    # Import the windows in the background once the viewport is shown, so the first click does not wait either.
+    import windows.sign_pdf_window
+    import windows.verify_signature_window
 
 
 def resize_callback(sender, app_data):
@@ -14,7 +33,7 @@ def resize_callback(sender, app_data):
 
 def main():
     dpg.create_context()
-    dpg.create_viewport(title="PAdES", width=820, height=600, resizable=False)
+    dpg.create_viewport(title="PAdES", width=820, height=760, resizable=False)
     dpg.setup_dearpygui()
 
     monitor_width = dpg.get_viewport_client_width()
@@ -38,9 +57,7 @@ def main():
             label="Sign PDF",
             width=800,
             height=200,
-            callback=lambda: sign_pdf_window(
-                position=(10, 10), popup_position=(50, 50)
-            ),
+            callback=open_sign_pdf_window,
         )
 
         dpg.add_spacer(height=50)
@@ -49,16 +66,21 @@ def main():
             label="Verify Signature",
             width=800,
             height=200,
-            callback=lambda: verify_signature_window(
-                position=(410, 10), popup_position=(460, 50)
-            ),
+            callback=open_verify_signature_window,
         )
 
     dpg.set_viewport_resize_callback(resize_callback)
     resize_callback(None, None)
 
     dpg.show_viewport()
-    dpg.start_dearpygui()
+    threading.Thread(target=preload_windows, daemon=True).start()
+    while dpg.is_dearpygui_running():
+        # The jobs report their changes from the worker threads, the windows are changed here.
+        run_gui_calls()
+        dpg.render_dearpygui_frame()
+    from lib.jobs import close_job_queue
+
+    close_job_queue()
     dpg.destroy_context()
 
 
@@ -0,0 +1,573 @@
+## @file pades_cli.py
+# This module represents the headless command-line interface to sign and verify PDF files and manage the keys.
+# It never imports the GUI, so it can be used in scripts and batch jobs.
+# The library modules are imported by the commands that use them, so printing the usage
+# or rejecting invalid arguments does not wait for the cryptography to load.
+
+import argparse
+import getpass
+import json
+import os
+import shutil
+import sys
+import tempfile
+from contextlib import contextmanager
+
+## @var EXIT_OK
+# The exit code when the command succeeded and all the signatures are valid.
+EXIT_OK = 0
+## @var EXIT_INVALID
+# The exit code when the document is not signed or some of its signatures are not valid.
+EXIT_INVALID = 1
+## @var EXIT_USAGE
+# The exit code of invalid command-line arguments, the same as used by argparse.
+EXIT_USAGE = 2
+## @var EXIT_ERROR
+# The exit code when a file could not be read, written or parsed.
+EXIT_ERROR = 3
+## @var EXIT_KEY_ERROR
+# The exit code when the private key could not be unlocked, for example because of a wrong PIN.
+EXIT_KEY_ERROR = 4
+
+## @var KDFS
+# The names of the key derivation functions available on the command line.
+KDFS = ("scrypt", "pbkdf2")
+## @var STDIO
+# The path standing for the standard input or output.
+STDIO = "-"
+
+
+class RegistryChoices:
+    """!
+    The names registered in a registry of lib.algorithms, such as KEY_TYPES, used as the choices of an option.
+
+    The registry is imported only when the option is given or the help is shown,
+    so the command-line interface still starts without importing lib.
+    """
+
+    def __init__(self, registry: str):
+        """!
+        @param registry: The name of the registry in lib.algorithms.
+        """
+        self.registry = registry
+
+    def _names(self) -> list[str]:
+        import lib.algorithms
+
+        return list(getattr(lib.algorithms, self.registry))
+
+    def __contains__(self, name) -> bool:
+        return name in self._names()
+
+    def __iter__(self):
+        return iter(self._names())
+
+
+class CommandError(Exception):
+    """!
+    An error that ends the command with the given exit code.
+    """
+
+    def __init__(self, message: str, exit_code: int = EXIT_ERROR):
+        """!
+        @param message: The message printed to the standard error.
+        @param exit_code: The exit code of the command.
+        """
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def get_default_public_key_path() -> str:
+    """!
+    @return The path to the public key used when none is given on the command line.
+    """
+    from lib.key_management import PUBLIC_KEY_DIR, PUBLIC_KEY_FILENAME
+
+    return f"{PUBLIC_KEY_DIR}/{PUBLIC_KEY_FILENAME}"
+
+
+def print_json(value, file=None):
+    """!
+    Print the value as a single JSON line, to the standard output by default.
+    """
+    print(json.dumps(value), file=file or sys.stdout, flush=True)
+
+
+@contextmanager
+def input_file(path: str, directory: str):
+    """!
+    Give the path of a file to read, spooling the standard input to a temporary file when the path is "-",
+    as the PDF parser needs to seek.
+
+    @param path: The path to the file or "-".
+    @param directory: The temporary directory to spool the standard input to.
+    """
+    if path != STDIO:
+        yield path
+        return
+    spooled_path = os.path.join(directory, "input.pdf")
+    with open(spooled_path, "wb") as file:
+        shutil.copyfileobj(sys.stdin.buffer, file)
+    yield spooled_path
+
+
+def read_pin(confirm: bool = False) -> str:
+    """!
+    Read the PIN from the @ref PIN_ENVIRONMENT_VARIABLE or prompt for it.
+
+    @param confirm: Whether to prompt for the PIN twice, when a new key is generated.
+
+    @return The PIN.
+    """
+    from lib.key_management import PIN_ENVIRONMENT_VARIABLE
+
+    pin = os.environ.get(PIN_ENVIRONMENT_VARIABLE)
+    if pin:
+        return pin
+    pin = getpass.getpass("PIN: ")
+    if confirm and getpass.getpass("Repeat PIN: ") != pin:
+        raise CommandError("PINs do not match.", EXIT_USAGE)
+    return pin
+
+
+def unlock_private_key(device: str):
+    """!
+    Read the private key from the device and decrypt it with the PIN.
+
+    @param device: The mount point of the USB drive or None to use the first drive with the private key.
+
+    @return The imported private key.
+    """
+    from lib.key_management import find_key_device, read_and_decrypt_private_key
+    from lib.pdf_signing import import_key
+
+    device = device or find_key_device()
+    if not device:
+        raise CommandError("No USB drive with the private key found.", EXIT_KEY_ERROR)
+    pin = read_pin()
+    try:
+        return import_key(read_and_decrypt_private_key(pin, device))
+    except FileNotFoundError as e:
+        raise CommandError(f"Private key not found: {e}", EXIT_KEY_ERROR)
+    except ValueError as e:
+        raise CommandError(f"Decrypting key failed! {e}", EXIT_KEY_ERROR)
+
+
+def sign_command(args) -> int:
+    """!
+    Sign a PDF file with the private key from the USB drive.
+    """
+    from lib.crypt import get_key_fingerprint
+    from lib.pdf_signing import (
+        get_signed_file_path,
+        sign_pdf,
+        sign_pdf_in_place,
+        sign_pdf_to_stream,
+    )
+
+    if args.in_place and (args.file == STDIO or args.output):
+        raise CommandError(
+            "--in-place signs the file itself, without --output.", EXIT_USAGE
+        )
+    private_key = unlock_private_key(args.device)
+    with tempfile.TemporaryDirectory() as directory:
+        with input_file(args.file, directory) as file_path:
+            output = args.output
+            if output is None and args.file == STDIO:
+                output = STDIO
+            if args.in_place:
+                signed_file_path = args.file
+                sign_pdf_in_place(file_path, private_key, digest_algorithm=args.digest)
+            elif output == STDIO:
+                signed_file_path = STDIO
+                sign_pdf_to_stream(
+                    file_path,
+                    private_key,
+                    sys.stdout.buffer,
+                    digest_algorithm=args.digest,
+                )
+                sys.stdout.buffer.flush()
+            else:
+                signed_file_path = output or get_signed_file_path(file_path)
+                sign_pdf(
+                    file_path,
+                    private_key,
+                    signed_file_path,
+                    digest_algorithm=args.digest,
+                )
+            result = {
+                "pdf": args.file,
+                "signed": signed_file_path,
+                "key_id": get_key_fingerprint(private_key).hex(),
+            }
+            print_json(result, sys.stderr if output == STDIO else None)
+    return EXIT_OK
+
+
+def verify_command(args) -> int:
+    """!
+    Verify the signatures of a PDF file and print the report.
+    """
+    from lib.key_management import load_public_key
+    from lib.pdf_signing import verify_pdf
+
+    if args.trust_store and args.public_key:
+        raise CommandError(
+            "--public-key cannot be used with --trust-store.", EXIT_USAGE
+        )
+    if args.trust_store:
+        from lib.trust_store import get_trust_store
+
+        public_keys = get_trust_store(args.trust_store)
+    else:
+        public_keys = [load_public_key(path) for path in args.public_key or [None]]
+    with tempfile.TemporaryDirectory() as directory:
+        with input_file(args.file, directory) as file_path:
+            if args.cache and args.file != STDIO:
+                from lib.verification_cache import VerificationCache
+
+                with VerificationCache(args.cache) as cache:
+                    report = cache.verify_pdf(file_path, public_keys)
+            else:
+                report = verify_pdf(file_path, public_keys)
+    print_json(
+        {
+            "pdf": args.file,
+            "valid": report.valid,
+            "signatures": [signature.to_dict() for signature in report.signatures],
+        }
+    )
+    return EXIT_OK if report.valid else EXIT_INVALID
+
+
+def trust_command(args) -> int:
+    """!
+    Add public keys to the trust store, remove them or list the trusted keys.
+    """
+    from lib.trust_store import DEFAULT_TRUST_STORE_DIR, get_trust_store
+
+    trust_store = get_trust_store(args.trust_store or DEFAULT_TRUST_STORE_DIR)
+    if args.action == "add":
+        for path in args.keys:
+            with open(path, "rb") as file:
+                trust_store.add(file.read())
+    elif args.action == "remove":
+        for key_id in args.keys:
+            try:
+                fingerprint = bytes.fromhex(key_id)
+            except ValueError:
+                raise CommandError(f"Invalid key id: {key_id}", EXIT_USAGE)
+            if not trust_store.remove(fingerprint):
+                raise CommandError(f"Key {key_id} is not trusted.", EXIT_ERROR)
+    print_json(
+        [
+            {
+                "key_id": entry.fingerprint.hex(),
+                "algorithm": entry.key_type,
+                "path": entry.path,
+            }
+            for entry in trust_store.entries
+        ]
+    )
+    return EXIT_OK
+
+
+def keygen_command(args) -> int:
+    """!
+    Generate a new key pair, save the encrypted private key to the USB drive and the public key to a file.
+    """
+    from lib.algorithms import DEFAULT_KEY_TYPE, generate_key_pair
+    from lib.crypt import get_key_fingerprint
+    from lib.key_management import (
+        KDF_PBKDF2,
+        KDF_SCRYPT,
+        encrypt_and_save_private_key,
+        get_private_key_path,
+    )
+    from lib.pdf_signing import import_key
+
+    if not os.path.isdir(args.device):
+        raise CommandError(f"Not a directory: {args.device}", EXIT_USAGE)
+    if os.path.exists(get_private_key_path(args.device)) and not args.force:
+        raise CommandError(
+            "The device already contains a private key, use --force to replace it.",
+            EXIT_USAGE,
+        )
+    pin = read_pin(confirm=True)
+    args.algorithm = args.algorithm or DEFAULT_KEY_TYPE
+    private_key, public_key = generate_key_pair(args.algorithm)
+    private_key_path = encrypt_and_save_private_key(
+        pin,
+        args.device,
+        private_key,
+        {"scrypt": KDF_SCRYPT, "pbkdf2": KDF_PBKDF2}[args.kdf],
+    )
+    public_key_path = args.public_key or get_default_public_key_path()
+    with open(public_key_path, "wb") as file:
+        file.write(public_key)
+    print_json(
+        {
+            "private_key": private_key_path,
+            "public_key": public_key_path,
+            "key_id": get_key_fingerprint(import_key(public_key)).hex(),
+            "algorithm": args.algorithm,
+            "kdf": args.kdf,
+        }
+    )
+    return EXIT_OK
+
+
+def inspect_key_device(device: str) -> dict:
+    """!
+    Describe the private key file on the device without decrypting it.
+
+    @return The description of the key file.
+    """
+    from datetime import datetime, timezone
+
+    from lib.key_management import (
+        KDF_SCRYPT,
+        get_private_key_path,
+        read_key_file_header,
+    )
+
+    private_key_path = get_private_key_path(device)
+    header = read_key_file_header(device)
+    info = {"private_key": private_key_path, "format": "legacy"}
+    if header is not None:
+        info.update(
+            format=f"v{header.version}",
+            kdf="scrypt" if header.kdf == KDF_SCRYPT else "pbkdf2",
+            cost=header.cost,
+            block_size=header.block_size,
+            parallelization=header.parallelization,
+        )
+    if header is not None and header.version >= 2:
+        info.update(
+            key_id=header.fingerprint.hex(),
+            algorithm=header.key_type,
+            created=datetime.fromtimestamp(header.created, timezone.utc).isoformat(),
+        )
+    return info
+
+
+def tokens_command(args) -> int:
+    """!
+    Print the mounted USB drives holding a private key, with the fingerprint, type and creation date of every key.
+    """
+    from datetime import datetime, timezone
+
+    from lib.key_management import read_key_token
+    from lib.usb import get_usb_drives
+
+    tokens = []
+    for drive in get_usb_drives():
+        token = read_key_token(drive)
+        if token is None:
+            continue
+        tokens.append(
+            {
+                "device": token.drive.device,
+                "mount_point": token.drive.mount_point,
+                "format": token.format,
+                "key_id": token.fingerprint.hex() if token.fingerprint else None,
+                "algorithm": token.key_type,
+                "created": (
+                    datetime.fromtimestamp(token.created, timezone.utc).isoformat()
+                    if token.created
+                    else None
+                ),
+            }
+        )
+    print_json(tokens)
+    return EXIT_OK
+
+
+def inspect_command(args) -> int:
+    """!
+    Print the signatures of a PDF file without verifying them, or describe the keys on a USB drive.
+    """
+    from lib.algorithms import get_key_type
+    from lib.crypt import get_key_fingerprint
+    from lib.key_management import load_public_key
+    from lib.pdf_signing import inspect_pdf
+
+    if args.path != STDIO and os.path.isdir(args.path):
+        info = inspect_key_device(args.path)
+        public_key_path = get_default_public_key_path()
+        if os.path.exists(public_key_path):
+            public_key = load_public_key(public_key_path)
+            key_id = get_key_fingerprint(public_key).hex()
+            if "key_id" in info:
+                info["public_key_matches"] = info["key_id"] == key_id
+            info.update(
+                public_key=public_key_path,
+                key_id=key_id,
+                algorithm=get_key_type(public_key),
+            )
+        print_json(info)
+        return EXIT_OK
+
+    with tempfile.TemporaryDirectory() as directory:
+        with input_file(args.path, directory) as file_path:
+            report = inspect_pdf(file_path)
+    signatures = []
+    for signature in report.signatures:
+        signature = signature.to_dict()
+        # Nothing was verified, only the structure of the signatures was read.
+        del signature["intact"]
+        del signature["valid"]
+        signatures.append(signature)
+    print_json({"pdf": args.path, "signatures": signatures})
+    return EXIT_OK if signatures and signatures[0]["field"] else EXIT_INVALID
+
+
+def main() -> int:
+    """!
+    Entrypoint of the application.
+
+    @return The exit code: @ref EXIT_OK, @ref EXIT_INVALID, @ref EXIT_USAGE, @ref EXIT_ERROR or @ref EXIT_KEY_ERROR.
+    """
+    parser = argparse.ArgumentParser(
+        prog="pades",
+        description="Sign and verify PDF files and manage the signing keys. Results are printed as JSON.",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="log the duration and size of every stage of the pipeline to stderr",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="write the statistics of the pipeline stages to the file in the Prometheus text format",
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    sign = commands.add_parser("sign", help="sign a PDF file")
+    sign.add_argument("file", help="PDF file to sign ('-' for stdin)")
+    sign.add_argument(
+        "-o",
+        "--output",
+        help="signed file path ('-' for stdout, default: next to the file with '_signed' suffix, stdout for stdin)",
+    )
+    sign.add_argument(
+        "-d",
+        "--device",
+        help="mount point of the USB drive with the private key (default: first drive found)",
+    )
+    sign.add_argument(
+        "-i",
+        "--in-place",
+        action="store_true",
+        help="append the signature to the file itself instead of writing a signed copy",
+    )
+    sign.add_argument(
+        "--digest",
+        choices=RegistryChoices("DIGEST_ALGORITHMS"),
+        help="digest algorithm (default: preferred by the key, sha256 for RSA)",
+    )
+    sign.set_defaults(handler=sign_command)
+
+    verify = commands.add_parser("verify", help="verify the signatures of a PDF file")
+    verify.add_argument("file", help="signed PDF file ('-' for stdin)")
+    verify.add_argument(
+        "-k",
+        "--public-key",
+        action="append",
+        help="public key file, can be repeated for documents with several signers "
+        "(default: public_key.pub in the current directory)",
+    )
+    verify.add_argument(
+        "-t",
+        "--trust-store",
+        help="directory of trusted public keys, the key of every signer is looked up by its key id",
+    )
+    verify.add_argument("-c", "--cache", help="path to the verification cache database")
+    verify.set_defaults(handler=verify_command)
+
+    keygen = commands.add_parser("keygen", help="generate a new signing key pair")
+    keygen.add_argument(
+        "device", help="mount point of the USB drive to save the private key to"
+    )
+    keygen.add_argument(
+        "-p",
+        "--public-key",
+        help="public key file to write (default: public_key.pub in the current directory)",
+    )
+    keygen.add_argument(
+        "-a",
+        "--algorithm",
+        choices=RegistryChoices("KEY_TYPES"),
+        help="key type; ECDSA and Ed25519 keys sign much faster than RSA (default: rsa-4096)",
+    )
+    keygen.add_argument(
+        "--kdf",
+        choices=KDFS,
+        default="scrypt",
+        help="key derivation function (default: scrypt)",
+    )
+    keygen.add_argument(
+        "-f", "--force", action="store_true", help="replace an existing private key"
+    )
+    keygen.set_defaults(handler=keygen_command)
+
+    inspect = commands.add_parser(
+        "inspect",
+        help="list the signatures of a PDF file without verifying them, or describe the keys on a USB drive",
+    )
+    inspect.add_argument(
+        "path", help="PDF file ('-' for stdin) or USB drive mount point"
+    )
+    inspect.set_defaults(handler=inspect_command)
+
+    tokens = commands.add_parser(
+        "tokens",
+        help="list the mounted USB drives holding a private key, without decrypting the keys",
+    )
+    tokens.set_defaults(handler=tokens_command)
+
+    trust = commands.add_parser(
+        "trust", help="add or remove trusted public keys, or list them"
+    )
+    trust.add_argument("action", choices=("add", "remove", "list"))
+    trust.add_argument(
+        "keys", nargs="*", help="public key files to add or key ids to remove"
+    )
+    trust.add_argument(
+        "-t",
+        "--trust-store",
+        help="directory of trusted public keys (default: ~/.local/share/pades/trusted_keys)",
+    )
+    trust.set_defaults(handler=trust_command)
+
+    args = parser.parse_args()
+    if args.trace or args.metrics:
+        from lib.metrics import enable_metrics, enable_trace_logging
+
+        if args.trace:
+            enable_trace_logging()
+        else:
+            enable_metrics()
+    try:
+        return args.handler(args)
+    except CommandError as e:
+        print(e, file=sys.stderr)
+        return e.exit_code
+    except (OSError, ValueError) as e:
+        # Including lib.pdf.PdfError, raised for a file that cannot be parsed.
+        print(f"Error: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    except Exception as e:
+        # An unexpected error must not exit with the code of an invalid signature.
+        print(f"Error: {type(e).__name__}: {e}", file=sys.stderr)
+        return EXIT_ERROR
+    finally:
+        if args.metrics:
+            from lib.metrics import write_prometheus
+
+            write_prometheus(args.metrics)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
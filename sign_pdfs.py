@@ -0,0 +1,146 @@
+## @file sign_pdfs.py
+# This module represents the headless application to sign many PDF files in one session.
+
+import argparse
+import getpass
+import glob
+import os
+import sys
+
+from lib.algorithms import DIGEST_ALGORITHMS
+from lib.key_management import (
+    PIN_ENVIRONMENT_VARIABLE,
+    find_key_device,
+    read_and_decrypt_private_key,
+)
+from lib.metrics import enable_metrics, enable_trace_logging, write_prometheus
+from lib.parallel import sign_many_parallel
+from lib.pdf_signing import SignResult, sign_many
+
+
+def expand_paths(patterns: list[str]) -> list[str]:
+    """!
+    Expand the files, directories and glob patterns given on the command line into a list of PDF files.
+
+    Directories are expanded to the PDF files they directly contain.
+
+    @param patterns: The files, directories and glob patterns to expand.
+
+    @return The sorted list of paths to the PDF files, without duplicates.
+    """
+    file_paths = set()
+    for pattern in patterns:
+        for path in glob.glob(pattern) or [pattern]:
+            if os.path.isdir(path):
+                file_paths.update(glob.glob(os.path.join(path, "*.pdf")))
+            else:
+                file_paths.add(path)
+    return sorted(file_paths)
+
+
+def print_result(result: SignResult):
+    """!
+    Print the result of signing a single PDF file.
+    """
+    if result.ok:
+        print(f"OK     {result.file_path} -> {result.signed_file_path}")
+    else:
+        print(f"FAILED {result.file_path}: {result.error}", file=sys.stderr)
+
+
+def main() -> int:
+    """!
+    Entrypoint of the application.
+
+    @return The exit code: 0 when all files were signed, 1 when some of them failed and 2 on other errors.
+    """
+    parser = argparse.ArgumentParser(
+        description="Sign many PDF files with the private key from the USB drive."
+    )
+    parser.add_argument(
+        "paths", nargs="+", help="PDF files, directories or glob patterns to sign"
+    )
+    parser.add_argument(
+        "-d",
+        "--device",
+        help="mount point of the USB drive with the private key (default: first drive found)",
+    )
+    parser.add_argument(
+        "-o", "--output-dir", help="directory to save the signed files to"
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=1,
+        help="number of worker processes, 0 to use all CPU cores (default: 1)",
+    )
+    parser.add_argument(
+        "--digest",
+        choices=DIGEST_ALGORITHMS,
+        help="digest algorithm (default: preferred by the key, sha256 for RSA)",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="log the duration and size of every stage of the pipeline to stderr",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="write the statistics of the pipeline stages to the file in the Prometheus text format",
+    )
+    args = parser.parse_args()
+    if args.trace:
+        enable_trace_logging()
+    elif args.metrics:
+        enable_metrics()
+
+    file_paths = expand_paths(args.paths)
+    if not file_paths:
+        print("No PDF files to sign.", file=sys.stderr)
+        return 2
+
+    device = args.device or find_key_device()
+    if not device:
+        print("No USB drive with the private key found.", file=sys.stderr)
+        return 2
+
+    pin = os.environ.get(PIN_ENVIRONMENT_VARIABLE) or getpass.getpass("PIN: ")
+    try:
+        private_key = read_and_decrypt_private_key(pin, device)
+    except (OSError, ValueError) as e:
+        print(f"Decrypting key failed! {e}", file=sys.stderr)
+        return 2
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.workers == 1:
+        batch_result = sign_many(
+            file_paths,
+            private_key,
+            args.output_dir,
+            on_result=print_result,
+            digest_algorithm=args.digest,
+        )
+    else:
+        batch_result = sign_many_parallel(
+            file_paths,
+            private_key,
+            args.output_dir,
+            workers=args.workers or None,
+            on_result=print_result,
+            digest_algorithm=args.digest,
+        )
+    print(
+        f"Signed {batch_result.signed}/{len(batch_result.results)} files "
+        f"in {batch_result.elapsed:.2f} s ({batch_result.throughput:.2f} docs/s)"
+    )
+    if args.metrics:
+        write_prometheus(args.metrics)
+    return 1 if batch_result.failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
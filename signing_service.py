@@ -0,0 +1,74 @@
+## @file signing_service.py
+# This module represents the application running the background signing service.
+
+import argparse
+import asyncio
+
+from lib.metrics import enable_metrics, enable_trace_logging, serve_prometheus
+from lib.signing_service import (
+    DEFAULT_IDLE_TIMEOUT,
+    DEFAULT_SOCKET_PATH,
+    SigningService,
+)
+from lib.verification_cache import VerificationCache
+
+
+def main():
+    """!
+    Entrypoint of the application.
+    """
+    parser = argparse.ArgumentParser(
+        description="Keep the unlocked private key in memory and serve sign and verify requests."
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        default=DEFAULT_SOCKET_PATH,
+        help=f"path of the Unix domain socket (default: {DEFAULT_SOCKET_PATH})",
+    )
+    parser.add_argument(
+        "-t",
+        "--idle-timeout",
+        type=float,
+        default=DEFAULT_IDLE_TIMEOUT,
+        help=f"seconds of inactivity after which the key is locked (default: {DEFAULT_IDLE_TIMEOUT})",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        help="path to the verification cache database, so files that did not change are not verified again",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="log the duration and size of every stage of the pipeline to stderr",
+    )
+    parser.add_argument(
+        "--metrics-port",
+        type=int,
+        help="serve the statistics of the pipeline stages in the Prometheus text format on this local HTTP port",
+    )
+    args = parser.parse_args()
+
+    if args.trace:
+        enable_trace_logging()
+    elif args.metrics_port is not None:
+        enable_metrics()
+    if args.metrics_port is not None:
+        serve_prometheus(args.metrics_port)
+
+    verification_cache = VerificationCache(args.cache) if args.cache else None
+    service = SigningService(args.socket, args.idle_timeout, verification_cache)
+    try:
+        asyncio.run(service.serve())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+    except PermissionError as e:
+        parser.exit(1, f"Error: {e}\n")
+    finally:
+        if verification_cache is not None:
+            verification_cache.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+## @file conftest.py
+# This module contains the pytest fixtures shared by the tests: small PDF files and key pairs of every key type.
+
+import os
+import time
+
+import pytest
+
+from lib.algorithms import generate_key_pair, import_key
+
+## @var TEST_KEY_TYPES
+# The key types the tests sign with, the smallest key of each family so the keys are generated quickly.
+TEST_KEY_TYPES = ("rsa-2048", "ecdsa-p256", "ecdsa-p384", "ed25519")
+## @var TEST_PIN
+# The PIN the test private keys are encrypted with.
+TEST_PIN = "1234"
+
+
+def write_pdf(path, padding: int = 1000) -> str:
+    """!
+    Write a single page PDF file with a classic cross-reference table.
+
+    @param path: The path of the file.
+    @param padding: The number of bytes of the content stream of the page.
+
+    @return The path of the file as a string.
+    """
+    objects = [
+        b"<</Type /Catalog /Pages 2 0 R>>",
+        b"<</Type /Pages /Kids [3 0 R] /Count 1>>",
+        b"<</Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R>>",
+        b"<</Length %d>>\nstream\n%s\nendstream" % (padding, b"0" * padding),
+    ]
+    data = bytearray(b"%PDF-1.7\n")
+    offsets = []
+    for number, value in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += b"%d 0 obj\n%s\nendobj\n" % (number, value)
+    xref_offset = len(data)
+    data += b"xref\n0 %d\n0000000000 65535 f\r\n" % (len(offsets) + 1)
+    for offset in offsets:
+        data += b"%010d 00000 n\r\n" % offset
+    data += b"trailer\n<</Size %d /Root 1 0 R>>\nstartxref\n%d\n%%%%EOF\n" % (
+        len(offsets) + 1,
+        xref_offset,
+    )
+    with open(path, "wb") as file:
+        file.write(data)
+    return str(path)
+
+
+def age_file(path, seconds: float = 10.0):
+    """!
+    Move the modification time of the file into the past, so the verification cache trusts its metadata.
+    """
+    past = time.time() - seconds
+    os.utime(path, (past, past))
+
+
+@pytest.fixture
+def pdf_file(tmp_path) -> str:
+    """!
+    @return The path of a new unsigned PDF file.
+    """
+    return write_pdf(tmp_path / "document.pdf")
+
+
+@pytest.fixture(scope="session")
+def key_pairs() -> dict:
+    """!
+    @return The imported private keys by key type, generated once for all the tests.
+    """
+    return {
+        key_type: import_key(generate_key_pair(key_type)[0])
+        for key_type in TEST_KEY_TYPES
+    }
+
+
+@pytest.fixture
+def rsa_key(key_pairs):
+    """!
+    @return The imported RSA private key.
+    """
+    return key_pairs["rsa-2048"]
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers",
+        "slow: tests starting fresh interpreters, deselect with -m 'not slow'",
+    )
@@ -0,0 +1,137 @@
+## @file test_async.py
+# Tests of the async API of signing and verifying.
+
+import asyncio
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from lib.pdf_signing import (
+    AsyncExecutor,
+    OperationCancelled,
+    get_signed_file_path,
+    sign_pdf_async,
+    sign_pdf_to_stream_async,
+    verify_pdf,
+    verify_pdf_async,
+)
+
+
+async def iterate_chunks(path: str, size: int = 1000):
+    """!
+    @return An async iterable of the contents of the file.
+    """
+    with open(path, "rb") as file:
+        while chunk := file.read(size):
+            yield chunk
+            await asyncio.sleep(0)
+
+
+class BufferWriter:
+    """!
+    An async byte stream collecting everything written to it.
+    """
+
+    def __init__(self):
+        self.buffer = io.BytesIO()
+
+    async def write(self, data):
+        self.buffer.write(data)
+
+
+@pytest.fixture
+def executor():
+    """!
+    @return An AsyncExecutor with its own thread pool.
+    """
+    with ThreadPoolExecutor(4) as pool:
+        yield AsyncExecutor(pool, max_in_flight=2)
+
+
+def test_sign_and_verify_path(pdf_file, rsa_key, executor):
+    asyncio.run(sign_pdf_async(pdf_file, rsa_key, executor=executor))
+    signed_file = get_signed_file_path(pdf_file)
+
+    report = asyncio.run(
+        verify_pdf_async(signed_file, rsa_key.public_key(), executor=executor)
+    )
+
+    assert report.valid
+    assert report.signatures == verify_pdf(signed_file, rsa_key.public_key()).signatures
+
+
+def test_sign_stream_to_stream(pdf_file, key_pairs, executor, tmp_path):
+    key = key_pairs["ecdsa-p256"]
+    writer = BufferWriter()
+
+    asyncio.run(
+        sign_pdf_to_stream_async(
+            iterate_chunks(pdf_file), key, writer, executor=executor
+        )
+    )
+
+    signed_file = tmp_path / "signed.pdf"
+    signed_file.write_bytes(writer.buffer.getvalue())
+    assert verify_pdf(str(signed_file), key.public_key()).valid
+
+
+def test_verify_stream_reader(pdf_file, rsa_key, executor):
+    asyncio.run(sign_pdf_async(pdf_file, rsa_key, executor=executor))
+    with open(get_signed_file_path(pdf_file), "rb") as file:
+        data = file.read()
+    processed = []
+
+    async def verify():
+        reader = asyncio.StreamReader()
+        reader.feed_data(data)
+        reader.feed_eof()
+        return await verify_pdf_async(
+            reader, rsa_key.public_key(), processed.append, executor=executor
+        )
+
+    assert asyncio.run(verify()).valid
+    assert sum(processed) == len(data)
+
+
+def test_cancel_leaves_no_file(pdf_file, rsa_key, executor):
+    def cancel(processed):
+        raise OperationCancelled()
+
+    with pytest.raises(OperationCancelled):
+        asyncio.run(
+            sign_pdf_async(pdf_file, rsa_key, progress=cancel, executor=executor)
+        )
+
+    assert os.listdir(os.path.dirname(pdf_file)) == [os.path.basename(pdf_file)]
+
+
+def test_max_in_flight():
+    lock = threading.Lock()
+    running = 0
+    most_running = 0
+    release = threading.Event()
+
+    def work():
+        nonlocal running, most_running
+        with lock:
+            running += 1
+            most_running = max(most_running, running)
+        release.wait(0.05)
+        with lock:
+            running -= 1
+
+    async def run_all(executor):
+        await asyncio.gather(*(executor.run(work) for _ in range(8)))
+
+    with ThreadPoolExecutor(8) as pool:
+        asyncio.run(run_all(AsyncExecutor(pool, max_in_flight=2)))
+
+    assert most_running == 2
+
+
+def test_max_in_flight_must_be_positive():
+    with pytest.raises(ValueError):
+        AsyncExecutor(max_in_flight=0)
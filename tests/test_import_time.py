@@ -0,0 +1,54 @@
+## @file test_import_time.py
+# Tests of the start-up of the entry points, with the budgets of benchmarks.import_time.
+
+import os
+
+import pytest
+
+from benchmarks.import_time import (
+    ENTRY_POINTS,
+    EntryPoint,
+    measure,
+    parse_importtime,
+    run_importtime,
+)
+
+## @var IMPORT_TIME_REPEAT
+# The imports of each entry point, the fastest one is compared with the budget.
+IMPORT_TIME_REPEAT = 3
+## @var IMPORT_TIME_SCALE_VARIABLE
+# The environment variable with the multiplier of the budgets, for slower machines.
+IMPORT_TIME_SCALE_VARIABLE = "PADES_IMPORT_TIME_SCALE"
+
+
+@pytest.fixture(scope="module")
+def startup_modules() -> set[str]:
+    """!
+    @return The modules imported by the bare interpreter.
+    """
+    return {name for name, *_ in parse_importtime(run_importtime("pass"))}
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize(
+    "entry_point",
+    ENTRY_POINTS,
+    ids=[entry_point.module for entry_point in ENTRY_POINTS],
+)
+def test_import_time(entry_point: EntryPoint, startup_modules):
+    try:
+        measurements = [
+            measure(entry_point, startup_modules) for _ in range(IMPORT_TIME_REPEAT)
+        ]
+    except ImportError as e:
+        pytest.skip(f"{entry_point.module} cannot be imported: {e}")
+    import_time = min(time for time, _ in measurements)
+    budget = entry_point.budget_ms * float(
+        os.environ.get(IMPORT_TIME_SCALE_VARIABLE, 1.0)
+    )
+
+    assert measurements[0][1] == [], f"{entry_point.module} imports forbidden modules"
+    assert import_time <= budget, (
+        f"{entry_point.module} takes {import_time:.1f} ms to import, "
+        f"over its budget of {budget:.1f} ms"
+    )
@@ -0,0 +1,77 @@
+## @file test_jobs.py
+# Tests of the queue of background jobs.
+
+import os
+import threading
+
+import pytest
+
+from lib.jobs import JOB_CANCELLED, JOB_DONE, JOB_FAILED, JobQueue
+from lib.pdf_signing import get_signed_file_path, sign_pdf
+
+
+@pytest.fixture
+def queue():
+    """!
+    @return A JobQueue with one worker, closed after the test.
+    """
+    queue = JobQueue(workers=1)
+    yield queue
+    queue.close()
+
+
+def run_job(queue: JobQueue, file_path: str, function: callable):
+    """!
+    Run a job and wait until it finishes.
+
+    @return The finished Job.
+    """
+    finished = threading.Event()
+    queue.subscribe(lambda job: job.finished and finished.set())
+    job = queue.submit("Test", file_path, function)
+    assert finished.wait(10)
+    return job
+
+
+def test_sign_job(queue, pdf_file, rsa_key):
+    job = run_job(
+        queue, pdf_file, lambda progress: sign_pdf(pdf_file, rsa_key, None, progress)
+    )
+
+    assert job.state == JOB_DONE
+    assert job.progress == 1.0
+    assert job.done >= job.total
+    assert os.path.exists(get_signed_file_path(pdf_file))
+
+
+@pytest.mark.parametrize("error", [OSError, KeyError, TypeError])
+def test_failed_job(queue, pdf_file, error):
+    def fail(progress):
+        raise error("failed")
+
+    job = run_job(queue, pdf_file, fail)
+
+    assert job.state == JOB_FAILED
+    assert isinstance(job.error, error)
+
+
+def test_cancelled_job(queue, pdf_file, rsa_key, tmp_path):
+    signed_file_path = str(tmp_path / "signed.pdf")
+    started = threading.Event()
+    release = threading.Event()
+
+    def block(progress):
+        started.set()
+        release.wait(10)
+        return sign_pdf(pdf_file, rsa_key, signed_file_path, progress)
+
+    finished = threading.Event()
+    queue.subscribe(lambda job: job.finished and finished.set())
+    job = queue.submit("Test", pdf_file, block)
+    assert started.wait(10)
+    job.cancel()
+    release.set()
+    assert finished.wait(10)
+
+    assert job.state == JOB_CANCELLED
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["document.pdf"]
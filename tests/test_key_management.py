@@ -0,0 +1,262 @@
+## @file test_key_management.py
+# Tests of the encrypted private key file.
+
+import os
+
+import pytest
+
+from lib.algorithms import export_key
+from lib.crypt import (
+    encrypt_data_with_aes,
+    get_key_fingerprint,
+    hash_string,
+    merge_cipher_data,
+)
+from lib.key_management import (
+    KDF_PBKDF2,
+    KDF_SCRYPT,
+    KEY_FILE_VERSION,
+    SALT_LENGTH,
+    KeyFileError,
+    KeyFileHeader,
+    TokenInventory,
+    WrongPinError,
+    clear_derived_key_cache,
+    derive_key,
+    encrypt_and_save_private_key,
+    find_key_device,
+    get_private_key_path,
+    migrate_private_key,
+    read_and_decrypt_private_key,
+    read_key_file_header,
+    read_key_token,
+)
+from lib.usb import USBDrive
+from tests.conftest import TEST_PIN
+
+
+@pytest.fixture
+def private_key(rsa_key) -> bytes:
+    """!
+    @return The RSA private key in PEM format.
+    """
+    return export_key(rsa_key)
+
+
+class FakeMountWatcher:
+    """!
+    A mount watcher with a fixed list of drives.
+    """
+
+    def __init__(self, drives: list):
+        self.drives = drives
+
+    def subscribe(self, callback: callable):
+        callback(self.drives)
+
+    def unsubscribe(self, callback: callable):
+        pass
+
+
+def write_key_file(device_path, data: bytes):
+    with open(get_private_key_path(device_path), "wb") as file:
+        file.write(data)
+
+
+@pytest.mark.parametrize("kdf", [KDF_SCRYPT, KDF_PBKDF2])
+def test_round_trip(tmp_path, private_key, kdf):
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, kdf)
+
+    assert read_key_file_header(str(tmp_path)).kdf == kdf
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+
+
+def test_version_2_header(tmp_path, private_key, rsa_key):
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+
+    header = read_key_file_header(str(tmp_path))
+    assert header.version == KEY_FILE_VERSION
+    assert header.key_type == "rsa-2048"
+    assert header.fingerprint == get_key_fingerprint(rsa_key.public_key())
+
+
+def test_wrong_pin(tmp_path, private_key):
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+
+    with pytest.raises(WrongPinError):
+        read_and_decrypt_private_key("0000", str(tmp_path))
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+
+
+@pytest.fixture
+def derivations(monkeypatch) -> list:
+    """!
+    @return The list of the salts of the keys derived with PBKDF2, starting with an empty derived key cache.
+    """
+    import lib.key_management
+
+    derive_key_with_pbkdf2 = lib.key_management.derive_key_with_pbkdf2
+    salts = []
+
+    def count_derivation(pin: str, salt: bytes, iterations: int) -> bytes:
+        salts.append(salt)
+        return derive_key_with_pbkdf2(pin, salt, iterations)
+
+    monkeypatch.setattr("lib.key_management.derive_key_with_pbkdf2", count_derivation)
+    clear_derived_key_cache()
+    yield salts
+    clear_derived_key_cache()
+
+
+def test_derived_key_is_kept_until_locked(tmp_path, private_key, derivations):
+    # The key derived when saving the file is kept too.
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+    assert len(derivations) == 1
+
+    clear_derived_key_cache()
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+    assert len(derivations) == 2
+
+
+def test_key_derived_from_wrong_pin_is_not_kept(tmp_path, private_key, derivations):
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+    derivations.clear()
+
+    for _ in range(2):
+        with pytest.raises(WrongPinError):
+            read_and_decrypt_private_key("0000", str(tmp_path))
+    assert len(derivations) == 2
+
+
+def test_corrupt_file(tmp_path, private_key):
+    path = encrypt_and_save_private_key(
+        TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2
+    )
+    with open(path, "r+b") as file:
+        file.seek(-1, os.SEEK_END)
+        last = file.read(1)
+        file.seek(-1, os.SEEK_END)
+        file.write(bytes([last[0] ^ 1]))
+
+    with pytest.raises(KeyFileError):
+        read_and_decrypt_private_key(TEST_PIN, str(tmp_path))
+
+
+def test_foreign_file(tmp_path):
+    write_key_file(str(tmp_path), b"PADESKEY\x07" + bytes(200))
+
+    with pytest.raises(KeyFileError):
+        read_and_decrypt_private_key(TEST_PIN, str(tmp_path))
+
+
+def test_migrate_version_1(tmp_path, private_key):
+    header = KeyFileHeader(KDF_PBKDF2, os.urandom(SALT_LENGTH), 1000, version=1)
+    aes_key = derive_key(TEST_PIN, header)
+    write_key_file(
+        str(tmp_path),
+        header.pack()
+        + merge_cipher_data(
+            *encrypt_data_with_aes(private_key, aes_key, header.authenticated_data())
+        ),
+    )
+    assert read_key_file_header(str(tmp_path)).version == 1
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+
+    assert migrate_private_key(TEST_PIN, str(tmp_path), KDF_PBKDF2)
+
+    assert read_key_file_header(str(tmp_path)).version == KEY_FILE_VERSION
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+
+
+def test_migrate_legacy_file(tmp_path, private_key):
+    write_key_file(
+        str(tmp_path),
+        merge_cipher_data(*encrypt_data_with_aes(private_key, hash_string(TEST_PIN))),
+    )
+    assert read_key_file_header(str(tmp_path)) is None
+    with pytest.raises(ValueError):
+        read_and_decrypt_private_key("0000", str(tmp_path))
+
+    assert migrate_private_key(TEST_PIN, str(tmp_path), KDF_PBKDF2)
+
+    assert read_key_file_header(str(tmp_path)).kdf == KDF_PBKDF2
+    assert read_and_decrypt_private_key(TEST_PIN, str(tmp_path)) == private_key
+    assert not migrate_private_key(TEST_PIN, str(tmp_path), KDF_PBKDF2)
+
+
+def test_find_key_device_without_public_key(tmp_path, private_key, monkeypatch):
+    device_path = tmp_path / "usb"
+    device_path.mkdir()
+    encrypt_and_save_private_key(TEST_PIN, str(device_path), private_key, KDF_PBKDF2)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(
+        "lib.key_management.get_usb_drives",
+        lambda: [USBDrive("/dev/sdx1", str(device_path))],
+    )
+
+    assert find_key_device() == str(device_path)
+
+
+def test_read_key_token(tmp_path, private_key, rsa_key):
+    drive = USBDrive("/dev/sdx1", str(tmp_path), 1)
+    assert read_key_token(drive) is None
+
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+    token = read_key_token(drive)
+    assert token.format == f"v{KEY_FILE_VERSION}"
+    assert token.key_type == "rsa-2048"
+    assert token.fingerprint == get_key_fingerprint(rsa_key.public_key())
+
+    write_key_file(str(tmp_path), b"PADESKEY\x07" + bytes(200))
+    assert read_key_token(drive).format == "invalid"
+
+
+def test_token_inventory_reads_a_drive_once_per_mount(tmp_path, private_key):
+    drive = USBDrive("/dev/sdx1", str(tmp_path), 1)
+    watcher = FakeMountWatcher([drive])
+    inventory = TokenInventory(watcher)
+    assert inventory.tokens == []
+
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+    assert inventory.tokens == []
+    inventory.invalidate(str(tmp_path))
+    assert [token.format for token in inventory.tokens] == [f"v{KEY_FILE_VERSION}"]
+
+    watcher.drives = [USBDrive("/dev/sdx1", str(tmp_path), 2)]
+    os.remove(get_private_key_path(str(tmp_path)))
+    assert inventory.tokens == []
+
+
+def test_token_inventory_subscribers(tmp_path, private_key):
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+    inventory = TokenInventory(
+        FakeMountWatcher([USBDrive("/dev/sdx1", str(tmp_path), 1)])
+    )
+    notifications = []
+
+    inventory.subscribe(notifications.append)
+    inventory.subscribe(notifications.append)
+
+    assert len(notifications) == 2
+    assert notifications[0] == notifications[1] == inventory.tokens
+
+
+def test_token_inventory_forgets_derived_keys_when_unmounted(
+    tmp_path, private_key, derivations
+):
+    encrypt_and_save_private_key(TEST_PIN, str(tmp_path), private_key, KDF_PBKDF2)
+    watcher = FakeMountWatcher([USBDrive("/dev/sdx1", str(tmp_path), 1)])
+    inventory = TokenInventory(watcher)
+    inventory.subscribe(lambda tokens: None)
+
+    for _ in range(2):
+        read_and_decrypt_private_key(TEST_PIN, str(tmp_path))
+    assert len(derivations) == 1
+    watcher.drives = []
+    inventory._drives_changed(watcher.drives)
+    read_and_decrypt_private_key(TEST_PIN, str(tmp_path))
+
+    assert len(derivations) == 2
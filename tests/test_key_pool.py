@@ -0,0 +1,23 @@
+## @file test_key_pool.py
+# Tests of the pool pre-generating key pairs.
+
+import pytest
+
+from lib.algorithms import get_key_type, import_key
+from lib.key_pool import KeyPairPool
+
+
+@pytest.mark.parametrize("key_type", ["ecdsa-p256", "ed25519"])
+def test_pool_generates_key_type(key_type):
+    pool = KeyPairPool(1, key_type, workers=1)
+    try:
+        private_key, public_key = pool.get()
+    finally:
+        pool.close()
+    assert get_key_type(import_key(private_key)) == key_type
+    assert get_key_type(import_key(public_key)) == key_type
+
+
+def test_unsupported_key_type():
+    with pytest.raises(ValueError):
+        KeyPairPool(1, "rsa-1024")
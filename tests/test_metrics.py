@@ -0,0 +1,61 @@
+## @file test_metrics.py
+# Tests of the tracing and metrics of the signing pipeline.
+
+import os
+
+import pytest
+
+from lib import metrics
+from lib.pdf_signing import sign_pdf
+
+
+@pytest.fixture
+def spans():
+    """!
+    Turn instrumentation on for the test.
+
+    @return The list the finished spans are collected in.
+    """
+    finished = []
+    metrics.reset_stats()
+    metrics.enable_metrics(finished.append)
+    yield finished
+    metrics.disable_metrics()
+    metrics.reset_stats()
+
+
+def test_signing_stages(spans, pdf_file, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+
+    stats = metrics.get_stats()
+    for stage in (metrics.STAGE_PARSE, metrics.STAGE_HASH, metrics.STAGE_SIGN):
+        assert stats[stage].calls >= 1
+        assert stats[stage].errors == 0
+    assert stats[metrics.STAGE_HASH].bytes >= os.path.getsize(pdf_file)
+    assert {measured.name for measured in spans} >= set(stats)
+
+
+def test_failed_stage(spans):
+    with pytest.raises(ValueError):
+        with metrics.span(metrics.STAGE_PARSE):
+            raise ValueError("malformed")
+
+    assert metrics.get_stats()[metrics.STAGE_PARSE].errors == 1
+
+
+def test_disabled(pdf_file, rsa_key):
+    metrics.reset_stats()
+
+    sign_pdf(pdf_file, rsa_key)
+
+    assert metrics.get_stats() == {}
+
+
+def test_write_prometheus(spans, tmp_path):
+    metrics.record(metrics.STAGE_WRITE, 0.5, 1000)
+    path = tmp_path / "pades.prom"
+
+    metrics.write_prometheus(str(path))
+
+    assert 'pades_stage_bytes_total{stage="write"} 1000' in path.read_text()
+    assert os.listdir(tmp_path) == ["pades.prom"]
@@ -0,0 +1,84 @@
+## @file test_pades_cli.py
+# Tests of the exit codes of the pades command-line interface.
+
+import json
+import sys
+
+import pytest
+
+import lib.pdf_signing
+import pades_cli
+from lib.algorithms import export_key
+from lib.pdf_signing import get_signed_file_path, sign_pdf
+
+
+def run(monkeypatch, *arguments) -> int:
+    """!
+    Run the command-line interface with the arguments.
+
+    @return The exit code.
+    """
+    monkeypatch.setattr(sys, "argv", ["pades", *arguments])
+    return pades_cli.main()
+
+
+@pytest.fixture
+def pdf_without_root(pdf_file) -> str:
+    """!
+    @return The path of a PDF file whose trailer has /Info in place of /Root.
+    """
+    with open(pdf_file, "r+b") as file:
+        data = file.read()
+        file.seek(data.rindex(b"/Root"))
+        file.write(b"/Info")
+    return pdf_file
+
+
+@pytest.fixture
+def public_key_path(tmp_path, rsa_key) -> str:
+    """!
+    @return The path of the RSA public key in PEM format.
+    """
+    path = tmp_path / "public_key.pub"
+    path.write_bytes(export_key(rsa_key.public_key()))
+    return str(path)
+
+
+def test_inspect(monkeypatch, capsys, pdf_file, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+
+    assert run(monkeypatch, "inspect", get_signed_file_path(pdf_file)) == (
+        pades_cli.EXIT_OK
+    )
+    assert json.loads(capsys.readouterr().out)["signatures"][0]["field"]
+
+
+def test_inspect_unsigned(monkeypatch, pdf_file):
+    assert run(monkeypatch, "inspect", pdf_file) == pades_cli.EXIT_INVALID
+
+
+def test_inspect_malformed_file(monkeypatch, capsys, pdf_without_root):
+    assert run(monkeypatch, "inspect", pdf_without_root) == pades_cli.EXIT_ERROR
+    assert "Document has no catalog" in capsys.readouterr().err
+
+
+def test_unexpected_error(monkeypatch, capsys, pdf_file):
+    def fail(file_path):
+        raise KeyError("Root")
+
+    monkeypatch.setattr(lib.pdf_signing, "inspect_pdf", fail)
+
+    assert run(monkeypatch, "inspect", pdf_file) == pades_cli.EXIT_ERROR
+    assert "KeyError" in capsys.readouterr().err
+
+
+def test_verify(monkeypatch, pdf_file, rsa_key, public_key_path):
+    sign_pdf(pdf_file, rsa_key)
+    signed_file_path = get_signed_file_path(pdf_file)
+
+    assert run(monkeypatch, "verify", signed_file_path, "-k", public_key_path) == (
+        pades_cli.EXIT_OK
+    )
+    assert run(monkeypatch, "verify", pdf_file, "-k", public_key_path) == (
+        pades_cli.EXIT_INVALID
+    )
@@ -0,0 +1,125 @@
+## @file test_parallel.py
+# Tests of the process pool engines.
+
+import pytest
+
+import lib.parallel
+from lib.algorithms import export_key
+from lib.parallel import (
+    _init_signing_worker,
+    _init_verify_worker,
+    _picklable_error,
+    _sign_in_worker,
+    _verify_in_worker,
+    sign_many_parallel,
+    verify_many_parallel,
+)
+from lib.pdf_signing import get_signed_file_path, sign_pdf, verify_pdf
+from tests.conftest import write_pdf
+
+
+class UnpicklableError(Exception):
+    """!
+    An error that cannot be rebuilt from its arguments.
+    """
+
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+
+
+def write_pdf_without_root(path) -> str:
+    """!
+    Write a PDF file whose trailer has /Info in place of /Root.
+    """
+    path = write_pdf(path)
+    with open(path, "r+b") as file:
+        data = file.read()
+        file.seek(data.rindex(b"/Root"))
+        file.write(b"/Info")
+    return path
+
+
+def test_sign_many_parallel(tmp_path, rsa_key):
+    file_paths = [write_pdf(tmp_path / f"document{index}.pdf") for index in range(3)]
+    file_paths.insert(1, write_pdf_without_root(tmp_path / "without_root.pdf"))
+
+    batch_result = sign_many_parallel(file_paths, rsa_key, workers=2)
+
+    results = {result.file_path: result for result in batch_result.results}
+    assert len(results) == 4
+    assert not results[file_paths[1]].ok
+    assert batch_result.signed == 3
+    for file_path in file_paths[:1] + file_paths[2:]:
+        assert verify_pdf(results[file_path].signed_file_path, rsa_key.public_key())
+
+
+@pytest.mark.parametrize(
+    "error", [KeyError("Root"), TypeError("unexpected"), UnpicklableError(1, "bad")]
+)
+def test_sign_in_worker_returns_any_error(pdf_file, rsa_key, monkeypatch, error):
+    def fail(*args, **kwargs):
+        raise error
+
+    _init_signing_worker(export_key(rsa_key))
+    monkeypatch.setattr(lib.parallel, "sign_pdf", fail)
+
+    result = _sign_in_worker(pdf_file, pdf_file + ".signed")
+
+    assert not result.ok
+    assert type(error).__name__ in repr(result.error)
+
+
+@pytest.fixture
+def public_key_path(tmp_path, rsa_key) -> str:
+    """!
+    @return The path of the RSA public key in PEM format.
+    """
+    path = tmp_path / "public_key.pub"
+    path.write_bytes(export_key(rsa_key.public_key()))
+    return str(path)
+
+
+def test_verify_many_parallel(tmp_path, rsa_key, public_key_path):
+    signed_file = write_pdf(tmp_path / "document.pdf")
+    sign_pdf(signed_file, rsa_key)
+    signed_file = get_signed_file_path(signed_file)
+    without_root = write_pdf_without_root(tmp_path / "without_root.pdf")
+    missing = str(tmp_path / "missing.pdf")
+    pairs = [(path, public_key_path) for path in (without_root, missing, signed_file)]
+
+    results = {
+        result.file_path: result for result in verify_many_parallel(pairs, workers=2)
+    }
+
+    assert not results[without_root].valid
+    assert results[without_root].signatures[0].error
+    assert isinstance(results[missing].error, OSError)
+    assert results[signed_file].valid and results[signed_file].error is None
+
+
+@pytest.mark.parametrize(
+    "error", [KeyError("Root"), AttributeError("get"), UnpicklableError(1, "bad")]
+)
+def test_verify_in_worker_returns_any_error(
+    pdf_file, public_key_path, monkeypatch, error
+):
+    def fail(*args, **kwargs):
+        raise error
+
+    _init_verify_worker(None)
+    monkeypatch.setattr(lib.parallel, "verify_pdf", fail)
+
+    result = _verify_in_worker(pdf_file, public_key_path)
+
+    assert not result.valid
+    assert type(error).__name__ in repr(result.error)
+
+
+def test_picklable_error():
+    error = KeyError("Root")
+    assert _picklable_error(error) is error
+
+    error = _picklable_error(UnpicklableError(1, "bad"))
+    assert isinstance(error, RuntimeError)
+    assert str(error) == "UnpicklableError: bad"
@@ -0,0 +1,142 @@
+## @file test_pdf.py
+# Tests of the PDF reader and the incremental updates.
+
+import asyncio
+import re
+
+import pytest
+
+from lib.pdf import IncrementalUpdate, PdfError, PdfReader
+from lib.pdf_signing import inspect_pdf, sign_pdf, verify_pdf, verify_pdf_async
+
+
+def write_xref_stream_pdf(path, xref_dictionary: bytes, rows: bytes = b"") -> str:
+    """!
+    Write a PDF file whose only cross-reference section is an uncompressed cross-reference stream.
+
+    @param path: The path of the file.
+    @param xref_dictionary: The entries of the stream dictionary besides /Type and /Length.
+    @param rows: The data of the stream.
+
+    @return The path of the file as a string.
+    """
+    data = b"%PDF-1.7\n1 0 obj\n<</Type /Catalog>>\nendobj\n"
+    xref_offset = len(data)
+    data += (
+        b"2 0 obj\n<</Type /XRef %s /Length %d>>\nstream\n%s\nendstream\nendobj\n"
+        % (
+            xref_dictionary,
+            len(rows),
+            rows,
+        )
+    )
+    data += b"startxref\n%d\n%%%%EOF\n" % xref_offset
+    with open(path, "wb") as file:
+        file.write(data)
+    return str(path)
+
+
+@pytest.fixture
+def pdf_without_root(pdf_file) -> str:
+    """!
+    @return The path of a PDF file whose trailer has /Info in place of /Root.
+    """
+    with open(pdf_file, "r+b") as file:
+        data = file.read()
+        file.seek(data.rindex(b"/Root"))
+        file.write(b"/Info")
+    return pdf_file
+
+
+def test_xref_stream_offsets_beyond_4_gib(pdf_file):
+    with open(pdf_file, "rb") as file:
+        reader = PdfReader(file)
+        # Pretend the document uses a cross-reference stream and is larger than 4 GiB.
+        reader.xref_stream = True
+        reader.size += 5 * 2**30
+        update = IncrementalUpdate(reader)
+        reference = update.add({"Test": 1})
+        data, offsets = update.build()
+
+    widths = [
+        int(width) for width in re.search(rb"/W ?\[(\d+) (\d+) (\d+)\]", data).groups()
+    ]
+    assert widths == [1, 5, 2]
+    rows = data[data.index(b"stream\n") + len(b"stream\n") :]
+    assert int.from_bytes(rows[1:6], "big") == offsets[reference]
+
+
+def test_missing_root(pdf_without_root, rsa_key):
+    with open(pdf_without_root, "rb") as file:
+        with pytest.raises(PdfError):
+            PdfReader(file).root
+
+    report = verify_pdf(pdf_without_root, rsa_key.public_key())
+    assert not report.valid
+    assert "Document has no catalog" in report.signatures[0].error
+    report = asyncio.run(verify_pdf_async(pdf_without_root, rsa_key.public_key()))
+    assert "Document has no catalog" in report.signatures[0].error
+    with pytest.raises(PdfError):
+        inspect_pdf(pdf_without_root)
+    with pytest.raises(PdfError):
+        sign_pdf(pdf_without_root, rsa_key)
+
+
+def test_root_not_a_dictionary(pdf_file):
+    with open(pdf_file, "r+b") as file:
+        data = file.read()
+        file.seek(data.rindex(b"/Root 1 0 R"))
+        file.write(b"/Root [1]  ")
+
+    with open(pdf_file, "rb") as file:
+        with pytest.raises(PdfError):
+            PdfReader(file).root
+
+
+def test_xref_stream(tmp_path):
+    path = write_xref_stream_pdf(
+        tmp_path / "document.pdf",
+        b"/Size 2 /W [1 1 1] /Root 1 0 R",
+        b"\x00\x00\x00\x01\x09\x00",
+    )
+
+    with open(path, "rb") as file:
+        reader = PdfReader(file)
+
+        assert reader.xref_stream
+        assert reader.root == {"Type": "Catalog"}
+
+
+@pytest.mark.parametrize(
+    "xref_dictionary",
+    [
+        b"/Size 2",
+        b"/Size 2 /W [1 1]",
+        b"/Size 2 /W [1 1 /One]",
+        b"/Size 2 /W 3",
+        b"/W [1 1 1]",
+        b"/Size /Two /W [1 1 1]",
+        b"/Size 2 /W [1 1 1] /Index [0]",
+        b"/Size 2 /W [1 1 1] /Index [0 /Two]",
+        b"/Size 2 /W [1 1 1] /Index [0 1000000000000]",
+    ],
+)
+def test_malformed_xref_stream(tmp_path, xref_dictionary):
+    path = write_xref_stream_pdf(
+        tmp_path / "document.pdf", xref_dictionary + b" /Root 1 0 R", b"\x00" * 6
+    )
+
+    with open(path, "rb") as file:
+        with pytest.raises(PdfError):
+            PdfReader(file)
+
+
+def test_malformed_trailer(tmp_path, pdf_file):
+    with open(pdf_file, "r+b") as file:
+        data = file.read()
+        file.seek(data.rindex(b"trailer") + len(b"trailer\n"))
+        file.write(b"[1 2 3]")
+
+    with open(pdf_file, "rb") as file:
+        with pytest.raises(PdfError):
+            PdfReader(file)
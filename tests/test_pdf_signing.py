@@ -0,0 +1,269 @@
+## @file test_pdf_signing.py
+# Tests of signing PDF files and verifying their signatures.
+
+import io
+import os
+
+import Crypto.Hash.SHA256 as SHA256
+import pytest
+
+import lib.pdf_signing
+from lib.algorithms import DIGEST_ALGORITHMS
+from lib.pdf import PdfError
+from lib.pdf_signing import (
+    OperationCancelled,
+    get_signed_file_path,
+    inspect_pdf,
+    sign_pdf,
+    sign_pdf_in_place,
+    sign_many,
+    sign_pdf_to_stream,
+    verify_pdf,
+)
+from tests.conftest import TEST_KEY_TYPES, write_pdf
+
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """!
+    Hash and copy the files in chunks of 1000 bytes through the reused buffer, so even small files span many chunks.
+    """
+    monkeypatch.setattr(lib.pdf_signing, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(lib.pdf_signing, "MMAP_THRESHOLD", float("inf"))
+
+
+@pytest.fixture
+def mapped_chunks(monkeypatch):
+    """!
+    Memory-map every file and hash it in chunks of 1000 bytes, so the zero-copy path handles small files too.
+    """
+    monkeypatch.setattr(lib.pdf_signing, "CHUNK_SIZE", 1000)
+    monkeypatch.setattr(lib.pdf_signing, "MMAP_THRESHOLD", 1)
+
+
+def test_sign_and_verify(pdf_file, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+
+    report = verify_pdf(get_signed_file_path(pdf_file), rsa_key.public_key())
+
+    assert report.valid
+    [signature] = report.signatures
+    assert signature.intact and signature.covers_whole_file
+    assert signature.field_name == "Signature1"
+
+
+@pytest.mark.parametrize("padding", [100, 12_345, 50_000])
+def test_sign_and_verify_in_chunks(small_chunks, tmp_path, rsa_key, padding):
+    pdf_file = write_pdf(tmp_path / "document.pdf", padding)
+    sign_pdf(pdf_file, rsa_key)
+
+    assert verify_pdf(get_signed_file_path(pdf_file), rsa_key.public_key()).valid
+
+
+@pytest.mark.parametrize("padding", [100, 12_345])
+def test_sign_and_verify_mapped(mapped_chunks, tmp_path, rsa_key, padding):
+    pdf_file = write_pdf(tmp_path / "document.pdf", padding)
+    sign_pdf(pdf_file, rsa_key)
+    signed_file_path = get_signed_file_path(pdf_file)
+    with open(signed_file_path, "rb") as file:
+        mapping = lib.pdf_signing._map_file(file)
+    assert mapping is not None
+    mapping[0].close()
+
+    assert verify_pdf(signed_file_path, rsa_key.public_key()).valid
+
+
+@pytest.mark.parametrize("key_type", TEST_KEY_TYPES)
+def test_sign_and_verify_key_type(pdf_file, key_pairs, key_type):
+    key = key_pairs[key_type]
+    sign_pdf(pdf_file, key)
+
+    report = verify_pdf(get_signed_file_path(pdf_file), key.public_key())
+
+    assert report.valid
+    assert report.signatures[0].key_id
+
+
+@pytest.mark.parametrize("digest_algorithm", sorted(DIGEST_ALGORITHMS))
+def test_sign_with_digest_algorithm(pdf_file, key_pairs, digest_algorithm):
+    key = key_pairs["ecdsa-p256"]
+    sign_pdf(pdf_file, key, digest_algorithm=digest_algorithm)
+
+    report = verify_pdf(get_signed_file_path(pdf_file), key.public_key())
+
+    assert report.valid
+    assert report.signatures[0].digest_algorithm == digest_algorithm
+
+
+def test_verify_with_other_key(pdf_file, key_pairs, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+
+    report = verify_pdf(
+        get_signed_file_path(pdf_file), key_pairs["ecdsa-p256"].public_key()
+    )
+
+    assert not report.valid
+    assert report.signatures[0].intact
+
+
+def test_unsigned_file(pdf_file, rsa_key):
+    assert not verify_pdf(pdf_file, rsa_key.public_key()).valid
+
+
+def test_multiple_revisions(pdf_file, key_pairs, rsa_key, tmp_path):
+    first = str(tmp_path / "first.pdf")
+    second = str(tmp_path / "second.pdf")
+    sign_pdf(pdf_file, rsa_key, first)
+    sign_pdf(first, key_pairs["ed25519"], second)
+
+    report = verify_pdf(
+        second, [rsa_key.public_key(), key_pairs["ed25519"].public_key()]
+    )
+
+    assert report.valid
+    assert [signature.field_name for signature in report.signatures] == [
+        "Signature1",
+        "Signature2",
+    ]
+    assert report.signatures[0].revision_end == os.path.getsize(first)
+    assert not report.signatures[0].covers_whole_file
+    assert report.signatures[1].covers_whole_file
+
+
+def test_tampered_file(pdf_file, rsa_key):
+    signed_file_path = get_signed_file_path(pdf_file)
+    sign_pdf(pdf_file, rsa_key)
+    with open(signed_file_path, "r+b") as file:
+        data = file.read()
+        file.seek(data.index(b"0000000000"))
+        file.write(b"1")
+
+    report = verify_pdf(signed_file_path, rsa_key.public_key())
+
+    assert not report.valid
+    assert not report.signatures[0].intact
+
+
+def test_data_appended_after_signing(pdf_file, rsa_key):
+    signed_file_path = get_signed_file_path(pdf_file)
+    sign_pdf(pdf_file, rsa_key)
+    with open(signed_file_path, "ab") as file:
+        file.write(b"% appended\n")
+
+    report = verify_pdf(signed_file_path, rsa_key.public_key())
+
+    assert not report.valid
+    assert report.signatures[0].intact and report.signatures[0].valid
+    assert not report.signatures[0].covers_whole_file
+
+
+def test_content_hash(pdf_file, rsa_key):
+    signed_file_path = get_signed_file_path(pdf_file)
+    sign_pdf(pdf_file, rsa_key)
+    with open(signed_file_path, "ab") as file:
+        file.write(b"% appended\n")
+    content_hash = SHA256.new()
+
+    verify_pdf(signed_file_path, rsa_key.public_key(), content_hash=content_hash)
+
+    with open(signed_file_path, "rb") as file:
+        assert content_hash.digest() == SHA256.new(file.read()).digest()
+
+
+def test_inspect_does_not_verify(pdf_file, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+
+    report = inspect_pdf(get_signed_file_path(pdf_file))
+
+    [signature] = report.signatures
+    assert signature.field_name == "Signature1"
+    assert signature.signature_algorithm == "rsa-pss"
+    assert not signature.valid
+
+
+def test_cancelled_signing_leaves_no_file(pdf_file, rsa_key, tmp_path):
+    def cancel(size):
+        raise OperationCancelled()
+
+    with pytest.raises(OperationCancelled):
+        sign_pdf(pdf_file, rsa_key, str(tmp_path / "signed.pdf"), cancel)
+
+    assert sorted(os.listdir(tmp_path)) == ["document.pdf"]
+
+
+def test_sign_in_place(pdf_file, rsa_key):
+    size = os.path.getsize(pdf_file)
+    sign_pdf_in_place(pdf_file, rsa_key)
+
+    report = verify_pdf(pdf_file, rsa_key.public_key())
+
+    assert report.valid
+    assert report.signatures[0].revision_end > size
+
+
+def test_sign_to_stream(pdf_file, rsa_key, tmp_path):
+    stream = io.BytesIO()
+    sign_pdf_to_stream(pdf_file, rsa_key, stream)
+    signed_file_path = tmp_path / "streamed.pdf"
+    signed_file_path.write_bytes(stream.getvalue())
+
+    assert verify_pdf(str(signed_file_path), rsa_key.public_key()).valid
+    assert sorted(os.listdir(tmp_path)) == ["document.pdf", "streamed.pdf"]
+
+
+def test_sign_to_same_output_twice(pdf_file, key_pairs, rsa_key, tmp_path):
+    signed_file_path = str(tmp_path / "signed.pdf")
+    sign_pdf(pdf_file, key_pairs["ed25519"], signed_file_path)
+    sign_pdf(pdf_file, rsa_key, signed_file_path)
+
+    assert verify_pdf(signed_file_path, rsa_key.public_key()).valid
+    assert sorted(os.listdir(tmp_path)) == ["document.pdf", "signed.pdf"]
+
+
+def test_sign_many_continues_after_a_failure(tmp_path, rsa_key):
+    without_root = write_pdf(tmp_path / "without_root.pdf")
+    with open(without_root, "r+b") as file:
+        data = file.read()
+        file.seek(data.rindex(b"/Root"))
+        file.write(b"/Info")
+    not_a_pdf = tmp_path / "not_a_pdf.pdf"
+    not_a_pdf.write_bytes(b"%PDF-1.7\nstartxref\n5\n%%EOF\n")
+    good = write_pdf(tmp_path / "good.pdf")
+    missing = str(tmp_path / "missing.pdf")
+    output_directory = tmp_path / "signed"
+    output_directory.mkdir()
+
+    batch_result = sign_many(
+        [without_root, str(not_a_pdf), missing, good], rsa_key, str(output_directory)
+    )
+
+    assert [result.ok for result in batch_result.results] == [
+        False,
+        False,
+        False,
+        True,
+    ]
+    assert isinstance(batch_result.results[0].error, PdfError)
+    assert isinstance(batch_result.results[2].error, OSError)
+    assert verify_pdf(
+        batch_result.results[3].signed_file_path, rsa_key.public_key()
+    ).valid
+    assert os.listdir(output_directory) == ["good_signed.pdf"]
+
+
+@pytest.mark.parametrize("error", [KeyError, TypeError, AttributeError])
+def test_sign_many_records_any_error(tmp_path, rsa_key, monkeypatch, error):
+    first = write_pdf(tmp_path / "first.pdf")
+    second = write_pdf(tmp_path / "second.pdf")
+
+    def sign_pdf_failing_first(file_path, *args, **kwargs):
+        if file_path == first:
+            raise error("unexpected")
+        return sign_pdf(file_path, *args, **kwargs)
+
+    monkeypatch.setattr(lib.pdf_signing, "sign_pdf", sign_pdf_failing_first)
+    batch_result = sign_many([first, second], rsa_key)
+
+    assert isinstance(batch_result.results[0].error, error)
+    assert batch_result.results[1].ok
+    assert batch_result.signed == 1
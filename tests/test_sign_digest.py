@@ -0,0 +1,46 @@
+## @file test_sign_digest.py
+# Tests of signing precomputed digests.
+
+import Crypto.Hash.SHA256 as SHA256
+import pytest
+
+from lib.algorithms import DIGEST_ALGORITHMS, SIGNATURE_ALGORITHMS
+from lib.pdf_signing import sign_digest, sign_digests, verify_digest
+
+
+def test_sign_digest(rsa_key):
+    digest = SHA256.new(b"document").digest()
+
+    signature = sign_digest(digest, rsa_key)
+
+    assert verify_digest(digest, signature, rsa_key.public_key())
+    assert not verify_digest(
+        SHA256.new(b"other").digest(), signature, rsa_key.public_key()
+    )
+
+
+def test_sign_digests(rsa_key):
+    digests = [SHA256.new(bytes([index])).digest() for index in range(3)]
+
+    signatures = sign_digests(digests, rsa_key)
+
+    assert all(
+        verify_digest(digest, signature, rsa_key.public_key())
+        for digest, signature in zip(digests, signatures)
+    )
+
+
+def test_sign_digest_needs_rsa(key_pairs):
+    with pytest.raises(ValueError):
+        sign_digest(SHA256.new(b"document").digest(), key_pairs["ecdsa-p256"])
+
+
+@pytest.mark.parametrize("name", ["rsa-pss", "ecdsa"])
+def test_digest_signature_matches_data_signature(key_pairs, name):
+    algorithm = SIGNATURE_ALGORITHMS[name]
+    key = key_pairs["rsa-2048" if name.startswith("rsa") else "ecdsa-p256"]
+    sha256 = DIGEST_ALGORITHMS["sha256"]
+
+    signature = algorithm.sign_digest(key, SHA256.new(b"data").digest(), sha256)
+
+    assert algorithm.verify(key.public_key(), b"data", signature, sha256)
@@ -0,0 +1,77 @@
+## @file test_signing_service.py
+# Tests of the background signing service.
+
+import asyncio
+import os
+
+import pytest
+
+from lib.signing_service import SigningService, check_socket_directory
+
+
+def handle(request) -> dict:
+    """!
+    @return The response of a locked service to the request.
+    """
+    return asyncio.run(SigningService().handle_request(request))
+
+
+@pytest.mark.parametrize(
+    "request_object",
+    [
+        {"command": "unlock", "pin": 1234, "device": 5},
+        {"command": "verify", "path": ["file.pdf"]},
+        {"command": "unlock"},
+        {"command": ["unlock"]},
+        ["unlock"],
+        "unlock",
+    ],
+)
+def test_invalid_request_returns_error(request_object):
+    response = handle(request_object)
+    assert response["ok"] is False
+    assert response["error"]
+
+
+def test_invalid_argument_of_unlocked_service_returns_error():
+    service = SigningService()
+    service._private_key = object()
+
+    async def sign_digest():
+        try:
+            return await service.handle_request({"command": "sign_digest", "digest": 5})
+        finally:
+            service.lock()
+
+    response = asyncio.run(sign_digest())
+    assert response == {"ok": False, "error": response["error"]}
+    assert response["error"].startswith("TypeError")
+
+
+def test_socket_directory_is_created_private(tmp_path):
+    socket_path = str(tmp_path / "service" / "pades.sock")
+    check_socket_directory(socket_path, create=True)
+    assert os.stat(tmp_path / "service").st_mode & 0o777 == 0o700
+    check_socket_directory(socket_path)
+
+
+@pytest.mark.parametrize("mode", [0o777, 0o770, 0o1777])
+def test_writable_socket_directory_is_rejected(tmp_path, mode):
+    directory = tmp_path / "service"
+    directory.mkdir()
+    directory.chmod(mode)
+    with pytest.raises(PermissionError):
+        check_socket_directory(str(directory / "pades.sock"), create=True)
+
+
+def test_symlinked_socket_directory_is_rejected(tmp_path):
+    (tmp_path / "target").mkdir(mode=0o700)
+    (tmp_path / "service").symlink_to(tmp_path / "target")
+    with pytest.raises(PermissionError):
+        check_socket_directory(str(tmp_path / "service" / "pades.sock"))
+
+
+def test_missing_socket_directory_is_not_created_by_client(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        check_socket_directory(str(tmp_path / "service" / "pades.sock"))
+    assert not (tmp_path / "service").exists()
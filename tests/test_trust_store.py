@@ -0,0 +1,82 @@
+## @file test_trust_store.py
+# Tests of the store of trusted public keys.
+
+import os
+
+import pytest
+
+from lib.algorithms import export_key
+from lib.crypt import get_key_fingerprint
+from lib.pdf_signing import get_signed_file_path, sign_pdf, verify_pdf
+from lib.trust_store import INDEX_PATH, TrustStore
+
+
+@pytest.fixture
+def store(tmp_path) -> TrustStore:
+    """!
+    @return A TrustStore in a new directory.
+    """
+    return TrustStore(str(tmp_path / "trusted"))
+
+
+def test_add_get_remove(store, rsa_key):
+    fingerprint = store.add(rsa_key)
+
+    assert fingerprint == get_key_fingerprint(rsa_key.public_key())
+    assert len(store) == 1
+    assert fingerprint in store
+    assert not store.get_key(fingerprint).has_private()
+    assert store.entries[0].key_type == "rsa-2048"
+
+    assert store.remove(fingerprint)
+    assert fingerprint not in store
+    assert not store.remove(fingerprint)
+    assert os.listdir(store.directory) == [os.path.dirname(INDEX_PATH)]
+
+
+def test_digest_follows_the_keys(store, key_pairs):
+    empty = store.digest
+    fingerprint = store.add(key_pairs["ed25519"])
+    assert store.digest != empty
+
+    store.remove(fingerprint)
+    assert store.digest == empty
+
+
+def test_file_added_by_hand(store, key_pairs):
+    key = key_pairs["ecdsa-p256"].public_key()
+    with open(os.path.join(store.directory, "colleague.pub"), "wb") as file:
+        file.write(export_key(key))
+
+    # A missing fingerprint triggers a scan of the changed directory.
+    assert store.get_key(get_key_fingerprint(key)) is not None
+    assert len(store) == 1
+
+
+def test_reopen_uses_the_index(store, key_pairs):
+    for key_type in ("rsa-2048", "ed25519"):
+        store.add(key_pairs[key_type])
+
+    reopened = TrustStore(store.directory)
+
+    # The index is written through a temporary file that does not stay behind.
+    assert os.listdir(os.path.join(store.directory, os.path.dirname(INDEX_PATH))) == [
+        os.path.basename(INDEX_PATH)
+    ]
+    assert [entry.fingerprint for entry in reopened.entries] == [
+        entry.fingerprint for entry in store.entries
+    ]
+    assert reopened.digest == store.digest
+
+
+def test_verify_with_store(store, pdf_file, key_pairs, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+    signed_file = get_signed_file_path(pdf_file)
+    store.add(key_pairs["ed25519"])
+
+    report = verify_pdf(signed_file, store)
+    assert not report.valid
+    assert report.signatures[0].error == "The signer key is not in the trust store"
+
+    store.add(rsa_key)
+    assert verify_pdf(signed_file, store).valid
@@ -0,0 +1,123 @@
+## @file test_verification_cache.py
+# Tests of the cache of verification results.
+
+import os
+import shutil
+
+import pytest
+
+from lib.pdf_signing import get_signed_file_path, sign_pdf
+from lib.verification_cache import VerificationCache
+from tests.conftest import age_file, write_pdf
+
+
+@pytest.fixture
+def cache(tmp_path):
+    """!
+    @return A VerificationCache in a new database.
+    """
+    with VerificationCache(str(tmp_path / "cache.sqlite")) as cache:
+        yield cache
+
+
+@pytest.fixture
+def signed_file(pdf_file, rsa_key) -> str:
+    """!
+    @return The path of a PDF file signed with the RSA key, old enough to be cached.
+    """
+    sign_pdf(pdf_file, rsa_key)
+    path = get_signed_file_path(pdf_file)
+    age_file(path)
+    return path
+
+
+def test_miss_then_hit(cache, signed_file, rsa_key):
+    assert cache.verify_pdf(signed_file, rsa_key.public_key()).valid
+    assert cache.stats.misses == 1
+    assert len(cache) == 1
+
+    report = cache.verify_pdf(signed_file, rsa_key.public_key())
+
+    assert report.valid
+    assert report.file_path == os.path.abspath(signed_file)
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_other_key_is_a_miss(cache, signed_file, key_pairs, rsa_key):
+    cache.verify_pdf(signed_file, rsa_key.public_key())
+
+    report = cache.verify_pdf(signed_file, key_pairs["ed25519"].public_key())
+
+    assert not report.valid
+    assert cache.stats.misses == 2
+
+
+def test_copy_is_a_content_hit(cache, signed_file, rsa_key, tmp_path):
+    cache.verify_pdf(signed_file, rsa_key.public_key())
+    copy = str(tmp_path / "copy.pdf")
+    shutil.copyfile(signed_file, copy)
+    age_file(copy, 20.0)
+
+    assert cache.verify_pdf(copy, rsa_key.public_key()).valid
+    assert cache.stats.content_hits == 1
+    assert cache.stats.misses == 1
+
+
+def test_modified_file_is_a_miss(cache, signed_file, rsa_key):
+    cache.verify_pdf(signed_file, rsa_key.public_key())
+    with open(signed_file, "r+b") as file:
+        file.seek(100)
+        file.write(b"X")
+    age_file(signed_file, 20.0)
+
+    assert not cache.verify_pdf(signed_file, rsa_key.public_key()).valid
+    assert cache.stats.misses == 2
+    assert len(cache) == 1
+
+
+def test_recently_modified_file_is_not_stored(cache, pdf_file, rsa_key):
+    sign_pdf(pdf_file, rsa_key)
+
+    cache.verify_pdf(get_signed_file_path(pdf_file), rsa_key.public_key())
+
+    assert len(cache) == 0
+
+
+def test_invalidate(cache, signed_file, rsa_key):
+    cache.verify_pdf(signed_file, rsa_key.public_key())
+
+    cache.invalidate(signed_file)
+
+    assert len(cache) == 0
+    cache.verify_pdf(signed_file, rsa_key.public_key())
+    assert cache.stats.hits == 0
+    assert cache.stats.misses == 2
+
+
+def test_eviction(tmp_path, rsa_key):
+    paths = []
+    for index in range(4):
+        path = write_pdf(tmp_path / f"document{index}.pdf", padding=1000 + index)
+        sign_pdf(path, rsa_key)
+        paths.append(get_signed_file_path(path))
+        age_file(paths[-1])
+
+    with VerificationCache(str(tmp_path / "cache.sqlite"), max_entries=2) as cache:
+        for path in paths:
+            cache.verify_pdf(path, rsa_key.public_key())
+
+        assert len(cache) == 2
+        assert cache.stats.evictions == 2
+        cache.verify_pdf(paths[-1], rsa_key.public_key())
+        assert cache.stats.hits == 1
+
+
+def test_results_persist(tmp_path, signed_file, rsa_key):
+    path = str(tmp_path / "cache.sqlite")
+    with VerificationCache(path) as cache:
+        cache.verify_pdf(signed_file, rsa_key.public_key())
+
+    with VerificationCache(path) as cache:
+        assert cache.verify_pdf(signed_file, rsa_key.public_key()).valid
+        assert cache.stats.hits == 1
@@ -0,0 +1,120 @@
+## @file verify_pdfs.py
+# This module represents the headless application to verify many signed PDF files from a manifest.
+
+import argparse
+import json
+import sys
+from typing import Iterator
+
+from lib.metrics import enable_metrics, enable_trace_logging, write_prometheus
+from lib.parallel import verify_many_parallel
+from lib.pdf_signing import VerifyResult
+
+
+def read_manifest(file) -> Iterator[tuple[str, str]]:
+    """!
+    Read the manifest with the files to verify.
+
+    Each non-empty line of the manifest contains the path to the signed PDF file
+    and the path to the public key, separated by a tab. The public key can be left out
+    when the keys of the signers are looked up in a trust store.
+
+    @param file: The manifest file object.
+
+    @return The iterator over (PDF file path, public key path) pairs.
+    """
+    for line in file:
+        line = line.rstrip("\n")
+        if not line:
+            continue
+        file_path, _, public_key_path = line.partition("\t")
+        yield file_path, public_key_path
+
+
+def result_to_json(result: VerifyResult) -> str:
+    """!
+    Convert the result of verifying a file to a JSON line.
+
+    @return The JSON representation of the result.
+    """
+    return json.dumps(
+        {
+            "pdf": result.file_path,
+            "key": result.public_key_path,
+            "valid": result.valid,
+            "error": str(result.error) if result.error else None,
+            "signatures": [signature.to_dict() for signature in result.signatures],
+            "cached": result.cached,
+        }
+    )
+
+
+def main() -> int:
+    """!
+    Entrypoint of the application.
+
+    @return The exit code: 0 when all signatures are valid, 1 otherwise.
+    """
+    parser = argparse.ArgumentParser(
+        description="Verify many signed PDF files and print the results as JSON lines."
+    )
+    parser.add_argument(
+        "manifest",
+        type=argparse.FileType("r"),
+        help="file with tab separated PDF and public key paths, one pair per line ('-' for stdin), the key is optional with --trust-store",
+    )
+    parser.add_argument(
+        "-j",
+        "--workers",
+        type=int,
+        default=0,
+        help="number of worker processes (default: all CPU cores)",
+    )
+    parser.add_argument(
+        "-c",
+        "--cache",
+        help="path to the verification cache database, so files that did not change are not verified again",
+    )
+    parser.add_argument(
+        "-t",
+        "--trust-store",
+        help="directory of trusted public keys, used for the files listed without a public key",
+    )
+    parser.add_argument(
+        "--trace",
+        action="store_true",
+        help="log the duration and size of every stage of the pipeline to stderr",
+    )
+    parser.add_argument(
+        "--metrics",
+        metavar="FILE",
+        help="write the statistics of the pipeline stages to the file in the Prometheus text format",
+    )
+    args = parser.parse_args()
+    if args.trace:
+        enable_trace_logging()
+    elif args.metrics:
+        enable_metrics()
+
+    all_valid = True
+    cached = verified = 0
+    with args.manifest:
+        for result in verify_many_parallel(
+            read_manifest(args.manifest),
+            args.workers or None,
+            args.cache,
+            args.trust_store,
+        ):
+            all_valid &= result.valid
+            cached += result.cached
+            verified += not result.cached
+            print(result_to_json(result), flush=True)
+    if args.cache:
+        print(f"Cache: {cached} hits, {verified} misses", file=sys.stderr)
+    if args.metrics:
+        write_prometheus(args.metrics)
+    return 0 if all_valid else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
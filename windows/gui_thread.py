@@ -0,0 +1,30 @@
+## @file gui_thread.py
+# This module contains the functions to run calls from the background threads in the GUI thread.
+import queue
+
+## @var _calls
+# The calls waiting to run in the GUI thread, with their arguments.
+_calls = queue.SimpleQueue()
+
+
+def call_in_gui_thread(function: callable, *args):
+    """!
+    Run the function in the GUI thread before the next frame is rendered.
+    The windows are created and changed only in the GUI thread, such as when a background job changes.
+
+    @param function: The function to call.
+    @param args: The arguments of the function.
+    """
+    _calls.put((function, args))
+
+
+def run_gui_calls():
+    """!
+    Run the calls queued by @ref call_in_gui_thread. Called by the render loop in the GUI thread.
+    """
+    while True:
+        try:
+            function, args = _calls.get_nowait()
+        except queue.Empty:
+            return
+        function(*args)
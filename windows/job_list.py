@@ -0,0 +1,71 @@
+## @file job_list.py
+# This module contains the functions to show the background jobs with their progress in a window.
+import os
+
+import dearpygui.dearpygui as dpg
+
+from lib.jobs import JOB_FAILED, JOB_QUEUED, Job
+
+
+def add_job_list(tag: str, width: int = 380, height: int = 150) -> str:
+    """!
+    Add an empty list of jobs to the current container.
+
+    @param tag: The tag of the list.
+    @param width: The width of the list.
+    @param height: The height of the list.
+
+    @return The tag of the list.
+    """
+    with dpg.child_window(tag=tag, width=width, height=height):
+        dpg.add_text("No jobs yet", tag=f"{tag}_empty")
+    return tag
+
+
+def add_job_row(job_list_tag: str, job: Job):
+    """!
+    Add a row with the name of the file, the progress bar and the cancel button of the job to the list.
+
+    @param job_list_tag: The tag of the list created by @ref add_job_list.
+    @param job: The job to show.
+    """
+    if dpg.does_item_exist(f"{job_list_tag}_empty"):
+        dpg.delete_item(f"{job_list_tag}_empty")
+    with dpg.group(parent=job_list_tag, tag=f"job_{job.id}"):
+        dpg.add_text(f"{job.description}: {os.path.basename(job.file_path)}")
+        with dpg.group(horizontal=True):
+            dpg.add_progress_bar(
+                tag=f"job_{job.id}_progress", width=280, overlay=JOB_QUEUED
+            )
+            dpg.add_button(
+                tag=f"job_{job.id}_cancel",
+                label="Cancel",
+                width=70,
+                callback=lambda: job.cancel(),
+            )
+
+
+def update_job_row(job: Job, status: str = None):
+    """!
+    Update the progress bar of the job and hide the cancel button once it has finished.
+
+    @param job: The job shown by @ref add_job_row.
+    @param status: The text shown in the progress bar of a finished job. If None, the state of the job is shown.
+    """
+    if not dpg.does_item_exist(f"job_{job.id}_progress"):
+        return
+    if job.finished:
+        if status is None:
+            status = job.state
+            if job.state == JOB_FAILED:
+                status = f"failed: {job.error}"
+        dpg.configure_item(
+            f"job_{job.id}_progress", default_value=job.progress, overlay=status
+        )
+        dpg.hide_item(f"job_{job.id}_cancel")
+    else:
+        dpg.configure_item(
+            f"job_{job.id}_progress",
+            default_value=job.progress,
+            overlay=f"{job.state} {job.progress:.0%}",
+        )
@@ -1,28 +1,40 @@
 ## @file sign_pdf_window.py
-# This module contains the function to create a window to sign a PDF file.
-import dearpygui.dearpygui as dpg
+# This module contains the function to create a window to sign PDF files.
+import glob
+import os
 import threading
 import time
 
+import dearpygui.dearpygui as dpg
+
 from lib.key_management import (
-    check_if_directory_contains_keys,
+    KeyFileError,
+    KeyToken,
+    WrongPinError,
+    clear_derived_key_cache,
+    get_token_inventory,
     read_and_decrypt_private_key,
 )
-from lib.pdf_signing import sign_pdf
-from lib.usb import get_usb_drives
-from windows.success_window import success_window
+from lib.jobs import JOB_DONE, JOB_FAILED, Job, get_job_queue
+from lib.pdf_signing import get_signed_file_path, import_key, sign_pdf
 from windows.error_window import error_window
+from windows.gui_thread import call_in_gui_thread
 from windows.input_pin_window import input_pin_window
+from windows.job_list import add_job_list, add_job_row, update_job_row
 
 
 def sign_pdf_window(
     position: tuple[int, int] = (0, 0),
     popup_position=(0, 0),
     width=400,
-    height=550,
+    height=780,
 ) -> str:
     """!
-    Create and display a window to sign a PDF file.
+    Create and display a window to sign PDF files.
+
+    Many files or whole directories can be selected at once. They are signed in the background
+    with the private key unlocked only once, and the signed files are saved next to the original ones
+    or into the selected output directory.
 
     @param position: The position of the window.
     @param popup_position: The position of the popup windows.
@@ -33,41 +45,78 @@ def sign_pdf_window(
     """
     tag = f"sign_pdf_{dpg.generate_uuid()}"
 
-    usb_devices = []
+    tokens = []
     selected_device = None
     pin = None
-    selected_pdf_file = None
-
-    stop_event = threading.Event()
-
-    def update_usb_devices_thread(stop_event: threading.Event):
-        nonlocal usb_devices
-        while not stop_event.is_set():
-            usb_devices = [
-                device
-                for device in get_usb_drives()
-                if check_if_directory_contains_keys(device.mount_point)
-            ]
-            dpg.configure_item(f"select_usb_{tag}", items=usb_devices)
-            time.sleep(0.1)
-
-    usb_drives_thread = threading.Thread(
-        target=update_usb_devices_thread, args=(stop_event,)
-    )
+    selected_pdf_files = []
+    output_directory = None
+    job_ids = set()
+    jobs = []
+    private_key = None
+    private_key_lock = threading.Lock()
+    batch = {"start": None, "files": 0, "signed": 0, "bytes": 0}
+
+    def forget_private_key():
+        nonlocal private_key
+        with private_key_lock:
+            private_key = None
+
+    def get_private_key(device_path: str, key_pin: str):
+        # The key is unlocked by the first job and shared by all the following ones.
+        nonlocal private_key
+        with private_key_lock:
+            if private_key is None:
+                private_key = import_key(
+                    read_and_decrypt_private_key(key_pin, device_path)
+                )
+            return private_key
+
+    def deselect_usb_drive():
+        nonlocal selected_device
+        selected_device = None
+        forget_private_key()
+        dpg.configure_item(
+            f"usb_status_{tag}",
+            default_value="USB device is not selected",
+            color=(255, 0, 0, 255),
+        )
+
+    def tokens_changed(new_tokens: list[KeyToken]):
+        nonlocal tokens
+        if new_tokens != tokens:
+            tokens = new_tokens
+            dpg.configure_item(
+                f"select_usb_{tag}", items=[str(token) for token in tokens]
+            )
+            if selected_device is not None and all(
+                token.drive != selected_device for token in tokens
+            ):
+                deselect_usb_drive()
 
     def select_usb_drive_callback(sender, app_data):
         nonlocal selected_device
-        selected_device = [usb for usb in usb_devices if str(usb) == app_data][0]
+        # The list may have been refreshed since it was drawn, such as when the drive was unplugged.
+        token = next((token for token in tokens if str(token) == app_data), None)
+        if token is None:
+            deselect_usb_drive()
+            return
+        selected_device = token.drive
+        forget_private_key()
 
+        details = ""
+        if token.fingerprint is not None:
+            created = time.strftime("%Y-%m-%d", time.localtime(token.created))
+            details = f"\nKey {token.fingerprint.hex()[:16]}, {token.key_type}, created {created}"
         dpg.configure_item(
             f"usb_status_{tag}",
-            default_value=f"Selected USB device: {selected_device}",
+            default_value=f"Selected USB device: {selected_device}{details}",
             color=(0, 255, 0, 255),
         )
 
     def enter_pin_callback(pin_input_tag: str, new_pin: str):
         nonlocal pin
         pin = new_pin
+        forget_private_key()
         dpg.delete_item(pin_input_tag)
         dpg.configure_item(
             f"pin_status_{tag}",
@@ -75,15 +124,54 @@ def sign_pdf_window(
             color=(0, 255, 0, 255),
         )
 
-    def select_pdf_callback(sender, app_data):
-        nonlocal selected_pdf_file
-        selected_pdf_file = app_data["file_path_name"]
+    def set_selected_pdf_files(file_paths: list[str]):
+        nonlocal selected_pdf_files
+        selected_pdf_files = file_paths
+        if not file_paths:
+            dpg.configure_item(
+                f"pdf_status_{tag}",
+                default_value="No PDF files selected",
+                color=(255, 0, 0, 255),
+            )
+            return
         dpg.configure_item(
             f"pdf_status_{tag}",
-            default_value=f"Selected PDF file: {app_data["file_name"]}",
+            default_value=(
+                f"Selected PDF file: {os.path.basename(file_paths[0])}"
+                if len(file_paths) == 1
+                else f"Selected {len(file_paths)} PDF files"
+            ),
+            color=(0, 255, 0, 255),
+        )
+
+    def select_pdf_callback(sender, app_data):
+        set_selected_pdf_files(sorted(app_data["selections"].values()))
+
+    def select_directory_callback(sender, app_data):
+        set_selected_pdf_files(
+            sorted(glob.glob(os.path.join(app_data["file_path_name"], "*.pdf")))
+        )
+
+    def select_output_directory_callback(sender, app_data):
+        nonlocal output_directory
+        output_directory = app_data["file_path_name"]
+        dpg.configure_item(
+            f"output_status_{tag}",
+            default_value=f"Output directory: {output_directory}",
             color=(0, 255, 0, 255),
         )
 
+    def update_throughput():
+        elapsed = time.perf_counter() - batch["start"]
+        dpg.configure_item(
+            f"throughput_{tag}",
+            default_value=(
+                f"Signed {batch['signed']}/{batch['files']} files, "
+                f"{batch['signed'] / elapsed:.1f} docs/s, "
+                f"{batch['bytes'] / elapsed / 1024**2:.1f} MB/s"
+            ),
+        )
+
     def sign_pdf_callback(sender, app_data):
         if not selected_device:
             error_window("Please select a USB device first!", position=popup_position)
@@ -93,38 +181,121 @@ def sign_pdf_window(
             error_window("Please enter a PIN first!", position=popup_position)
             return
 
-        if not selected_pdf_file:
-            error_window("Please select a PDF file first!", position=popup_position)
+        if not selected_pdf_files:
+            error_window("Please select PDF files first!", position=popup_position)
             return
 
-        try:
-            private_key = read_and_decrypt_private_key(pin, selected_device.mount_point)
-        except ValueError as e:
-            error_window(f"Decrypting key failed! {e}", position=popup_position)
-            return
+        device_path = selected_device.mount_point
+        job_pin = pin
+        if output_directory:
+            os.makedirs(output_directory, exist_ok=True)
+        if all(job.finished for job in jobs):
+            # A new batch starts, the rows of the finished jobs are removed from the job list.
+            for job in jobs:
+                dpg.delete_item(f"job_{job.id}")
+            jobs.clear()
+            job_ids.clear()
+            batch.update(start=time.perf_counter(), files=0, signed=0, bytes=0)
+        batch["files"] += len(selected_pdf_files)
+
+        for file_path in selected_pdf_files:
+            signed_file_path = get_signed_file_path(file_path, output_directory)
+
+            def sign(
+                progress: callable,
+                file_path=file_path,
+                signed_file_path=signed_file_path,
+            ) -> str:
+                sign_pdf(
+                    file_path,
+                    get_private_key(device_path, job_pin),
+                    signed_file_path,
+                    progress,
+                )
+                return signed_file_path
+
+            job = get_job_queue().submit("Sign", file_path, sign)
+            job_ids.add(job.id)
+            jobs.append(job)
+            add_job_row(f"jobs_{tag}", job)
+            update_job_row(job)
+        update_throughput()
 
-        sign_pdf(selected_pdf_file, private_key)
+    def job_changed(job: Job):
+        # Called from the worker threads, the state is passed as it may change before the window is updated.
+        call_in_gui_thread(show_job_change, job, job.state)
+
+    def show_job_change(job: Job, state: str):
+        nonlocal pin
+        if job.id not in job_ids:
+            return
+        update_job_row(job)
+        if state == JOB_DONE:
+            batch["signed"] += 1
+            batch["bytes"] += job.total
+            update_throughput()
+        elif state == JOB_FAILED:
+            if isinstance(job.error, (KeyFileError, WrongPinError)):
+                # The key could not be unlocked, the remaining jobs would fail the same way.
+                for other_job in jobs:
+                    other_job.cancel()
+            if isinstance(job.error, WrongPinError) and pin is not None:
+                pin = None
+                dpg.configure_item(
+                    f"pin_status_{tag}",
+                    default_value="Wrong PIN, please enter it again",
+                    color=(255, 0, 0, 255),
+                )
+            error_window(
+                f"Signing {os.path.basename(job.file_path)} failed! {job.error}",
+                position=popup_position,
+            )
 
-        success_window("PDF signed successfully!", position=popup_position)
+    def close_callback():
+        get_token_inventory().unsubscribe(tokens_changed)
+        get_job_queue().unsubscribe(job_changed)
+        forget_private_key()
+        clear_derived_key_cache()
 
     with dpg.file_dialog(
         label="Select PDF",
         tag=f"select_pdf_{tag}",
         width=600,
         height=500,
+        file_count=1000,
         callback=select_pdf_callback,
         show=False,
     ):
         dpg.add_file_extension(".pdf", custom_text="PDF files")
         dpg.add_file_extension(".*", custom_text="All files")
 
+    dpg.add_file_dialog(
+        label="Select Directory with PDF files",
+        tag=f"select_directory_{tag}",
+        width=600,
+        height=500,
+        directory_selector=True,
+        callback=select_directory_callback,
+        show=False,
+    )
+
+    dpg.add_file_dialog(
+        label="Select Output Directory",
+        tag=f"select_output_directory_{tag}",
+        width=600,
+        height=500,
+        directory_selector=True,
+        callback=select_output_directory_callback,
+        show=False,
+    )
+
     with dpg.window(
         label="Sign PDF",
         tag=tag,
         width=width,
         height=height,
         pos=position,
-        on_close=lambda: stop_event.set(),
+        on_close=close_callback,
     ):
         dpg.add_text("Select a USB device to sign the PDF with:")
         dpg.add_listbox(
@@ -155,18 +326,34 @@ def sign_pdf_window(
 
         dpg.add_spacer(height=30)
 
-        dpg.add_text("Select a PDF file to sign:")
-        dpg.add_button(
-            label="Select PDF",
-            width=380,
-            height=50,
-            callback=lambda: dpg.show_item(f"select_pdf_{tag}"),
-        )
+        dpg.add_text("Select PDF files to sign:")
+        with dpg.group(horizontal=True):
+            dpg.add_button(
+                label="Select PDFs",
+                width=187,
+                height=50,
+                callback=lambda: dpg.show_item(f"select_pdf_{tag}"),
+            )
+            dpg.add_button(
+                label="Select Directory",
+                width=187,
+                height=50,
+                callback=lambda: dpg.show_item(f"select_directory_{tag}"),
+            )
         dpg.add_text(
             default_value="PDF file is not selected",
             tag=f"pdf_status_{tag}",
             color=(255, 0, 0, 255),
         )
+        dpg.add_button(
+            label="Select Output Directory",
+            width=380,
+            callback=lambda: dpg.show_item(f"select_output_directory_{tag}"),
+        )
+        dpg.add_text(
+            default_value="Signed files are saved next to the original ones",
+            tag=f"output_status_{tag}",
+        )
 
         dpg.add_spacer(height=30)
 
@@ -178,6 +365,13 @@ def sign_pdf_window(
             width=380,
         )
 
-    usb_drives_thread.start()
+        dpg.add_spacer(height=10)
+
+        dpg.add_text("Jobs:")
+        add_job_list(f"jobs_{tag}")
+        dpg.add_text(default_value="", tag=f"throughput_{tag}")
+
+    get_token_inventory().subscribe(tokens_changed)
+    get_job_queue().subscribe(job_changed)
 
     return tag
@@ -2,21 +2,46 @@
 # This module contains the function to create a window to verify the signature of a PDF file.
 import dearpygui.dearpygui as dpg
 
-from lib.key_management import read_public_key
-from lib.pdf_signing import verify_pdf
+from lib.jobs import JOB_DONE, JOB_FAILED, Job, get_job_queue
+from lib.key_management import load_public_key
+from lib.pdf_signing import SignatureReport, verify_pdf
+from lib.trust_store import get_trust_store
 from windows.error_window import error_window
+from windows.gui_thread import call_in_gui_thread
+from windows.job_list import add_job_list, add_job_row, update_job_row
 from windows.success_window import success_window
 
 
+def describe_signature(signature: SignatureReport) -> str:
+    """!
+    Describe the verification result of a single signature in a few words.
+
+    @param signature: The report of the signature.
+
+    @return The description of the signature state.
+    """
+    if signature.error:
+        return signature.error
+    if not signature.intact:
+        return "document modified after signing"
+    if not signature.valid:
+        return "signed with a different key"
+    if not signature.covers_whole_file:
+        return "valid, document updated afterwards"
+    return "valid"
+
+
 def verify_signature_window(
     position: tuple[int, int] = (0, 0),
     popup_position=(0, 0),
     width=400,
-    height=550,
+    height=720,
 ) -> str:
     """!
     Create and display a window to verify the signature of a PDF file.
 
+    Without a selected public key file, the keys of the signers are looked up in the default trust store.
+
     @param position: The position of the window.
     @param popup_position: The position of the popup windows.
     @param width: The width of the window.
@@ -28,6 +53,7 @@ def verify_signature_window(
 
     selected_pdf_file = None
     selected_public_key_file = None
+    job_ids = set()
 
     def select_pdf_callback(sender, app_data):
         nonlocal selected_pdf_file
@@ -52,19 +78,51 @@ def verify_signature_window(
         if not selected_pdf_file:
             error_window("Please select a PDF file first!", position=popup_position)
             return
-        if not selected_public_key_file:
-            error_window(
-                "Please select a public key file first!", position=popup_position
-            )
-            return
 
-        public_key = read_public_key(selected_public_key_file)
-        is_valid = verify_pdf(selected_pdf_file, public_key)
+        file_path = selected_pdf_file
+        public_key_path = selected_public_key_file
+
+        def verify(progress: callable):
+            if public_key_path is None:
+                return verify_pdf(file_path, get_trust_store(), progress)
+            return verify_pdf(file_path, load_public_key(public_key_path), progress)
+
+        job = get_job_queue().submit("Verify", file_path, verify)
+        job_ids.add(job.id)
+        add_job_row(f"jobs_{tag}", job)
+        update_job_row(job)
 
-        if is_valid:
-            success_window("Signature is valid!", position=popup_position)
+    def job_changed(job: Job):
+        # Called from the worker threads, the state is passed as it may change before the window is updated.
+        call_in_gui_thread(show_job_change, job, job.state)
+
+    def show_job_change(job: Job, state: str):
+        if job.id not in job_ids:
+            return
+        if state == JOB_FAILED:
+            error_window(f"Verifying failed! {job.error}", position=popup_position)
+        if state != JOB_DONE:
+            update_job_row(job)
+            return
+
+        report = job.result
+        update_job_row(job, "valid" if report.valid else "not valid")
+        details = "\n".join(
+            f"{signature.field_name or 'Signature'}"
+            f"{f' ({signature.signing_time})' if signature.signing_time else ''}: "
+            f"{describe_signature(signature)}"
+            for signature in report.signatures
+        )
+        if report.valid:
+            success_window(
+                f"Signature of {job.file_path} is valid!\n{details}",
+                position=popup_position,
+            )
         else:
-            error_window("Signature is not valid!", position=popup_position)
+            error_window(
+                f"Signature of {job.file_path} is not valid!\n{details}",
+                position=popup_position,
+            )
 
     with dpg.file_dialog(
         label="Select PDF",
@@ -89,7 +147,12 @@ def verify_signature_window(
         dpg.add_file_extension(".*", custom_text="All files")
 
     with dpg.window(
-        label="Verify Signature", tag=tag, width=width, height=height, pos=position
+        label="Verify Signature",
+        tag=tag,
+        width=width,
+        height=height,
+        pos=position,
+        on_close=lambda: get_job_queue().unsubscribe(job_changed),
     ):
         dpg.add_text("Select a PDF file to verify its signature")
         dpg.add_button(
@@ -114,9 +177,8 @@ def verify_signature_window(
             callback=lambda: dpg.show_item(f"select_public_key_{tag}"),
         )
         dpg.add_text(
-            default_value="Public key file is not selected",
+            default_value="Public key file is not selected, using the trust store",
             tag=f"public_key_status_{tag}",
-            color=(255, 0, 0, 255),
         )
 
         dpg.add_spacer(height=50)
@@ -128,4 +190,11 @@ def verify_signature_window(
             callback=verify_signature_callback,
         )
 
+        dpg.add_spacer(height=10)
+
+        dpg.add_text("Jobs:")
+        add_job_list(f"jobs_{tag}")
+
+    get_job_queue().subscribe(job_changed)
+
     return tag